@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional
+
+# 准入上限：已接受任务中尚未完成的文章数、估计 token、占用内存；超出后新任务排队，排队满则 429
+MAX_ADMITTED_ARTICLES = int(os.getenv("MAX_ADMITTED_ARTICLES", "300"))
+MAX_ADMITTED_TOKENS = int(os.getenv("MAX_ADMITTED_TOKENS", "4000000"))
+MAX_ADMITTED_MEMORY_MB = float(os.getenv("MAX_ADMITTED_MEMORY_MB", "256"))
+MAX_WAITING_TASKS = int(os.getenv("MAX_WAITING_TASKS", "10"))
+# 尚无吞吐观测时，用于估算 ETA 的单篇平均耗时（秒）
+DEFAULT_ARTICLE_SECONDS = float(os.getenv("DEFAULT_ARTICLE_SECONDS", "45"))
+
+# 每次调用 system prompt 的大致 token 数；正文按英文约 0.3 token/字符，输出按与输入同量级估算
+_SYSTEM_PROMPT_TOKENS = 1500
+_THROUGHPUT_WINDOW_SECONDS = 600.0
+
+
+def estimate_article_tokens(content: str) -> int:
+    """估计单篇文章一次调用的 token（prompt + completion）。"""
+    return _SYSTEM_PROMPT_TOKENS + int(len(content or "") * 0.3 * 2)
+
+
+@dataclass
+class TaskLoad:
+    articles: int = 0
+    tokens: int = 0
+    memory: int = 0
+
+
+class AdmissionController:
+    """上传准入控制：按已接受任务的剩余文章、估计 token 与内存判断是否还能接新任务。
+
+    未超限直接接受；超限时进入等待队列（返回排队位置与 ETA），任务结束腾出容量后按 FIFO
+    启动；等待队列也满时拒绝，调用方返回 429 + Retry-After。等待中的任务只占一个磁盘上的
+    临时 EPUB，不占内存。"""
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_articles: int = MAX_ADMITTED_ARTICLES,
+        max_tokens: int = MAX_ADMITTED_TOKENS,
+        max_memory_bytes: int = int(MAX_ADMITTED_MEMORY_MB * 1024 * 1024),
+        max_waiting: int = MAX_WAITING_TASKS,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_articles = max_articles
+        self.max_tokens = max_tokens
+        self.max_memory_bytes = max_memory_bytes
+        self.max_waiting = max_waiting
+        self._admitted: Dict[str, TaskLoad] = {}
+        self._waiting: Deque[tuple[str, TaskLoad, Callable[[], None]]] = deque()
+        self._completions: Deque[float] = deque()
+        self._articles_per_task = 70.0  # 每期文章数的滑动平均，用于估算尚未解析的任务
+
+    # ---- 负载统计 ----
+
+    def _totals(self) -> TaskLoad:
+        total = TaskLoad()
+        for load in self._admitted.values():
+            total.articles += load.articles
+            total.tokens += load.tokens
+            total.memory += load.memory
+        return total
+
+    def _fits(self, extra: TaskLoad) -> bool:
+        if not self._admitted:
+            return True  # 空闲时至少放行一个任务，避免单个超大任务永远无法开始
+        t = self._totals()
+        return (
+            t.articles + extra.articles <= self.max_articles
+            and t.tokens + extra.tokens <= self.max_tokens
+            and t.memory + extra.memory <= self.max_memory_bytes
+        )
+
+    def estimate_for_upload(self, size_bytes: int, kinds: int = 1) -> TaskLoad:
+        """上传时尚未解析文章，按历史平均篇数与文件大小预估负载。"""
+        articles = int(self._articles_per_task * kinds)
+        return TaskLoad(
+            articles=articles,
+            tokens=articles * estimate_article_tokens("x" * 6000),
+            memory=size_bytes * 2,
+        )
+
+    # ---- 准入 ----
+
+    def try_admit(self, task_id: str, estimate: TaskLoad, start: Callable[[], None]) -> str:
+        """返回 "admitted"（调用方立即启动任务）、"queued"（容量空出后由本类调用 start）或 "rejected"。"""
+        if not self._waiting and self._fits(estimate):
+            self._admitted[task_id] = estimate
+            return "admitted"
+        if len(self._waiting) >= self.max_waiting:
+            return "rejected"
+        self._waiting.append((task_id, estimate, start))
+        return "queued"
+
+    def admit_if_fits(self, task_id: str, estimate: TaskLoad) -> bool:
+        """不排队的准入（同步接口：连接挂着，无法排队），容量不足返回 False。
+        只看剩余容量、不看排队：排队的上传在等更大的空余，放得下的同步请求可以先行。"""
+        if not self._fits(estimate):
+            return False
+        self._admitted[task_id] = estimate
+        return True
+
+    def update(self, task_id: str, articles: int, tokens: int, memory: int, total_articles: int = 0) -> None:
+        """解析完成后用实际篇数/token/内存替换上传时的预估；续跑、重试的任务在此直接登记。"""
+        self._admitted[task_id] = TaskLoad(articles=articles, tokens=tokens, memory=memory)
+        if total_articles > 0:
+            self._articles_per_task = 0.8 * self._articles_per_task + 0.2 * total_articles
+
+    def article_done(self, task_id: str, n: int = 1) -> None:
+        now = time.monotonic()
+        for _ in range(n):
+            self._completions.append(now)
+        while self._completions and now - self._completions[0] > _THROUGHPUT_WINDOW_SECONDS:
+            self._completions.popleft()
+        load = self._admitted.get(task_id)
+        if load is not None and load.articles > 0:
+            per_article = load.tokens // max(1, load.articles)
+            load.articles = max(0, load.articles - n)
+            load.tokens = max(0, load.tokens - per_article * n)
+
+    def release(self, task_id: str) -> None:
+        """任务结束：释放其容量，并按 FIFO 启动等待中的任务。"""
+        self._admitted.pop(task_id, None)
+        self._admit_waiting()
+
+    def cancel_waiting(self, task_id: str) -> bool:
+        for item in list(self._waiting):
+            if item[0] == task_id:
+                self._waiting.remove(item)
+                return True
+        return False
+
+    def _admit_waiting(self) -> None:
+        while self._waiting and self._fits(self._waiting[0][1]):
+            task_id, estimate, start = self._waiting.popleft()
+            self._admitted[task_id] = estimate
+            start()
+
+    # ---- 排队位置与 ETA ----
+
+    def _articles_per_second(self) -> float:
+        if len(self._completions) >= 5:
+            span = max(1.0, time.monotonic() - self._completions[0])
+            return len(self._completions) / span
+        return self.concurrency / DEFAULT_ARTICLE_SECONDS
+
+    def position(self, task_id: str) -> Optional[tuple[int, int]]:
+        """等待中任务的 (排队位置（1 起）, 预计开始前的秒数)；不在队列中返回 None。"""
+        ahead = self._totals().articles
+        for pos, (tid, estimate, _) in enumerate(self._waiting, start=1):
+            if tid == task_id:
+                return pos, int(ahead / self._articles_per_second())
+            ahead += estimate.articles
+        return None
+
+    def retry_after(self) -> int:
+        """队列已满时建议客户端多久后重试：约为队首任务开始所需时间。"""
+        if not self._waiting:
+            return 5
+        _, eta = self.position(self._waiting[0][0]) or (1, 5)
+        return max(5, min(600, eta))
+
+    def snapshot(self) -> dict:
+        t = self._totals()
+        return {
+            "admitted_tasks": len(self._admitted),
+            "waiting_tasks": [tid for tid, _, _ in self._waiting],
+            "articles": t.articles,
+            "tokens_est": t.tokens,
+            "memory_mb": round(t.memory / 1024 / 1024, 1),
+            "limits": {
+                "articles": self.max_articles,
+                "tokens": self.max_tokens,
+                "memory_mb": round(self.max_memory_bytes / 1024 / 1024, 1),
+                "waiting_tasks": self.max_waiting,
+            },
+            "articles_per_second": round(self._articles_per_second(), 3),
+        }
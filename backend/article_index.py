@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+# 跨期文章指纹库：同一篇文章（或小幅改动的重刊）再次出现时直接复用历史译文/口播稿（默认关闭）
+ARTICLE_REUSE_ENABLED = os.getenv("ARTICLE_REUSE_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+ARTICLE_INDEX_PATH = os.getenv(
+    "ARTICLE_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "article_index.sqlite3"),
+)
+# 估计 Jaccard 相似度不低于该阈值才复用（1.0 = 仅完全相同的正文）
+ARTICLE_REUSE_THRESHOLD = float(os.getenv("ARTICLE_REUSE_THRESHOLD", "0.95"))
+# 正文过短时 MinHash 估计不可靠，不参与复用
+ARTICLE_REUSE_MIN_CHARS = int(os.getenv("ARTICLE_REUSE_MIN_CHARS", "800"))
+# 保留期限：登记超过该天数的条目、以及超出该条数的最旧条目在每次登记时删除（0 = 不限）
+ARTICLE_INDEX_MAX_AGE_DAYS = float(os.getenv("ARTICLE_INDEX_MAX_AGE_DAYS", "180"))
+ARTICLE_INDEX_MAX_ROWS = int(os.getenv("ARTICLE_INDEX_MAX_ROWS", "50000"))
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # 固定种子：签名需在进程与重启之间保持一致
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+@dataclass
+class ReuseHit:
+    output: str
+    similarity: float
+    tokens: int
+
+
+def normalize_article_text(content: str) -> str:
+    """归一化正文：小写、去标点、合并空白，使排版/引号差异不影响指纹。"""
+    text = (content or "").lower()
+    text = re.sub(r"[‘’“”'\"`]", "", text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _shingles(normalized: str) -> set[int]:
+    words = normalized.split(" ")
+    if len(words) < SHINGLE_WORDS:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return {
+        int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big")
+        for g in grams
+    }
+
+
+def minhash_signature(normalized: str) -> List[int]:
+    shingles = _shingles(normalized)
+    return [
+        min(((a * s + b) % _MERSENNE_PRIME) for s in shingles)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def _band_keys(signature: List[int]) -> List[str]:
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        keys.append(hashlib.blake2b(repr(rows).encode("ascii"), digest_size=8).hexdigest())
+    return keys
+
+
+def _similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def estimate_tokens(content: str, output: str) -> int:
+    """粗略估计一次调用的 token 数（英文约 0.3 token/字符，中文约 0.6 token/字符）。"""
+    return int(len(content or "") * 0.3 + len(output or "") * 0.6)
+
+
+class ArticleIndex:
+    """SQLite 存储的文章指纹库：精确摘要 + MinHash/LSH 近似匹配。每次调用单独建连接，可跨线程、跨 worker 使用。
+    登记新条目时按 max_age_days / max_rows 删除最旧的条目，库的大小有上限。"""
+
+    def __init__(
+        self,
+        path: str = ARTICLE_INDEX_PATH,
+        threshold: float = ARTICLE_REUSE_THRESHOLD,
+        max_age_days: float = ARTICLE_INDEX_MAX_AGE_DAYS,
+        max_rows: int = ARTICLE_INDEX_MAX_ROWS,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(
+                        """
+                        CREATE TABLE IF NOT EXISTS fingerprints (
+                            id INTEGER PRIMARY KEY,
+                            kind TEXT NOT NULL,
+                            digest TEXT NOT NULL,
+                            signature TEXT NOT NULL,
+                            output TEXT NOT NULL,
+                            tokens INTEGER NOT NULL DEFAULT 0,
+                            created_at REAL NOT NULL
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_fp_digest ON fingerprints(kind, digest);
+                        CREATE INDEX IF NOT EXISTS idx_fp_created ON fingerprints(created_at);
+                        CREATE TABLE IF NOT EXISTS bands (
+                            kind TEXT NOT NULL,
+                            band INTEGER NOT NULL,
+                            bucket TEXT NOT NULL,
+                            fp_id INTEGER NOT NULL
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_bands ON bands(kind, band, bucket);
+                        CREATE INDEX IF NOT EXISTS idx_bands_fp ON bands(fp_id);
+                        """
+                    )
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def lookup(self, content: str, kind: str) -> Optional[ReuseHit]:
+        """查找与 content 近似的历史文章，返回相似度最高且达到阈值的结果。"""
+        normalized = normalize_article_text(content)
+        if len(normalized) < ARTICLE_REUSE_MIN_CHARS:
+            return None
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT output, tokens FROM fingerprints WHERE kind = ? AND digest = ? ORDER BY id DESC LIMIT 1",
+                (kind, digest),
+            ).fetchone()
+            if row is not None:
+                return ReuseHit(output=row[0], similarity=1.0, tokens=row[1])
+            if self.threshold >= 1.0:
+                return None
+            signature = minhash_signature(normalized)
+            candidates: set[int] = set()
+            for band, key in enumerate(_band_keys(signature)):
+                for (fp_id,) in conn.execute(
+                    "SELECT fp_id FROM bands WHERE kind = ? AND band = ? AND bucket = ?",
+                    (kind, band, key),
+                ):
+                    candidates.add(fp_id)
+            best: Optional[ReuseHit] = None
+            for fp_id in candidates:
+                row = conn.execute(
+                    "SELECT signature, output, tokens FROM fingerprints WHERE id = ?", (fp_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                sim = _similarity(signature, json.loads(row[0]))
+                if sim >= self.threshold and (best is None or sim > best.similarity):
+                    best = ReuseHit(output=row[1], similarity=sim, tokens=row[2])
+            return best
+        finally:
+            conn.close()
+
+    def add(self, content: str, kind: str, output: str, tokens: Optional[int] = None) -> None:
+        """登记一篇文章的输出；过短的正文不登记。"""
+        normalized = normalize_article_text(content)
+        if len(normalized) < ARTICLE_REUSE_MIN_CHARS or not output:
+            return
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        signature = minhash_signature(normalized)
+        if tokens is None:
+            tokens = estimate_tokens(content, output)
+        conn = self._connect()
+        try:
+            with conn:
+                if conn.execute(
+                    "SELECT 1 FROM fingerprints WHERE kind = ? AND digest = ?", (kind, digest)
+                ).fetchone():
+                    return
+                cur = conn.execute(
+                    "INSERT INTO fingerprints (kind, digest, signature, output, tokens, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, digest, json.dumps(signature), output, tokens, time.time()),
+                )
+                conn.executemany(
+                    "INSERT INTO bands (kind, band, bucket, fp_id) VALUES (?, ?, ?, ?)",
+                    [(kind, band, key, cur.lastrowid) for band, key in enumerate(_band_keys(signature))],
+                )
+                self._prune(conn)
+        finally:
+            conn.close()
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """删除过期与超出条数上限的条目。id 随登记时间递增，两种上限都归结为删除 id 不大于某值的条目。"""
+        cutoff_id = 0
+        if self.max_rows > 0:
+            (newest,) = conn.execute("SELECT MAX(id) FROM fingerprints").fetchone()
+            if newest is not None:
+                cutoff_id = newest - self.max_rows
+        if self.max_age_days > 0:
+            (expired,) = conn.execute(
+                "SELECT MAX(id) FROM fingerprints WHERE created_at < ?",
+                (time.time() - self.max_age_days * 86400,),
+            ).fetchone()
+            cutoff_id = max(cutoff_id, expired or 0)
+        if cutoff_id > 0:
+            conn.execute("DELETE FROM bands WHERE fp_id <= ?", (cutoff_id,))
+            conn.execute("DELETE FROM fingerprints WHERE id <= ?", (cutoff_id,))
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT kind, COUNT(*) FROM fingerprints GROUP BY kind").fetchall()
+        finally:
+            conn.close()
+        return {kind: count for kind, count in rows}
+
+
+_article_index: Optional[ArticleIndex] = None
+
+
+def get_article_index() -> Optional[ArticleIndex]:
+    """返回全局指纹库；关闭复用时返回 None。"""
+    global _article_index
+    if not ARTICLE_REUSE_ENABLED:
+        return None
+    if _article_index is None:
+        _article_index = ArticleIndex()
+    return _article_index
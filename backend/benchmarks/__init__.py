@@ -0,0 +1 @@
+"""离线性能测试工具：模拟 DeepSeek 服务、合成 EPUB、端到端基准与并发压测。"""
@@ -0,0 +1,532 @@
+"""合成《经济学人》风格 EPUB：可配置文章数、篇幅分布、目录布局、跳过栏目与各种“脏” HTML。
+
+用法（在 backend 目录下）：
+
+    python -m benchmarks.corpus out.epub --articles 900 --layout calibre
+    python -m benchmarks.corpus out.epub --articles 60 --check     # 解析并与预期对比，打印提取代码的行覆盖
+
+生成的书同时附带一份清单（每个文档预期被提取成什么标题，或因何被跳过），--check 会用
+extract_articles_from_epub 实际解析并逐项比对。--articles 指的是应被提取出的文章数，
+跳过栏目（The world this week、Leaders、Letters、漫画、短页等）另外追加。
+
+四种布局合起来覆盖提取代码的全部可达分支；--check 报告中剩下的未执行行是：DEBUG_EPUB_HTML
+开关下的样本落盘、正文不足 300 字已被提前跳过的空文本分支、选中后不可能再是占位的标题分支、
+以及正文前 3 行的栏目关键词（会先在 extract_articles_from_epub 中整篇跳过）。
+"""
+from __future__ import annotations
+
+import argparse
+import dis
+import math
+import random
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from ebooklib import epub
+
+# 目录布局：calibre = 按栏目嵌套（Section 带 href）+ feed_N/article_M/index_uK.html 路径；
+# flat = 平铺 Link + text/partNNNN.xhtml；partial = calibre 但约三成文章不进目录；none = 没有目录
+LAYOUTS = ("calibre", "flat", "partial", "none")
+
+# 标题来源变体（除 toc 外都不给目录标题或给占位标题，迫使解析走 HTML 里的各条分支）
+TITLE_VARIANTS = (
+    "toc",                # 目录标题
+    "toc_placeholder",    # 目录标题是「下一项」之类占位 → 回退到 <h1>
+    "h1",                 # <h1>，内含 <br>/<span> 多段
+    "h2_title",           # <h2 class="title">
+    "article_title",      # .article_title
+    "calibre_feed_title", # .calibre_feed_title
+    "headline_class",     # [class*='headline']
+    "main_title_class",   # [class*='main-title']
+    "h2",                 # 裸 <h2>
+    "h3",                 # 裸 <h3>
+    "masthead_h1",        # <h1>The Economist</h1> 刊头 + 真标题在 <h2>
+    "placeholder_h1",     # <h1>Title</h1> 占位 + 真标题在 <h3>
+    "prefixed",           # <h1>标题：真标题</h1> → 去掉前缀
+    "head_title",         # 无标题标签，<head><title> 为真标题（ebooklib 读取时会丢掉 <head>，见 check）
+    "first_line_quoted",  # 无标题标签：首行含《》
+    "first_line_path",    # 无标题标签：首行带 feed_N/article_M/index_uK.html 路径
+    "first_line_placeholder",  # 无标题标签：首行占位，第二行才是标题
+    "xhtml_name",         # 无标题标签且文件名非 .html：标题退化为文件名
+    "repeated_headline",  # 标题在正文开头重复多次（打印版/分享块），后跟栏目关键词行
+)
+
+# 正文词汇刻意避开跳过规则里的关键词（business/politics/leaders/markets/finance/cartoon/comic/letters）
+_SUBJECTS = (
+    "Central bankers", "Economists", "Policymakers", "Investors", "Households", "Manufacturers",
+    "Farmers", "Regulators", "Trade negotiators", "Local officials", "Shipping firms", "Tech giants",
+)
+_VERBS = (
+    "worry that", "increasingly argue that", "are betting that", "doubt that", "have noticed that",
+    "suspect that", "quietly concede that", "insist that",
+)
+_CLAIMS = (
+    "productivity growth will stay sluggish for years",
+    "inflation is proving stickier than the models predicted",
+    "subsidies for green industry are distorting trade",
+    "the housing shortage is a problem of planning rather than money",
+    "ageing populations will reshape public budgets",
+    "cheap energy is no longer a given",
+    "supply chains are being rebuilt closer to home",
+    "interest rates will not return to their pre-pandemic lows",
+    "artificial intelligence will raise output only slowly",
+    "the dollar's dominance is more fragile than it looks",
+)
+_TOPICS = (
+    "Germany's stalled engine", "India's manufacturing push", "The price of water", "Chile's copper bet",
+    "Japan's wage puzzle", "Nigeria's currency", "Britain's planning maze", "China's property overhang",
+    "America's chip subsidies", "Europe's gas storage", "Brazil's farm boom", "Korea's baby bust",
+    "Canada's housing squeeze", "Vietnam's factories", "Turkey's inflation", "Australia's iron ore",
+)
+_ARTICLE_SECTIONS = (
+    "Briefing", "United States", "The Americas", "Asia", "China", "Middle East & Africa", "Europe",
+    "Britain", "International", "Science & technology", "Culture", "Economic & financial indicators",
+)
+
+
+@dataclass
+class CorpusSpec:
+    articles: int = 90
+    # 每篇正文词数分布："fixed:N" / "uniform:A,B" / "lognormal:MEDIAN,SIGMA"
+    length: str = "lognormal:900,0.45"
+    layout: str = "calibre"
+    # 是否加入应被跳过的栏目（The world this week 及其后续、Leaders、Letters、漫画、短页、未命名页）
+    skip_sections: bool = True
+    # 使用非 toc 标题变体的文章比例（其余文章标题来自目录）；layout=none 时所有文章都走 HTML
+    variant_rate: float = 0.3
+    # 正文外包一层脚本/导航/页眉页脚/图片/注释/未闭合标签等干扰的比例
+    nasty_rate: float = 0.5
+    seed: int = 0
+
+
+@dataclass
+class CorpusItem:
+    file_name: str
+    html: str
+    toc_title: Optional[str]
+    section: str
+    # 预期提取出的标题；None 表示该文档应被跳过（reason 说明原因）
+    expect_title: Optional[str]
+    reason: str = ""
+    # 直接把原始 HTML 交给 _extract_title_and_body_from_html 时的预期标题（与 expect_title 不同时才填）
+    expect_raw_title: Optional[str] = None
+
+
+@dataclass
+class Corpus:
+    spec: CorpusSpec
+    items: List[CorpusItem] = field(default_factory=list)
+
+    @property
+    def expected_titles(self) -> List[str]:
+        return [it.expect_title for it in self.items if it.expect_title is not None]
+
+
+def _sample_words(spec: str, rng: random.Random) -> int:
+    kind, _, args = spec.partition(":")
+    nums = [float(x) for x in args.split(",") if x.strip()]
+    if kind == "fixed":
+        n = nums[0]
+    elif kind == "uniform":
+        n = rng.uniform(nums[0], nums[1])
+    elif kind == "lognormal":
+        median, sigma = (nums + [900.0, 0.45][len(nums):])[:2]
+        n = rng.lognormvariate(math.log(median), sigma)
+    else:
+        raise ValueError(f"未知的篇幅分布: {spec}")
+    return int(min(6000, max(120, n)))
+
+
+def _paragraphs(words: int, rng: random.Random) -> List[str]:
+    paras: List[str] = []
+    total = 0
+    while total < words:
+        sentences = [
+            f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_CLAIMS)}."
+            for _ in range(rng.randint(3, 7))
+        ]
+        para = " ".join(sentences)
+        paras.append(para)
+        total += len(para.split())
+    return paras
+
+
+def _junk(tag: str, n: int) -> str:
+    return f"JUNK-{tag}-{n}"
+
+
+def _wrap_nasty(body: str, n: int, rng: random.Random) -> str:
+    """在正文周围加入 _clean_soup 应清除的元素，以及未闭合标签、实体、注释、大写标签等。"""
+    before = [
+        f"<script type=\"text/javascript\">var x = '{_junk('script', n)}'; if (a < b) {{ }}</script>",
+        f"<style>.{_junk('style', n)} {{ color: red }}</style>",
+        f"<noscript>{_junk('noscript', n)}</noscript>",
+        f"<header><p>{_junk('header', n)}</p></header>",
+        f"<div class=\"breadcrumb\"><a href=\"../index.html\">{_junk('breadcrumb', n)}</a></div>",
+        f"<NAV><UL><LI>{_junk('nav', n)}</LI></UL></NAV>",
+        f"<!-- {_junk('comment', n)} -->",
+        f"<figure><img src=\"images/{n}.jpg\" alt=\"{_junk('img', n)}\"/><figcaption>{_junk('figcaption', n)}</figcaption></figure>",
+    ]
+    after = [
+        f"<aside><p>{_junk('aside', n)}</p></aside>",
+        f"<div class=\"pagination\"><a>{_junk('pagination', n)}</a></div>",
+        f"<div class=\"article-footer\">{_junk('footer-class', n)}</div>",
+        f"<footer>{_junk('footer', n)}<br></footer>",
+    ]
+    rng.shuffle(before)
+    return "".join(before[: rng.randint(3, len(before))]) + body + "".join(after[: rng.randint(1, len(after))])
+
+
+def _body_html(paras: List[str], nasty: bool, rng: random.Random) -> str:
+    if not nasty:
+        return "".join(f"<p>{p}</p>\n" for p in paras)
+    out = []
+    for i, p in enumerate(paras):
+        p = p.replace(" that ", " that&nbsp;", 1).replace("'", "&#8217;")
+        if i % 3 == 1:
+            out.append(f"<P class=\"calibre_7\">{p}\n")  # 未闭合、大写
+        elif i % 3 == 2:
+            half = len(p) // 2
+            cut = p.rfind(" ", 0, half)
+            out.append(f"<div><span>{p[:cut]}</span> <em>{p[cut + 1:]}</em></div>\n")
+        else:
+            out.append(f"<p>{p}</p>\n")
+    return "".join(out)
+
+
+def _document(head_title: str, body: str) -> str:
+    return (
+        "<?xml version='1.0' encoding='utf-8'?>\n"
+        "<html xmlns=\"http://www.w3.org/1999/xhtml\">\n"
+        f"<head><meta http-equiv=\"Content-Type\" content=\"text/html; charset=utf-8\"/><title>{head_title}</title></head>\n"
+        f"<body class=\"calibre\">\n{body}\n</body>\n</html>\n"
+    )
+
+
+def _standfirst(rng: random.Random) -> str:
+    # 标题与正文之间的短句（应被 MIN_BODY_LINE_CHARS 规则删掉）
+    return f"<p class=\"standfirst\">{rng.choice(['A slow squeeze', 'Not so fast', 'Mind the gap', 'Hard choices'])}</p>\n"
+
+
+def _rubric(section: str) -> str:
+    return f"<p class=\"rubric\">{section} | {'Correspondent' if section != 'Briefing' else 'In depth'}</p>\n"
+
+
+def _article_item(
+    n: int, title: str, section: str, file_name: str, variant: str, words: int, nasty: bool, rng: random.Random
+) -> CorpusItem:
+    paras = _paragraphs(words, rng)
+    body = _body_html(paras, nasty, rng)
+    head_title = "The Economist"
+    toc_title: Optional[str] = None
+    expect = title
+    expect_raw: Optional[str] = None
+    pre = _rubric(section) + _standfirst(rng)
+
+    if variant == "toc":
+        toc_title = title
+        heading = f"<h1>{title}</h1>\n"
+    elif variant == "toc_placeholder":
+        toc_title = rng.choice(["下一项", "Article", "标题"])
+        heading = f"<h1>{title}</h1>\n"
+    elif variant == "h1":
+        words_ = title.split(" ")
+        mid = max(1, len(words_) // 2)
+        heading = f"<h1 class=\"headline\"><span>{' '.join(words_[:mid])}</span><br/>{' '.join(words_[mid:])}</h1>\n"
+        expect = title
+    elif variant == "h2_title":
+        heading = f"<h2 class=\"title\">{title}</h2>\n"
+    elif variant == "article_title":
+        heading = f"<div class=\"article_title\">{title}</div>\n"
+    elif variant == "calibre_feed_title":
+        heading = f"<div class=\"calibre_feed_title\">{title}</div>\n"
+    elif variant == "headline_class":
+        heading = f"<p class=\"article-headline-text\">{title}</p>\n"
+    elif variant == "main_title_class":
+        heading = f"<span class=\"page-main-title\">{title}</span>\n"
+    elif variant == "h2":
+        heading = f"<h2>{title}</h2>\n"
+    elif variant == "h3":
+        heading = f"<h3>{title}</h3>\n"
+    elif variant == "masthead_h1":
+        heading = f"<h1>The Economist</h1>\n<h2>{title}</h2>\n"
+    elif variant == "placeholder_h1":
+        heading = f"<h1>Title</h1>\n<h3>{title}</h3>\n"
+    elif variant == "prefixed":
+        heading = f"<h1>{rng.choice(['标题：', 'Title: ', '文章标题 - '])}{title}</h1>\n"
+    elif variant == "head_title":
+        # ebooklib 的 EpubHtml.get_content() 会重建一个空 <head>，经 EPUB 解析时只能靠首行回退
+        head_title = title
+        heading = f"<p>{title}</p>\n"
+        pre = _standfirst(rng)
+    elif variant == "first_line_quoted":
+        head_title = ""
+        heading = f"<p>《{title}》 {section}</p>\n"
+        pre = _standfirst(rng)
+    elif variant == "first_line_path":
+        # 标题在第二行再出现一次（应从正文中去掉）。<title>calibre</title> 会被优先级 3 过滤掉，
+        # 但直接解析原始 HTML 时它的文本仍是首行，会被当作标题；经 EPUB 读取时 <head> 已被重建，无此问题
+        head_title = "calibre"
+        expect_raw = "calibre"
+        heading = f"<p>{file_name} {title}</p>\n<p>{title}</p>\n"
+        pre = _standfirst(rng)
+    elif variant == "first_line_placeholder":
+        head_title = ""
+        second = f"《{title}》" if n % 2 else title
+        heading = f"<p>Title</p>\n<p>{second}</p>\n"
+        pre = _standfirst(rng)
+    elif variant == "xhtml_name":
+        head_title = ""
+        file_name = file_name.rsplit(".", 1)[0] + ".xhtml"
+        heading = f"<p>{title}</p>\n"
+        pre = _standfirst(rng)
+        expect = file_name
+    elif variant == "repeated_headline":
+        # 刊头之后标题重复五次（不同打印/分享区块），前 5 行不会触发跳过；第 6 行是栏目关键词，
+        # 应作为正文开头的栏目行被删掉
+        toc_title = title
+        heading = (
+            f"<h1>{title}</h1>\n"
+            + "".join(f"<p class=\"print-headline-{k}\">{title}</p>\n" for k in range(5))
+            + "<p>Global business</p>\n"
+        )
+        pre = ""
+    else:
+        raise ValueError(variant)
+
+    inner = heading + pre + body if variant in _FIRST_LINE_VARIANTS else pre + heading + body
+    if nasty:
+        inner = _wrap_nasty(inner, n, rng)
+    item = CorpusItem(file_name, _document(head_title, inner), toc_title, section, expect, variant)
+    if variant in _FIRST_LINE_VARIANTS and not file_name.endswith(".html"):
+        # 文件名（即 item 标题）不含 .html 时不会被当作栏目页，首行回退直接取文件名作标题
+        item.expect_title = file_name
+    if variant == "head_title":
+        item.expect_raw_title = title
+    elif expect_raw is not None and file_name.endswith(".html"):
+        item.expect_raw_title = expect_raw
+    return item
+
+
+_FIRST_LINE_VARIANTS = ("head_title", "first_line_quoted", "first_line_path", "first_line_placeholder", "xhtml_name")
+
+
+def _skip_item(file_name: str, section: str, first_line: str, reason: str, rng: random.Random,
+               long: bool = True, toc_title: Optional[str] = None) -> CorpusItem:
+    paras = _paragraphs(180 if long else 10, rng)
+    body = f"<p>{first_line}</p>\n" + "".join(f"<p>{p}</p>\n" for p in paras[: (4 if long else 1)])
+    if not long:
+        body = f"<p>{first_line}</p>\n<figure><img src=\"images/kal.jpg\"/></figure>\n"
+    return CorpusItem(file_name, _document("The Economist", body), toc_title, section, None, reason)
+
+
+def build_corpus(spec: CorpusSpec) -> Corpus:
+    """按 spec 生成全部文档（含预期结果），不写文件。"""
+    if spec.layout not in LAYOUTS:
+        raise ValueError(f"未知的目录布局: {spec.layout}（可选 {', '.join(LAYOUTS)}）")
+    rng = random.Random(spec.seed)
+    corpus = Corpus(spec)
+    calibre = spec.layout in ("calibre", "partial", "none")
+    counter = [0]
+
+    def name(feed: int, article: int, label: str) -> str:
+        counter[0] += 1
+        if calibre:
+            return f"feed_{feed}/article_{article}/index_u{counter[0]}.html"
+        return f"text/{label}.xhtml" if " " in label else f"text/part{counter[0]:04d}.xhtml"
+
+    if spec.skip_sections:
+        items = [
+            _skip_item(name(0, 0, "p"), "The world this week",
+                       "The world this week", "the world this week", rng, toc_title="The world this week"),
+            _skip_item(name(0, 1, "p"), "The world this week", "Politics", "after twtw: politics", rng),
+            _skip_item(name(0, 2, "p"), "The world this week", "Business", "after twtw: business", rng),
+            _skip_item(name(0, 3, "p"), "The world this week", "The weekly cartoon", "after twtw: cartoon", rng),
+            # 读者来信在 The world this week 系列仍生效时出现；之后第一个非后续栏目页结束该系列
+            _skip_item(name(2, 0, "p"), "Letters", "Letters", "letters", rng, toc_title="Letters"),
+            _skip_item(name(3, 0, "p"), "Finance & economics", "Finance & economics | Buttonwood",
+                       "roundup keyword (finance)", rng),
+            _skip_item(name(3, 1, "p"), "Markets", "Markets this week", "roundup keyword (markets)", rng),
+            _skip_item(name(1, 0, "p"), "Leaders", "Leaders | The global economy", "leaders", rng),
+            _skip_item(name(4, 0, "p"), "Cartoon", "KAL's cartoon", "too short", rng, long=False),
+            _skip_item(name(4, 1, "p"), "Untitled", "Title:", "prefix-only headline (未命名文章)", rng),
+            _skip_item(name(4, 2, "p"), "Untitled", "标题", "placeholder lines (未命名文章)", rng),
+        ]
+        # 只有前缀的标题：选中后去掉前缀变为空，按未命名跳过
+        items[-2].html = items[-2].html.replace("<p>Title:</p>", "<h1>Title:</h1>", 1)
+        # 首行与第二行都是占位
+        items[-1].html = items[-1].html.replace("<p>标题</p>", "<p>标题</p>\n<p>文章</p>", 1)
+        if not calibre:
+            # 平铺布局：栏目写在文件名里，走按 item 标题（即文件名）跳过的分支；
+            # 未命名页的文件名本身也是占位，否则首行回退会把文件名当成标题
+            items[0].file_name = "The world this week.xhtml"
+            items[4].file_name = "Letters.xhtml"
+            items[-1].file_name = "article"
+        corpus.items.extend(items)
+
+    variants = [v for v in TITLE_VARIANTS if v != "toc"]
+    variant_count = 0
+    per_section = max(1, math.ceil(spec.articles / len(_ARTICLE_SECTIONS)))
+    for i in range(spec.articles):
+        section_idx = min(i // per_section, len(_ARTICLE_SECTIONS) - 1)
+        section = _ARTICLE_SECTIONS[section_idx]
+        title = f"{_TOPICS[i % len(_TOPICS)]}, part {i + 1}"
+        if spec.layout == "none" or rng.random() < spec.variant_rate:
+            variant = variants[variant_count % len(variants)]
+            variant_count += 1
+        else:
+            variant = "toc"
+        nasty = rng.random() < spec.nasty_rate
+        item = _article_item(i, title, section, name(10 + section_idx, i, "p"), variant,
+                             _sample_words(spec.length, rng), nasty, rng)
+        if spec.layout == "none" or (spec.layout == "partial" and rng.random() < 0.3):
+            if item.toc_title is not None and item.reason in ("toc", "repeated_headline"):
+                # 不在目录里：toc 变体的 <h1> 仍能给出同一标题
+                item.toc_title = None
+        corpus.items.append(item)
+    return corpus
+
+
+def write_epub(corpus: Corpus, path: str) -> None:
+    book = epub.EpubBook()
+    book.set_identifier(f"synthetic-{corpus.spec.seed}-{corpus.spec.articles}")
+    book.set_title(f"The Economist (synthetic, {corpus.spec.articles} articles)")
+    book.set_language("en")
+    book.add_author("The Economist")
+
+    docs = []
+    for k, it in enumerate(corpus.items):
+        # 原样写入字节（EpubHtml 会用 lxml 重新序列化，抹掉我们故意构造的脏 HTML）
+        doc = epub.EpubItem(uid=f"doc{k}", file_name=it.file_name, media_type="application/xhtml+xml",
+                            content=it.html.encode("utf-8"))
+        book.add_item(doc)
+        docs.append(doc)
+
+    if corpus.spec.layout == "flat":
+        book.toc = [epub.Link(it.file_name, it.toc_title, f"t{k}")
+                    for k, it in enumerate(corpus.items) if it.toc_title]
+    elif corpus.spec.layout in ("calibre", "partial"):
+        by_section: Dict[str, List[Tuple[int, CorpusItem]]] = {}
+        for k, it in enumerate(corpus.items):
+            by_section.setdefault(it.section, []).append((k, it))
+        toc = []
+        for s, (section, entries) in enumerate(by_section.items()):
+            feed_dir = entries[0][1].file_name.split("/")[0]
+            links = [epub.Link(it.file_name, it.toc_title, f"t{k}") for k, it in entries if it.toc_title]
+            toc.append((epub.Section(section, href=f"{feed_dir}/index.html"), links))
+        book.toc = toc
+    book.add_item(epub.EpubNcx())
+    book.spine = docs
+    epub.write_epub(path, book)
+
+
+def generate_epub(path: str, articles: int, **kwargs) -> Corpus:
+    """生成并写出一本合成 EPUB，返回其清单（benchmarks 直接调用）。"""
+    corpus = build_corpus(CorpusSpec(articles=articles, **kwargs))
+    write_epub(corpus, path)
+    return corpus
+
+
+def _code_lines(fn) -> Dict[object, set]:
+    out: Dict[object, set] = {}
+    stack = [fn.__code__]
+    while stack:
+        code = stack.pop()
+        out[code] = {ln for _, ln in dis.findlinestarts(code) if ln is not None} - {code.co_firstlineno}
+        stack.extend(c for c in code.co_consts if hasattr(c, "co_code"))
+    return out
+
+
+def check(path: str, corpus: Corpus) -> bool:
+    """用 extract_articles_from_epub 解析并与清单比对；同时统计提取相关函数的行覆盖。"""
+    import epub_processing as ep
+
+    targets: Dict[object, set] = {}
+    for fn in (ep.extract_articles_from_epub, ep._extract_title_and_body_from_html,
+               ep._normalize_article_title_and_body, ep._build_toc_title_by_href):
+        targets.update(_code_lines(fn))
+    hit: Dict[object, set] = {code: set() for code in targets}
+
+    def tracer(frame, event, arg):
+        if frame.f_code in targets:
+            if event == "line":
+                hit[frame.f_code].add(frame.f_lineno)
+            return tracer
+        return None
+
+    sys.settrace(tracer)
+    try:
+        articles = ep.extract_articles_from_epub(path)
+    finally:
+        sys.settrace(None)
+
+    ok = True
+    got = [a.title for a in articles]
+    want = corpus.expected_titles
+    if got != want:
+        ok = False
+        print(f"标题不一致：预期 {len(want)} 篇，实际 {len(got)} 篇")
+        for w, g in zip(want, got):
+            if w != g:
+                print(f"  预期 {w!r}，实际 {g!r}")
+                break
+        extra = set(got) - set(want)
+        missing = set(want) - set(got)
+        if extra:
+            print(f"  多出: {sorted(extra)[:5]}")
+        if missing:
+            print(f"  缺少: {sorted(missing)[:5]}")
+    # 第二遍：原始 HTML 直接交给 _extract_title_and_body_from_html（ebooklib 会重写 <head>，
+    # <title> 优先级只能在这里覆盖到）
+    sys.settrace(tracer)
+    try:
+        raw = [
+            (it, ep._extract_title_and_body_from_html(it.html, it.file_name, it.toc_title)[0])
+            for it in corpus.items if it.expect_title is not None
+        ]
+    finally:
+        sys.settrace(None)
+    for it, title in raw:
+        want_raw = it.expect_raw_title or it.expect_title
+        if title != want_raw:
+            ok = False
+            print(f"原始 HTML 解析不一致（{it.reason}）：预期 {want_raw!r}，实际 {title!r}")
+            break
+    leaked = [a.title for a in articles if "JUNK-" in a.content or "JUNK-" in a.title]
+    if leaked:
+        ok = False
+        print(f"{len(leaked)} 篇正文混入了应清除的元素，例如 {leaked[0]!r}")
+
+    print(f"提取 {len(got)} 篇，跳过 {len(corpus.items) - len(want)} 个文档；行覆盖：")
+    for code, lines in targets.items():
+        missed = sorted(lines - hit[code])
+        print(f"  {code.co_name:<40} {len(lines) - len(missed)}/{len(lines)}"
+              + (f"  未执行行: {missed}" if missed else ""))
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="合成《经济学人》风格 EPUB")
+    parser.add_argument("output")
+    parser.add_argument("--articles", type=int, default=90)
+    parser.add_argument("--length", default=CorpusSpec.length)
+    parser.add_argument("--layout", default=CorpusSpec.layout, choices=LAYOUTS)
+    parser.add_argument("--no-skip-sections", action="store_true")
+    parser.add_argument("--variant-rate", type=float, default=CorpusSpec.variant_rate)
+    parser.add_argument("--nasty-rate", type=float, default=CorpusSpec.nasty_rate)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="生成后解析并与清单比对")
+    args = parser.parse_args()
+    corpus = generate_epub(
+        args.output, args.articles, length=args.length, layout=args.layout,
+        skip_sections=not args.no_skip_sections, variant_rate=args.variant_rate,
+        nasty_rate=args.nasty_rate, seed=args.seed,
+    )
+    print(f"已写入 {args.output}：{len(corpus.items)} 个文档，预期提取 {len(corpus.expected_titles)} 篇")
+    if args.check and not check(args.output, corpus):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""point-me 的 DeepSeek 调用方式对比：两次独立调用（off）/ 单次请求双输出（combined）/ 由译文改写口播稿（derived）。
+
+用法（在 backend 目录下）：
+
+    python -m benchmarks.dual_output                     # 默认 30 篇，三种方式各跑一次
+    python -m benchmarks.dual_output --articles 100 --parallel 4 --json
+
+在同一进程内启动模拟 DeepSeek 与后端，依次切换 POINT_ME_DUAL_OUTPUT 上传同一本合成 EPUB，报告请求数、
+prompt token（其中未命中前缀缓存、按全价计费的部分）、completion token、DeepSeek 调用累计耗时与 makespan，
+以及相对 off 的变化。token 数由模拟服务按字符估算（英文约 0.3、中文约 0.6 token/字符），只反映 prompt 结构
+带来的差异；--output-ratio 为译文/口播稿相对英文原文的字符比例，真实《经济学人》文章约为 0.35。
+makespan 与耗时已按 --time-scale 换算回模拟的真实秒数。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+# 导入 pipeline 时设置隔离的运行目录等环境变量（必须在导入 main 之前）
+from benchmarks.pipeline import _WORKDIR, _Server, _free_port
+
+import httpx
+
+from benchmarks.corpus import generate_epub
+from benchmarks.mock_deepseek import MockConfig, create_app
+
+STRATEGIES = ("off", "combined", "derived")
+
+
+def _deepseek_seconds() -> float:
+    from metrics import DEEPSEEK_CALL_SECONDS
+
+    return sum(s for _, s in DEEPSEEK_CALL_SECONDS.totals().values())
+
+
+def run(articles: int, strategies: List[str], mock: MockConfig, timeout: float) -> Dict[str, Any]:
+    mock_port = _free_port()
+    os.environ["DEEPSEEK_API_BASE"] = f"http://127.0.0.1:{mock_port}"
+    mock_app = create_app(mock)
+    mock_server = _Server(mock_app, mock_port).start()
+
+    import main  # 读取上面设置的环境变量
+
+    epub_path = os.path.join(_WORKDIR, f"dual_{articles}.epub")
+    generate_epub(epub_path, articles, seed=articles)
+    stats = mock_app.state.stats
+    scale = mock.time_scale or 1.0
+    rows: Dict[str, Any] = {}
+    app_server = _Server(main.app, _free_port()).start()
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{app_server.port}", timeout=timeout) as client:
+            for strategy in strategies:
+                main.POINT_ME_DUAL_OUTPUT = strategy
+                # 各方式从空的前缀缓存开始，避免后跑的方式命中前一方式留下的相同 prompt
+                mock_app.state.prefix_cache._seen.clear()
+                before = (stats.requests, stats.prompt_tokens, stats.cache_hit_tokens, stats.completion_tokens)
+                call_seconds = _deepseek_seconds()
+                start = time.perf_counter()
+                with open(epub_path, "rb") as f:
+                    resp = client.post("/api/point-me", files={"file": ("bench.epub", f, "application/epub+zip")})
+                resp.raise_for_status()
+                task_id = resp.json()["task_id"]
+                deadline = time.time() + timeout
+                while True:
+                    status = client.get(f"/api/analyze-status/{task_id}").json()
+                    if status.get("status") == "completed":
+                        break
+                    if status.get("status") == "error":
+                        raise RuntimeError(f"{strategy} 任务失败: {status.get('error')}")
+                    if time.time() > deadline:
+                        raise TimeoutError(f"{strategy} 任务 {timeout}s 内未完成")
+                    time.sleep(0.05)
+                makespan = time.perf_counter() - start
+                prompt = stats.prompt_tokens - before[1]
+                rows[strategy] = {
+                    "articles": articles,
+                    "requests": stats.requests - before[0],
+                    "prompt_tokens": prompt,
+                    "prompt_cache_miss_tokens": prompt - (stats.cache_hit_tokens - before[2]),
+                    "completion_tokens": stats.completion_tokens - before[3],
+                    "deepseek_seconds": round((_deepseek_seconds() - call_seconds) / scale, 1),
+                    "makespan_seconds": round(makespan / scale, 1),
+                }
+                main._results_store.pop(task_id, None)
+    finally:
+        app_server.stop()
+        mock_server.stop()
+    base = rows.get("off")
+    if base:
+        for row in rows.values():
+            row["vs_off"] = {
+                k: f"{(row[k] - base[k]) / base[k]:+.0%}" if base[k] else None
+                for k in ("requests", "prompt_tokens", "prompt_cache_miss_tokens", "completion_tokens",
+                          "deepseek_seconds", "makespan_seconds")
+            }
+    return {
+        "settings": {"mock": mock.__dict__, "MAX_PARALLEL_TASKS": main.MAX_PARALLEL_TASKS},
+        "strategies": rows,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=30)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help=f"逗号分隔：{','.join(STRATEGIES)}")
+    parser.add_argument("--parallel", type=int, help="MAX_PARALLEL_TASKS（默认沿用环境变量）")
+    parser.add_argument("--latency", default="lognormal:1.5,0.5", help="模拟首 token 延迟分布（见 mock_deepseek）")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="模拟服务的时间缩放，默认加速 50 倍")
+    parser.add_argument("--output-ratio", type=float, default=0.35, help="输出相对英文原文的字符比例")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=900.0)
+    parser.add_argument("--json", action="store_true", help="输出 JSON 而不是表格")
+    args = parser.parse_args()
+
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"未知方式: {', '.join(sorted(unknown))}")
+    if args.parallel:
+        os.environ["MAX_PARALLEL_TASKS"] = str(args.parallel)
+    mock = MockConfig(
+        latency=args.latency, tokens_per_sec=args.tokens_per_sec, time_scale=args.time_scale,
+        output_ratio=args.output_ratio, seed=args.seed,
+    )
+    result = run(args.articles, strategies, mock, args.timeout)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    keys = ("requests", "prompt_tokens", "prompt_cache_miss_tokens", "completion_tokens", "deepseek_seconds", "makespan_seconds")
+    print(f"{'strategy':<10}" + "".join(f"{k:>26}" for k in keys))
+    for name, row in result["strategies"].items():
+        change = row.get("vs_off", {})
+        print(f"{name:<10}" + "".join(f"{str(row[k]) + ' (' + (change.get(k) or '-') + ')':>26}" for k in keys))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""结果文档各输出格式的生成耗时与体积对比（docx / Markdown / HTML / JSON）。
+
+用法（在 backend 目录下）：
+
+    python -m benchmarks.formats                 # 默认 50、200 篇
+    python -m benchmarks.formats --sizes 100 --repeat 10 --json
+
+文章由 benchmarks.corpus 合成并经 extract_articles_from_epub 解析，口播稿/译文为模拟 DeepSeek 输出的
+标题行加上文章原文段落。各格式使用同一份单篇渲染结果，因此只比较“写成文档”这一步；文本格式另报告
+gzip 传输（下载接口在客户端接受 gzip 时使用）的耗时与体积，speedup/size 为（生成 + gzip）相对 docx 的倍数。
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.corpus import generate_epub
+from benchmarks.mock_deepseek import MockConfig, _fake_output
+from doc_builder import (
+    OUTPUT_FORMATS,
+    build_from_rendered_analyses,
+    build_from_rendered_translations,
+    render_analyses,
+    render_translations,
+)
+from epub_processing import extract_articles_from_epub
+
+
+def _rendered(articles: int, seed: int) -> Dict[str, list]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.epub")
+        generate_epub(path, articles, seed=seed)
+        arts = extract_articles_from_epub(path)
+    # 模拟 DeepSeek 的输出是重复句子，压缩率远高于真实文本，会让 docx（zip）的体积显得过小；
+    # 正文改用合成文章本身的段落，标题行沿用模拟输出的格式
+    cfg = MockConfig()
+    analyses = [_fake_output("listen", a.content, cfg).split("\n\n", 1)[0] + "\n\n" + a.content for a in arts]
+    translations = [_fake_output("translate", a.content, cfg).split("\n\n", 1)[0] + "\n\n" + a.content for a in arts]
+    return {
+        "listen": render_analyses(analyses, arts),
+        "read": render_translations(translations, arts),
+    }
+
+
+def run(sizes: List[int], repeat: int, seed: int) -> Dict[str, Any]:
+    builders = {"listen": build_from_rendered_analyses, "read": build_from_rendered_translations}
+    rows: Dict[str, Any] = {}
+    for n in sizes:
+        rendered = _rendered(n, seed)
+        for kind, build in builders.items():
+            for fmt in OUTPUT_FORMATS:
+                times = []
+                gzip_times = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    data = build(rendered[kind], fmt, "bench").getvalue()
+                    times.append(time.perf_counter() - start)
+                    if fmt != "docx":
+                        # 与下载接口相同：客户端接受 gzip 时文本格式压缩传输
+                        start = time.perf_counter()
+                        compressed = gzip.compress(data, compresslevel=6)
+                        gzip_times.append(time.perf_counter() - start)
+                rows[f"{kind}-{n}-{fmt}"] = {
+                    "articles": len(rendered[kind]),
+                    "build_ms_median": round(statistics.median(times) * 1000, 2),
+                    "build_ms_min": round(min(times) * 1000, 2),
+                    "bytes": len(data),
+                    "gzip_ms_median": round(statistics.median(gzip_times) * 1000, 2) if gzip_times else None,
+                    "gzip_bytes": len(compressed) if fmt != "docx" else None,
+                }
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="50,200", help="逗号分隔的文章数")
+    parser.add_argument("--repeat", type=int, default=5, help="每个格式重复生成的次数（取中位数）")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="输出 JSON 而不是表格")
+    args = parser.parse_args()
+    rows = run([int(s) for s in args.sizes.split(",") if s.strip()], args.repeat, args.seed)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print(f"{'scenario':<20}{'articles':>9}{'build ms':>10}{'bytes':>10}{'+gzip ms':>10}{'gzip bytes':>12}{'speedup':>9}{'size':>7}")
+    for name, r in rows.items():
+        docx = rows[name.rsplit("-", 1)[0] + "-docx"]
+        total_ms = r["build_ms_median"] + (r["gzip_ms_median"] or 0)
+        wire = r["gzip_bytes"] or r["bytes"]
+        print(
+            f"{name:<20}{r['articles']:>9}{r['build_ms_median']:>10}{r['bytes']:>10}{r['gzip_ms_median'] or '-':>10}"
+            f"{r['gzip_bytes'] or '-':>12}{docx['build_ms_median'] / max(total_ms, 1e-3):>8.0f}x{wire / docx['bytes']:>7.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
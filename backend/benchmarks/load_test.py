@@ -0,0 +1,377 @@
+"""并发用户压测：模拟 N 个用户按 upload-page.tsx 的方式上传 EPUB、每 3 秒轮询状态、完成后下载。
+
+用法（在 backend 目录下）：
+
+    # 自动拉起模拟 DeepSeek + gunicorn（-w 4，与生产启动命令一致），20 个用户在 10 秒内陆续到达
+    python -m benchmarks.load_test --users 20 --ramp 10 --workers 4 --articles 90
+
+    # 压已有部署（其 DEEPSEEK_API_BASE 应指向 benchmarks.mock_deepseek）
+    python -m benchmarks.load_test --target http://127.0.0.1:8000 --users 50
+
+报告：状态轮询 / 上传 / 下载的 p50/p95/p99 延迟，每个任务从上传到可下载的耗时，错误率（含 429 拒绝），
+以及多 worker 下请求落到没有该任务内存状态的 worker 造成的 not_found / 下载 404。
+--slo-* 参数给出延迟与错误率目标，不满足时退出码为 1，可用于发版前确认单实例容量。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.corpus import generate_epub
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 与 frontend/src/upload-page.tsx 保持一致
+POLL_INTERVAL_SECONDS = 3.0
+_UPLOAD_ENDPOINTS = {"listen": "/api/listen-me", "read": "/api/read-me", "point": "/api/point-me"}
+_DOWNLOADS = {"listen": ("listen",), "read": ("read",), "point": ("read", "listen")}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 4)
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 4)}
+
+
+@dataclass
+class _Stats:
+    upload_seconds: List[float] = field(default_factory=list)
+    poll_seconds: List[float] = field(default_factory=list)
+    download_seconds: List[float] = field(default_factory=list)
+    time_to_complete: List[float] = field(default_factory=list)
+    tasks_started: int = 0
+    tasks_completed: int = 0
+    tasks_failed: int = 0
+    uploads_rejected: int = 0  # 429 + Retry-After（准入控制）
+    upload_errors: int = 0
+    poll_errors: int = 0  # 网络错误或非 2xx（前端忽略，下次轮询重试）
+    polls_not_found: int = 0  # 轮询到的 worker 既无内存状态也没有任务日志
+    download_404: int = 0  # 结果只在另一个 worker 的内存里
+    download_errors: int = 0
+    statuses: Dict[str, int] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+    def error(self, msg: str) -> None:
+        if len(self.errors) < 20:
+            self.errors.append(msg)
+
+
+async def _user(client: httpx.AsyncClient, mode: str, epub: bytes, stats: _Stats, poll_interval: float, timeout: float) -> None:
+    start = time.perf_counter()
+    try:
+        t0 = time.perf_counter()
+        resp = await client.post(_UPLOAD_ENDPOINTS[mode], files={"file": ("issue.epub", epub, "application/epub+zip")})
+        stats.upload_seconds.append(time.perf_counter() - t0)
+    except httpx.HTTPError as e:
+        stats.upload_errors += 1
+        stats.error(f"upload: {type(e).__name__}: {e}")
+        return
+    if resp.status_code == 429:
+        stats.uploads_rejected += 1
+        return
+    if resp.status_code != 200 or "task_id" not in resp.json():
+        stats.upload_errors += 1
+        stats.error(f"upload HTTP {resp.status_code}: {resp.text[:200]}")
+        return
+    task_id = resp.json()["task_id"]
+    stats.tasks_started += 1
+
+    # 与前端一致：立即查一次，之后每 poll_interval 秒查一次；网络错误忽略，not_found / error 结束
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            t0 = time.perf_counter()
+            r = await client.get(f"/api/analyze-status/{task_id}")
+            stats.poll_seconds.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                stats.poll_errors += 1
+                status = {}
+            else:
+                status = r.json()
+        except httpx.HTTPError:
+            stats.poll_errors += 1
+            status = {}
+        state = status.get("status")
+        if state:
+            stats.statuses[state] = stats.statuses.get(state, 0) + 1
+        if state == "completed":
+            break
+        if state == "error":
+            stats.tasks_failed += 1
+            stats.error(f"task {task_id}: {status.get('error')}")
+            return
+        if state == "not_found":
+            stats.polls_not_found += 1
+            stats.tasks_failed += 1
+            return
+        if time.perf_counter() > deadline:
+            stats.tasks_failed += 1
+            stats.error(f"task {task_id}: 超过 {timeout}s 未完成")
+            return
+        await asyncio.sleep(poll_interval)
+
+    for kind in _DOWNLOADS[mode]:
+        try:
+            t0 = time.perf_counter()
+            r = await client.get(f"/api/download/{kind}/{task_id}")
+            stats.download_seconds.append(time.perf_counter() - t0)
+        except httpx.HTTPError as e:
+            stats.download_errors += 1
+            stats.error(f"download: {type(e).__name__}: {e}")
+            stats.tasks_failed += 1
+            return
+        if r.status_code == 404:
+            stats.download_404 += 1
+            stats.tasks_failed += 1
+            return
+        if r.status_code != 200:
+            stats.download_errors += 1
+            stats.error(f"download HTTP {r.status_code}")
+            stats.tasks_failed += 1
+            return
+    stats.tasks_completed += 1
+    stats.time_to_complete.append(time.perf_counter() - start)
+
+
+async def run_load(
+    target: str,
+    users: int,
+    ramp: float,
+    modes: List[str],
+    epub: bytes,
+    poll_interval: float = POLL_INTERVAL_SECONDS,
+    timeout: float = 1800.0,
+    seed: int = 0,
+) -> dict:
+    rng = random.Random(seed)
+    stats = _Stats()
+    limits = httpx.Limits(max_connections=users * 2 + 10)
+    async with httpx.AsyncClient(base_url=target, timeout=httpx.Timeout(120.0), limits=limits) as client:
+        started = time.perf_counter()
+
+        async def delayed(i: int) -> None:
+            await asyncio.sleep(ramp * i / max(1, users))
+            await _user(client, rng.choice(modes), epub, stats, poll_interval, timeout)
+
+        await asyncio.gather(*(delayed(i) for i in range(users)))
+        wall = time.perf_counter() - started
+
+    requests = len(stats.upload_seconds) + len(stats.poll_seconds) + len(stats.download_seconds)
+    failed_requests = stats.upload_errors + stats.poll_errors + stats.download_errors + stats.download_404
+    return {
+        "users": users,
+        "ramp_seconds": ramp,
+        "wall_seconds": round(wall, 2),
+        "latency_seconds": {
+            "status_poll": _percentiles(stats.poll_seconds),
+            "upload": _percentiles(stats.upload_seconds),
+            "download": _percentiles(stats.download_seconds),
+        },
+        "time_to_complete_seconds": _percentiles(stats.time_to_complete),
+        "tasks": {
+            "started": stats.tasks_started,
+            "completed": stats.tasks_completed,
+            "failed": stats.tasks_failed,
+            "rejected_429": stats.uploads_rejected,
+        },
+        "errors": {
+            "upload": stats.upload_errors,
+            "poll": stats.poll_errors,
+            "download": stats.download_errors,
+            "request_error_rate": round(failed_requests / requests, 4) if requests else 0.0,
+            "task_failure_rate": round(stats.tasks_failed / stats.tasks_started, 4) if stats.tasks_started else 0.0,
+        },
+        "worker_affinity": {
+            "status_not_found": stats.polls_not_found,
+            "download_404": stats.download_404,
+        },
+        "poll_statuses": stats.statuses,
+        "sample_errors": stats.errors,
+    }
+
+
+class _Stack:
+    """拉起模拟 DeepSeek 与 gunicorn 后端（子进程），退出时一并结束。"""
+
+    def __init__(self, workers: int, mock_args: List[str], env_overrides: Dict[str, str]):
+        self.workdir = tempfile.mkdtemp(prefix="epub-load-")
+        self.mock_port = _free_port()
+        self.app_port = _free_port()
+        self.workers = workers
+        self.mock_args = mock_args
+        self.env_overrides = env_overrides
+        self.procs: List[subprocess.Popen] = []
+
+    @property
+    def target(self) -> str:
+        return f"http://127.0.0.1:{self.app_port}"
+
+    def _wait(self, url: str, proc: subprocess.Popen, seconds: float = 60.0) -> None:
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"子进程提前退出（{' '.join(proc.args)}），日志见 {self.workdir}")
+            try:
+                httpx.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise RuntimeError(f"{url} 在 {seconds}s 内没有就绪")
+
+    def __enter__(self) -> "_Stack":
+        env = {
+            **os.environ,
+            "DEEPSEEK_API_BASE": f"http://127.0.0.1:{self.mock_port}",
+            "DEEPSEEK_API_KEY": os.environ.get("DEEPSEEK_API_KEY", "sk-load-test"),
+            "TASK_JOURNAL_DIR": os.path.join(self.workdir, "journal"),
+            "USAGE_DB_PATH": os.path.join(self.workdir, "usage.sqlite3"),
+            "ARTICLE_INDEX_PATH": os.path.join(self.workdir, "article_index.sqlite3"),
+            "HOST_LIMIT_DIR": os.path.join(self.workdir, "limits"),
+            "TRACE_FILE": os.path.join(self.workdir, "trace.jsonl"),
+            "ARTICLE_REUSE_ENABLED": "0",
+            **self.env_overrides,
+        }
+        mock_log = open(os.path.join(self.workdir, "mock.log"), "w")
+        mock = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.mock_deepseek", "--port", str(self.mock_port), *self.mock_args],
+            cwd=BACKEND_DIR, env=env, stdout=mock_log, stderr=subprocess.STDOUT,
+        )
+        self.procs.append(mock)
+        self._wait(f"http://127.0.0.1:{self.mock_port}/stats", mock)
+        app_log = open(os.path.join(self.workdir, "gunicorn.log"), "w")
+        app = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "main:app", "-w", str(self.workers),
+             "-k", "uvicorn.workers.UvicornWorker", "--bind", f"127.0.0.1:{self.app_port}",
+             "--graceful-timeout", "10"],
+            cwd=BACKEND_DIR, env=env, stdout=app_log, stderr=subprocess.STDOUT,
+        )
+        self.procs.append(app)
+        self._wait(f"{self.target}/health", app)
+        return self
+
+    def mock_stats(self) -> dict:
+        try:
+            return httpx.get(f"http://127.0.0.1:{self.mock_port}/stats", timeout=5.0).json()
+        except httpx.HTTPError:
+            return {}
+
+    def __exit__(self, *exc) -> None:
+        for proc in reversed(self.procs):
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=20)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def _check_slo(report: dict, args: argparse.Namespace) -> List[str]:
+    problems = []
+    p99 = report["latency_seconds"]["status_poll"]["p99"]
+    if args.slo_poll_p99_ms and p99 is not None and p99 * 1000 > args.slo_poll_p99_ms:
+        problems.append(f"状态轮询 p99 {p99 * 1000:.0f}ms > {args.slo_poll_p99_ms:.0f}ms")
+    ttc = report["time_to_complete_seconds"]["p95"]
+    if args.slo_complete_p95 and ttc is not None and ttc > args.slo_complete_p95:
+        problems.append(f"任务完成耗时 p95 {ttc:.1f}s > {args.slo_complete_p95:.1f}s")
+    rate = report["errors"]["task_failure_rate"]
+    if args.slo_error_rate is not None and rate > args.slo_error_rate:
+        problems.append(f"任务失败率 {rate:.2%} > {args.slo_error_rate:.2%}")
+    return problems
+
+
+def _print_report(report: dict) -> None:
+    lat = report["latency_seconds"]
+    for name, p in list(lat.items()) + [("time_to_complete", report["time_to_complete_seconds"])]:
+        if p["count"]:
+            print(f"{name:<18} n={p['count']:<5} p50={p['p50']:.3f}s p95={p['p95']:.3f}s p99={p['p99']:.3f}s max={p['max']:.3f}s")
+    print(f"tasks: {report['tasks']}")
+    print(f"errors: {report['errors']}")
+    print(f"worker affinity: {report['worker_affinity']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="并发用户压测（上传 + 轮询 + 下载）")
+    parser.add_argument("--target", help="已有部署的地址；不填则自动拉起模拟 DeepSeek + gunicorn")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--ramp", type=float, default=10.0, help="所有用户在多少秒内陆续到达")
+    parser.add_argument("--modes", default="listen,read", help="用户随机选择的接口：listen,read,point")
+    parser.add_argument("--articles", type=int, default=90, help="每个用户上传的合成 EPUB 文章数")
+    parser.add_argument("--epub", help="改用指定的 EPUB 文件")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS)
+    parser.add_argument("--timeout", type=float, default=1800.0, help="单个任务最长等待秒数")
+    parser.add_argument("--workers", type=int, default=4, help="自动拉起时 gunicorn 的 worker 数")
+    parser.add_argument("--mock-time-scale", default="0.05", help="自动拉起时模拟服务的时间缩放")
+    parser.add_argument("--mock-arg", action="append", default=[], help="透传给 mock_deepseek 的参数，如 --mock-arg=--rate-429=0.05")
+    parser.add_argument("--env", action="append", default=[], help="自动拉起时后端的额外环境变量 KEY=VALUE")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="报告 JSON 写入路径")
+    parser.add_argument("--slo-poll-p99-ms", type=float, default=500.0)
+    parser.add_argument("--slo-complete-p95", type=float, default=0.0, help="任务完成耗时 p95 上限（秒），0 不检查")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(_UPLOAD_ENDPOINTS)
+    if unknown:
+        parser.error(f"未知接口: {', '.join(sorted(unknown))}")
+    if args.epub:
+        with open(args.epub, "rb") as f:
+            epub = f.read()
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="epub-load-"), "issue.epub")
+        generate_epub(path, args.articles, seed=args.seed)
+        with open(path, "rb") as f:
+            epub = f.read()
+
+    def run(target: str) -> dict:
+        return asyncio.run(run_load(target, args.users, args.ramp, modes, epub, args.poll_interval, args.timeout, args.seed))
+
+    if args.target:
+        report = run(args.target.rstrip("/"))
+    else:
+        env = dict(kv.split("=", 1) for kv in args.env)
+        with _Stack(args.workers, ["--time-scale", args.mock_time_scale, *args.mock_arg], env) as stack:
+            print(f"gunicorn -w {args.workers} @ {stack.target}，日志目录 {stack.workdir}", flush=True)
+            report = run(stack.target)
+            report["workers"] = args.workers
+            report["mock"] = stack.mock_stats()
+    report["modes"] = modes
+    report["epub_bytes"] = len(epub)
+
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    problems = _check_slo(report, args)
+    if problems:
+        print("未达到 SLO：", file=sys.stderr)
+        for p in problems:
+            print(f"  {p}", file=sys.stderr)
+        sys.exit(1)
+    print("SLO 满足")
+
+
+if __name__ == "__main__":
+    main()
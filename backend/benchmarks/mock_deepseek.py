@@ -0,0 +1,316 @@
+"""本地模拟 DeepSeek /v1/chat/completions（流式与非流式），用于离线跑通整条流水线与基准测试。
+
+启动（在 backend 目录下）：
+
+    python -m benchmarks.mock_deepseek --port 8001 --latency lognormal:2,0.5 --rate-429 0.05
+
+然后设置 DEEPSEEK_API_BASE=http://127.0.0.1:8001 与任意 DEEPSEEK_API_KEY 启动后端即可。
+所有参数也可用 MOCK_* 环境变量配置；benchmarks 中可用 create_app(MockConfig(...)) 在进程内使用。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# 前缀缓存的粒度（DeepSeek 以 64 token 为单位缓存；按约 4 字符/token 折算）
+_CACHE_UNIT_CHARS = 256
+
+
+@dataclass
+class MockConfig:
+    # 首 token 延迟分布："fixed:S" / "uniform:A,B" / "lognormal:MEDIAN,SIGMA"（秒）
+    latency: str = "lognormal:1.5,0.5"
+    # 生成速度（completion token/秒）；0 表示瞬间生成
+    tokens_per_sec: float = 40.0
+    # 所有等待时间乘以该系数（基准测试可设 0.01 加速 100 倍）
+    time_scale: float = 1.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    # 429 响应的 Retry-After（秒，同样乘以 time_scale）
+    retry_after: float = 1.0
+    # 返回 400 "Content Exists Risk" 的概率；content_risk_min_chars>0 时仅对更长的正文触发（模拟截断后通过）
+    content_risk_rate: float = 0.0
+    content_risk_min_chars: int = 0
+    # 响应写到一半时中断连接的概率
+    reset_rate: float = 0.0
+    # 输出长度约为输入正文的比例，及上限（字符）
+    output_ratio: float = 0.6
+    max_output_chars: int = 6000
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "MockConfig":
+        kwargs: Dict[str, Any] = {}
+        for f in fields(cls):
+            raw = os.getenv(f"MOCK_{f.name.upper()}")
+            if raw is None or raw == "":
+                continue
+            if f.name == "latency":
+                kwargs[f.name] = raw
+            elif f.name in ("content_risk_min_chars", "max_output_chars", "seed"):
+                kwargs[f.name] = int(raw)
+            else:
+                kwargs[f.name] = float(raw)
+        return cls(**kwargs)
+
+
+@dataclass
+class _Stats:
+    requests: int = 0
+    streaming: int = 0
+    by_status: Dict[str, int] = field(default_factory=dict)
+    resets: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cache_hit_tokens: int = 0
+
+    def count(self, status: Any) -> None:
+        key = str(status)
+        self.by_status[key] = self.by_status.get(key, 0) + 1
+
+
+def _sample_latency(spec: str, rng: random.Random) -> float:
+    kind, _, args = spec.partition(":")
+    nums = [float(x) for x in args.split(",") if x.strip()] if args else []
+    if kind == "fixed":
+        return nums[0] if nums else 0.0
+    if kind == "uniform":
+        return rng.uniform(nums[0], nums[1])
+    if kind == "lognormal":
+        median, sigma = (nums + [1.0, 0.5][len(nums):])[:2]
+        return rng.lognormvariate(math.log(max(median, 1e-6)), sigma)
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+def _estimate_tokens(text: str) -> int:
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return int(ascii_chars * 0.3 + (len(text) - ascii_chars) * 0.6) + 1
+
+
+def _classify(system: str) -> str:
+    if "【口播稿】" in system:
+        return "point"
+    if "播音稿编辑" in system:
+        return "derive"
+    if "播音员" in system:
+        return "listen"
+    if "主笔" in system:
+        return "translate"
+    if "标题" in system and len(system) < 200:
+        return "title"
+    return "other"
+
+
+def _fake_output(kind: str, user: str, cfg: MockConfig) -> str:
+    digest = hashlib.sha1(user.encode("utf-8")).hexdigest()[:8]
+    if kind == "title":
+        return f"模拟标题{digest}"
+    if kind == "point":
+        # 单次请求双输出：译文与口播稿各自的长度与两次独立调用相同
+        return (
+            "【译文】\n" + _fake_output("translate", user, cfg)
+            + "\n\n【口播稿】\n" + _fake_output("listen", user, cfg)
+        )
+    # 由中文译文改写口播稿是中文到中文，输出长度与输入相当（output_ratio 描述的是英文到中文）
+    ratio = 1.0 if kind == "derive" else cfg.output_ratio
+    body_chars = int(min(cfg.max_output_chars, max(200, len(user) * ratio)))
+    sentence = "这是一段用于性能测试的模拟正文，内容本身没有意义，只用于占位和计算长度。"
+    paragraphs: List[str] = []
+    total = 0
+    while total < body_chars:
+        para = sentence * 4
+        paragraphs.append(para)
+        total += len(para)
+    if kind == "translate":
+        return f"标题：模拟译文{digest}\n\n" + "\n\n".join(paragraphs)
+    return f"标题：模拟口播稿{digest}\n\n" + "\n\n".join(paragraphs)
+
+
+class _PrefixCache:
+    """按 _CACHE_UNIT_CHARS 粒度记录见过的 prompt 前缀，估算命中的 prompt token。"""
+
+    def __init__(self, max_entries: int = 100_000):
+        self._seen: set[str] = set()
+        self._max = max_entries
+
+    def lookup_and_store(self, prompt: str) -> int:
+        hit_chars = 0
+        units = len(prompt) // _CACHE_UNIT_CHARS
+        h = hashlib.sha1()
+        keys = []
+        for i in range(units):
+            h.update(prompt[i * _CACHE_UNIT_CHARS:(i + 1) * _CACHE_UNIT_CHARS].encode("utf-8"))
+            keys.append(h.hexdigest())
+        for i, k in enumerate(keys):
+            if k in self._seen:
+                hit_chars = (i + 1) * _CACHE_UNIT_CHARS
+            else:
+                break
+        if len(self._seen) < self._max:
+            self._seen.update(keys)
+        return _estimate_tokens(prompt[:hit_chars]) if hit_chars else 0
+
+
+def create_app(cfg: Optional[MockConfig] = None) -> FastAPI:
+    cfg = cfg or MockConfig.from_env()
+    rng = random.Random(cfg.seed)
+    stats = _Stats()
+    cache = _PrefixCache()
+    app = FastAPI(title="Mock DeepSeek")
+    app.state.config = cfg
+    app.state.stats = stats
+    app.state.prefix_cache = cache
+
+    async def _sleep(seconds: float) -> None:
+        if seconds > 0 and cfg.time_scale > 0:
+            await asyncio.sleep(seconds * cfg.time_scale)
+
+    def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+        stats.count(status)
+        return JSONResponse(
+            {"error": {"message": message, "type": "mock_error", "code": status}},
+            status_code=status,
+            headers=headers,
+        )
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        stats.requests += 1
+        messages = payload.get("messages") or []
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        stream = bool(payload.get("stream"))
+        if stream:
+            stats.streaming += 1
+
+        roll = rng.random()
+        if roll < cfg.rate_429:
+            await _sleep(0.05)
+            return _error(429, "Rate limit reached for requests", {"Retry-After": f"{cfg.retry_after * (cfg.time_scale or 1.0):g}"})
+        roll -= cfg.rate_429
+        if roll < cfg.rate_5xx:
+            await _sleep(_sample_latency(cfg.latency, rng) / 2)
+            return _error(rng.choice([500, 502, 503]), "Service temporarily unavailable")
+        if rng.random() < cfg.content_risk_rate and len(user) >= cfg.content_risk_min_chars:
+            await _sleep(0.2)
+            return _error(400, "Content Exists Risk")
+
+        kind = _classify(system)
+        output = _fake_output(kind, user, cfg)
+        prompt = system + user
+        prompt_tokens = _estimate_tokens(prompt)
+        hit = min(prompt_tokens, cache.lookup_and_store(prompt))
+        completion_tokens = _estimate_tokens(output)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": hit,
+            "prompt_cache_miss_tokens": prompt_tokens - hit,
+        }
+        ttft = _sample_latency(cfg.latency, rng)
+        gen_seconds = completion_tokens / cfg.tokens_per_sec if cfg.tokens_per_sec > 0 else 0.0
+        reset = rng.random() < cfg.reset_rate
+        created = int(time.time())
+        completion_id = f"mock-{stats.requests}"
+        model = payload.get("model", "deepseek-chat")
+
+        if not stream:
+            body = json.dumps({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": output}, "finish_reason": "stop"}],
+                "usage": usage,
+            }, ensure_ascii=False).encode("utf-8")
+
+            async def _body() -> AsyncIterator[bytes]:
+                await _sleep(ttft + gen_seconds)
+                if reset:
+                    # 先发出一半响应体再中断：客户端看到的是读到一半的连接被重置
+                    stats.resets += 1
+                    yield body[: len(body) // 2]
+                    raise ConnectionResetError("mock connection reset")
+                stats.count(200)
+                stats.prompt_tokens += prompt_tokens
+                stats.completion_tokens += completion_tokens
+                stats.cache_hit_tokens += hit
+                yield body
+
+            return StreamingResponse(_body(), media_type="application/json", headers={"Content-Length": str(len(body))})
+
+        async def _events() -> AsyncIterator[bytes]:
+            await _sleep(ttft)
+            pieces = [output[i:i + 40] for i in range(0, len(output), 40)] or [""]
+            per_piece = gen_seconds / len(pieces)
+            for n, piece in enumerate(pieces):
+                if reset and n == len(pieces) // 2:
+                    stats.resets += 1
+                    raise ConnectionResetError("mock connection reset")
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+                await _sleep(per_piece)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+            stats.count(200)
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cache_hit_tokens += hit
+            yield f"data: {json.dumps(final, ensure_ascii=False)}\n\n".encode("utf-8")
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(_events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def get_stats() -> JSONResponse:
+        return JSONResponse({**stats.__dict__, "config": cfg.__dict__})
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地模拟 DeepSeek 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    defaults = MockConfig.from_env()
+    for f in fields(MockConfig):
+        flag = "--" + f.name.replace("_", "-")
+        value = getattr(defaults, f.name)
+        ftype = str if f.name == "latency" else (int if f.name in ("content_risk_min_chars", "max_output_chars", "seed") else float)
+        parser.add_argument(flag, type=ftype, default=value)
+    args = parser.parse_args()
+    cfg = MockConfig(**{f.name: getattr(args, f.name) for f in fields(MockConfig)})
+
+    import uvicorn
+
+    uvicorn.run(create_app(cfg), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""上传→下载全流程基准：在同一进程内用 uvicorn 启动模拟 DeepSeek 与后端，按规模跑各接口。
+
+用法（在 backend 目录下）：
+
+    python -m benchmarks.pipeline                          # 默认 10/50/200 篇 × 全部接口
+    python -m benchmarks.pipeline --sizes 10,50 --modes point,listen
+    python -m benchmarks.pipeline --sizes 900 --modes point     # 约 10 倍于一期真实杂志
+    python -m benchmarks.pipeline --epub ref.epub --cassette ref.jsonl --replay-speed 10  # 回放真实响应
+    python -m benchmarks.pipeline --save-baseline          # 写入 benchmarks/baselines/pipeline.json
+    python -m benchmarks.pipeline --compare                # 与基线对比，退化超过阈值时退出码为 1
+
+输入由 benchmarks.corpus 合成（含跳过栏目与脏 HTML）。每个场景报告：makespan（上传到拿到 Word
+的墙钟时间）、各阶段累计耗时（来自 /metrics 的直方图）、峰值 RSS 与事件循环延迟。基线与机器相关，应在同一台机器（或同规格 CI）上生成和对比。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 后端与客户端在导入时读取环境变量，必须在导入 main 之前准备好隔离的运行目录
+_WORKDIR = tempfile.mkdtemp(prefix="epub-bench-")
+for _k, _v in {
+    "TASK_JOURNAL_DIR": os.path.join(_WORKDIR, "journal"),
+    "USAGE_DB_PATH": os.path.join(_WORKDIR, "usage.sqlite3"),
+    "ARTICLE_INDEX_PATH": os.path.join(_WORKDIR, "article_index.sqlite3"),
+    "ARTICLE_REUSE_ENABLED": "0",
+    "HOST_LIMIT_DIR": os.path.join(_WORKDIR, "limits"),
+    "TRACE_FILE": os.path.join(_WORKDIR, "trace.jsonl"),
+    "DEEPSEEK_API_KEY": "sk-bench",
+    # 默认放宽主机速率上限，让耗时主要反映本仓库代码而不是人为限速；可用环境变量覆盖
+    "API_RATE_LIMIT": "200",
+}.items():
+    os.environ.setdefault(_k, _v)
+
+import httpx
+import uvicorn
+
+from benchmarks.corpus import generate_epub
+from benchmarks.mock_deepseek import MockConfig, create_app
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "pipeline.json")
+ALL_MODES = ("point", "listen", "read", "analyze", "translate")
+_UPLOAD_ENDPOINTS = {"point": "/api/point-me", "listen": "/api/listen-me", "read": "/api/read-me"}
+_SYNC_ENDPOINTS = {"analyze": "/api/analyze-epub", "translate": "/api/translate-epub"}
+_DOWNLOADS = {"point": ("read", "listen"), "listen": ("listen",), "read": ("read",)}
+# 与基线对比的指标及方向（越大越差）
+_REGRESSION_KEYS = ("makespan_seconds", "peak_rss_mb", "loop_lag_max_ms")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _Server:
+    """在独立线程、独立事件循环中运行一个 ASGI 应用。"""
+
+    def __init__(self, app, port: int):
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self) -> "_Server":
+        self.thread.start()
+        deadline = time.time() + 30
+        while not self.server.started:
+            if time.time() > deadline or not self.thread.is_alive():
+                raise RuntimeError(f"端口 {self.port} 上的服务启动失败")
+            time.sleep(0.02)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+class _LoopLagProbe:
+    """在后端事件循环上每 interval 秒醒来一次，记录实际醒来比预期晚了多少。"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = 0.01):
+        self.loop = loop
+        self.interval = interval
+        self.samples: List[float] = []
+        self._stop = False
+        self._future = None
+
+    async def _probe(self) -> None:
+        while not self._stop:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def __enter__(self) -> "_LoopLagProbe":
+        self._future = asyncio.run_coroutine_threadsafe(self._probe(), self.loop)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop = True
+        self._future.result(timeout=5)
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"loop_lag_p99_ms": 0.0, "loop_lag_max_ms": 0.0}
+        ordered = sorted(self.samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return {"loop_lag_p99_ms": round(p99 * 1000, 2), "loop_lag_max_ms": round(ordered[-1] * 1000, 2)}
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        # 非 Linux：只能拿到进程生命周期内的峰值（macOS 单位为字节）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class _RssSampler:
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = _rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_mb())
+
+    def __enter__(self) -> "_RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_mb())
+
+
+def _stage_totals() -> Dict[str, Tuple[int, float]]:
+    from metrics import (
+        DEEPSEEK_CALL_SECONDS,
+        DOCX_BUILD_SECONDS,
+        EPUB_EXTRACT_SECONDS,
+        QUEUE_WAIT_SECONDS,
+        RATE_LIMIT_WAIT_SECONDS,
+    )
+
+    out: Dict[str, Tuple[int, float]] = {}
+    for stage, hist in (
+        ("epub_extract", EPUB_EXTRACT_SECONDS),
+        ("queue_wait", QUEUE_WAIT_SECONDS),
+        ("rate_limit_wait", RATE_LIMIT_WAIT_SECONDS),
+        ("deepseek_call", DEEPSEEK_CALL_SECONDS),
+        ("docx_build", DOCX_BUILD_SECONDS),
+    ):
+        count, total = 0, 0.0
+        for c, s in hist.totals().values():
+            count += c
+            total += s
+        out[stage] = (count, total)
+    return out
+
+
+def _stage_delta(before: Dict[str, Tuple[int, float]], after: Dict[str, Tuple[int, float]]) -> Dict[str, dict]:
+    return {
+        stage: {"count": after[stage][0] - before[stage][0], "seconds": round(after[stage][1] - before[stage][1], 3)}
+        for stage in after
+    }
+
+
+def _run_upload(client: httpx.Client, mode: str, epub_path: str, timeout: float) -> Dict[str, Any]:
+    with open(epub_path, "rb") as f:
+        resp = client.post(_UPLOAD_ENDPOINTS[mode], files={"file": ("bench.epub", f, "application/epub+zip")})
+    resp.raise_for_status()
+    task_id = resp.json()["task_id"]
+    polls = 0
+    deadline = time.time() + timeout
+    while True:
+        status = client.get(f"/api/analyze-status/{task_id}").json()
+        polls += 1
+        if status.get("status") == "completed":
+            break
+        if status.get("status") == "error":
+            raise RuntimeError(f"{mode} 任务失败: {status.get('error')}")
+        if time.time() > deadline:
+            raise TimeoutError(f"{mode} 任务 {timeout}s 内未完成")
+        time.sleep(0.05)
+    docx_bytes = 0
+    for kind in _DOWNLOADS[mode]:
+        dl = client.get(f"/api/download/{kind}/{task_id}")
+        dl.raise_for_status()
+        docx_bytes += len(dl.content)
+    return {"task_id": task_id, "polls": polls, "docx_bytes": docx_bytes, "articles": status.get("total")}
+
+
+def _run_sync(client: httpx.Client, mode: str, epub_path: str) -> Dict[str, Any]:
+    with open(epub_path, "rb") as f:
+        resp = client.post(_SYNC_ENDPOINTS[mode], files={"file": ("bench.epub", f, "application/epub+zip")})
+    resp.raise_for_status()
+    return {"docx_bytes": len(resp.content)}
+
+
+def run_benchmarks(
+    sizes: List[int],
+    modes: List[str],
+    mock: MockConfig,
+    timeout: float = 900.0,
+    corpus_layout: str = "calibre",
+    epub_file: Optional[str] = None,
+    cassette: Optional[str] = None,
+    replay_speed: float = 1.0,
+) -> Dict[str, Any]:
+    """跑全部场景。给出 epub_file 时用该文件代替合成语料；给出 cassette 时回放录制的真实响应，不启动模拟服务。"""
+    mock_app = mock_server = None
+    if cassette:
+        os.environ.update({
+            "DEEPSEEK_CASSETTE": cassette,
+            "DEEPSEEK_CASSETTE_MODE": "replay",
+            "DEEPSEEK_CASSETTE_SPEED": str(replay_speed),
+        })
+    else:
+        mock_port = _free_port()
+        os.environ["DEEPSEEK_API_BASE"] = f"http://127.0.0.1:{mock_port}"
+        mock_app = create_app(mock)
+        mock_server = _Server(mock_app, mock_port).start()
+
+    import main  # 读取上面设置的环境变量
+    from cassette import get_cassette
+    from epub_processing import extract_articles_from_epub
+
+    def llm_counters() -> Tuple[int, Optional[int]]:
+        if mock_app is not None:
+            return mock_app.state.stats.requests, mock_app.state.stats.completion_tokens
+        st = get_cassette().stats()
+        return st["hits"] + st["fuzzy_hits"] + st["misses"], None
+
+    if epub_file:
+        label = os.path.splitext(os.path.basename(epub_file))[0]
+        inputs = [(label, epub_file, len(extract_articles_from_epub(epub_file)))]
+    else:
+        inputs = []
+        for size in sizes:
+            path = os.path.join(_WORKDIR, f"bench_{size}.epub")
+            generate_epub(path, size, layout=corpus_layout, seed=size)
+            inputs.append((str(size), path, size))
+
+    app_server = _Server(main.app, _free_port()).start()
+    scenarios: Dict[str, Any] = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{app_server.port}", timeout=timeout) as client:
+            for label, epub_path, size in inputs:
+                for mode in modes:
+                    name = f"{mode}-{label}"
+                    llm_before = llm_counters()
+                    before = _stage_totals()
+                    with _RssSampler() as rss, _LoopLagProbe(app_server.loop) as lag:
+                        start = time.perf_counter()
+                        if mode in _UPLOAD_ENDPOINTS:
+                            detail = _run_upload(client, mode, epub_path, timeout)
+                        else:
+                            detail = _run_sync(client, mode, epub_path)
+                        makespan = time.perf_counter() - start
+                    llm_after = llm_counters()
+                    scenarios[name] = {
+                        "mode": mode,
+                        "articles": size,
+                        "makespan_seconds": round(makespan, 3),
+                        "articles_per_sec": round(size / makespan, 2) if makespan else None,
+                        "peak_rss_mb": round(rss.peak, 1),
+                        **lag.summary(),
+                        "stages": _stage_delta(before, _stage_totals()),
+                        "llm_requests": llm_after[0] - llm_before[0],
+                        "llm_completion_tokens": (
+                            llm_after[1] - llm_before[1] if llm_after[1] is not None else None
+                        ),
+                        **{k: v for k, v in detail.items() if k != "task_id"},
+                    }
+                    print(_format_row(name, scenarios[name]), flush=True)
+                    main._results_store.pop(detail.get("task_id"), None)  # 不让前面场景的结果占着内存
+    finally:
+        app_server.stop()
+        if mock_server is not None:
+            mock_server.stop()
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "settings": {
+            "mock": None if cassette else mock.__dict__,
+            "cassette": get_cassette().stats() if cassette else None,
+            "MAX_PARALLEL_TASKS": main.MAX_PARALLEL_TASKS,
+            "API_RATE_LIMIT": main.API_RATE_LIMIT,
+            "corpus_layout": corpus_layout,
+        },
+        "scenarios": scenarios,
+    }
+
+
+def _format_row(name: str, s: Dict[str, Any]) -> str:
+    stages = " ".join(f"{k}={v['seconds']}s" for k, v in s["stages"].items() if v["count"])
+    return (
+        f"{name:<16} makespan={s['makespan_seconds']:.2f}s rss={s['peak_rss_mb']}MB "
+        f"lag_p99={s['loop_lag_p99_ms']}ms lag_max={s['loop_lag_max_ms']}ms llm={s['llm_requests']} | {stages}"
+    )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """返回退化说明列表：指标比基线差超过 tolerance（比例）即算退化；延迟类小于 5ms 的波动忽略。"""
+    problems = []
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for key in _REGRESSION_KEYS:
+            old, new = base.get(key), cur.get(key)
+            if old is None or new is None:
+                continue
+            if key == "loop_lag_max_ms" and new - old < 5:
+                continue
+            if old > 0 and (new - old) / old > tolerance:
+                problems.append(f"{name}: {key} {old} → {new}（+{(new - old) / old:.0%}）")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="上传→下载全流程基准")
+    parser.add_argument("--sizes", default="10,50,200", help="每本 EPUB 的文章数，逗号分隔")
+    parser.add_argument("--modes", default=",".join(ALL_MODES), help=f"要跑的接口：{','.join(ALL_MODES)}")
+    parser.add_argument("--latency", default="lognormal:1.5,0.5", help="模拟首 token 延迟分布（见 mock_deepseek）")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="模拟服务的时间缩放，默认加速 50 倍")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--layout", default="calibre", help="合成 EPUB 的目录布局（见 benchmarks.corpus）")
+    parser.add_argument("--epub", help="改用指定的 EPUB（例如录制 cassette 时用的参考期刊），忽略 --sizes")
+    parser.add_argument("--cassette", help="回放该 cassette 中录制的真实响应，代替模拟服务")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="回放速度倍数，0 表示不等待")
+    parser.add_argument("--timeout", type=float, default=900.0)
+    parser.add_argument("--output", help="结果 JSON 写入路径")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写为基线")
+    parser.add_argument("--compare", action="store_true", help="与基线对比，有退化时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许的退化比例")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(ALL_MODES)
+    if unknown:
+        parser.error(f"未知接口: {', '.join(sorted(unknown))}")
+    mock = MockConfig(latency=args.latency, tokens_per_sec=args.tokens_per_sec, time_scale=args.time_scale, seed=args.seed)
+    result = run_benchmarks(
+        [int(s) for s in args.sizes.split(",") if s.strip()], modes, mock, args.timeout, args.layout,
+        epub_file=args.epub, cassette=args.cassette, replay_speed=args.replay_speed,
+    )
+
+    payload = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(payload)
+        print(f"基线已写入 {args.baseline}")
+    if args.compare:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"找不到基线 {args.baseline}，先用 --save-baseline 生成", file=sys.stderr)
+            sys.exit(2)
+        problems = compare(result, baseline, args.tolerance)
+        if problems:
+            print("性能退化：", file=sys.stderr)
+            for p in problems:
+                print(f"  {p}", file=sys.stderr)
+            sys.exit(1)
+        print(f"与基线相比无超过 {args.tolerance:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
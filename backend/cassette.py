@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+# DeepSeek 请求录制/回放：录制时把真实响应（含耗时与 token 用量）追加到 cassette 文件（每行一个 JSON），
+# 回放时按请求内容匹配并按录制的耗时（可加速）返回，整条流水线不发任何真实请求。
+DEEPSEEK_CASSETTE = os.getenv("DEEPSEEK_CASSETTE", "").strip()
+# record / replay；未设置 DEEPSEEK_CASSETTE 时不生效
+DEEPSEEK_CASSETTE_MODE = os.getenv("DEEPSEEK_CASSETTE_MODE", "replay").strip().lower()
+# 回放速度倍数：1 = 按录制耗时，10 = 快 10 倍，0 = 不等待
+DEEPSEEK_CASSETTE_SPEED = float(os.getenv("DEEPSEEK_CASSETTE_SPEED", "1"))
+
+
+def _request_keys(body: bytes) -> Tuple[str, str]:
+    """(完整请求键, 仅用户消息键)。后者用于 prompt 改动后仍能按文章匹配到录制结果。"""
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        payload = {}
+    messages = payload.get("messages") or []
+    full = json.dumps(
+        {"messages": messages, "temperature": payload.get("temperature")}, ensure_ascii=False, sort_keys=True
+    )
+    user = json.dumps([m.get("content") for m in messages if m.get("role") == "user"], ensure_ascii=False)
+    return (
+        hashlib.sha256(full.encode("utf-8")).hexdigest(),
+        hashlib.sha256(user.encode("utf-8")).hexdigest(),
+    )
+
+
+class Cassette:
+    """一个 cassette 文件。同一请求录到多条（例如先 429 再 200）时按顺序回放，用完后循环。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[dict]] = {}
+        self._by_user: Dict[str, List[dict]] = {}
+        self._cursor: Dict[str, int] = {}
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 录制中途被杀时的半行
+                    self._by_key.setdefault(entry["key"], []).append(entry)
+                    self._by_user.setdefault(entry["user_key"], []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._by_key.values())
+
+    def lookup(self, body: bytes) -> Optional[dict]:
+        key, user_key = _request_keys(body)
+        with self._lock:
+            entries, cursor_key = self._by_key.get(key), key
+            if entries:
+                self.hits += 1
+            else:
+                entries, cursor_key = self._by_user.get(user_key), "u:" + user_key
+                if not entries:
+                    self.misses += 1
+                    return None
+                self.fuzzy_hits += 1
+            i = self._cursor.get(cursor_key, 0)
+            self._cursor[cursor_key] = i + 1
+            return entries[i % len(entries)]
+
+    def record(self, body: bytes, status: int, headers: httpx.Headers, content: bytes, seconds: float) -> None:
+        key, user_key = _request_keys(body)
+        try:
+            response: Any = json.loads(content)
+        except ValueError:
+            response = content.decode("utf-8", errors="replace")
+        try:
+            model = json.loads(body).get("model")
+        except ValueError:
+            model = None
+        entry = {
+            "key": key,
+            "user_key": user_key,
+            "model": model,
+            "status": status,
+            "retry_after": headers.get("retry-after"),
+            "seconds": round(seconds, 3),
+            "response": response,
+            "recorded_at": round(time.time(), 3),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._by_key.setdefault(key, []).append(entry)
+            self._by_user.setdefault(user_key, []).append(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": len(self),
+                "hits": self.hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+            }
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """包在真实传输层外，把每次响应连同耗时写入 cassette。"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, cassette: Cassette):
+        self._inner = inner
+        self._cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        start = time.perf_counter()
+        response = await self._inner.handle_async_request(request)
+        content = await response.aread()
+        seconds = time.perf_counter() - start
+        self._cassette.record(body, response.status_code, response.headers, content, seconds)
+        return httpx.Response(
+            response.status_code, headers=response.headers, content=content,
+            request=request, extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """不联网，按请求内容从 cassette 取录制的响应，按录制耗时 / speed 等待后返回。"""
+
+    def __init__(self, cassette: Cassette, speed: float = DEEPSEEK_CASSETTE_SPEED):
+        self._cassette = cassette
+        self._speed = speed
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        entry = self._cassette.lookup(body)
+        if entry is None:
+            # 400 不会被重试，调用方立即得到明确的错误
+            return httpx.Response(
+                400, json={"error": {"message": "cassette 中没有该请求的录制结果", "type": "cassette_miss"}},
+                request=request,
+            )
+        if self._speed > 0 and entry.get("seconds"):
+            await asyncio.sleep(entry["seconds"] / self._speed)
+        headers = {"Retry-After": entry["retry_after"]} if entry.get("retry_after") else None
+        response = entry["response"]
+        if isinstance(response, str):
+            return httpx.Response(entry["status"], text=response, headers=headers, request=request)
+        return httpx.Response(entry["status"], json=response, headers=headers, request=request)
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """全局 cassette（各执行器线程的客户端共用一份，回放游标与录制文件一致）；未配置时返回 None。"""
+    global _cassette
+    if not DEEPSEEK_CASSETTE:
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(DEEPSEEK_CASSETTE)
+    return _cassette
+
+
+def cassette_transport(inner_factory) -> Optional[httpx.AsyncBaseTransport]:
+    """按配置返回录制/回放传输层；未启用时返回 None（使用 httpx 默认传输）。
+    inner_factory() 创建真实传输层，仅录制模式需要。"""
+    cassette = get_cassette()
+    if cassette is None:
+        return None
+    if DEEPSEEK_CASSETTE_MODE == "record":
+        return RecordingTransport(inner_factory(), cassette)
+    if DEEPSEEK_CASSETTE_MODE == "replay":
+        return ReplayTransport(cassette)
+    raise ValueError(f"DEEPSEEK_CASSETTE_MODE 只能是 record 或 replay，当前为 {DEEPSEEK_CASSETTE_MODE!r}")
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+# 自适应并发上限（默认关闭）：按 DeepSeek 的实测延迟与错误调整本进程同时在途的文章数，
+# MAX_PARALLEL_TASKS 只作为上限（以及主机级槽位数）。关闭时退回固定的 MAX_PARALLEL_TASKS。
+ADAPTIVE_CONCURRENCY_ENABLED = os.getenv("ADAPTIVE_CONCURRENCY_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+ADAPTIVE_CONCURRENCY_MIN = int(os.getenv("ADAPTIVE_CONCURRENCY_MIN", "2"))
+# 近期延迟超过无负载基线的该倍数才开始收缩（容忍正常波动与少量排队）
+ADAPTIVE_CONCURRENCY_TOLERANCE = float(os.getenv("ADAPTIVE_CONCURRENCY_TOLERANCE", "1.5"))
+# 上限的平滑系数：每完成约“上限”个请求（一轮）向新目标靠近该比例
+ADAPTIVE_CONCURRENCY_SMOOTHING = float(os.getenv("ADAPTIVE_CONCURRENCY_SMOOTHING", "0.2"))
+# 429/5xx/超时时上限乘以该系数（每秒最多一次）
+ADAPTIVE_CONCURRENCY_BACKOFF = float(os.getenv("ADAPTIVE_CONCURRENCY_BACKOFF", "0.9"))
+
+# 延迟按每千字符 prompt 归一化，短请求（标题翻译）按至少这么长计
+_MIN_SIZE_CHARS = 1000
+_SHORT_ALPHA = 0.2  # 约最近 10 个样本
+_BACKOFF_INTERVAL = 1.0
+
+
+def _is_drop(status_code: int) -> bool:
+    """上游过载信号：限流、服务端错误、连接错误/超时（0）。"""
+    return status_code == 0 or status_code == 429 or status_code >= 500
+
+
+class AdaptiveConcurrencyLimit:
+    """Gradient/Vegas 式并发控制：gradient = 容忍倍数 × 基线延迟 / 近期延迟（截断到 [0.5, 1]），
+    新上限 = 上限 × gradient + sqrt(上限)。延迟接近基线时上限缓慢上探，上游排队使延迟上升时按比例收缩，
+    出现 429/5xx/超时则直接乘性退避。在途请求不足上限一半时不上探（瓶颈不在上游）。
+    各执行器线程在各自的事件循环里回报样本，由线程锁保护；公平队列在主循环里读取 limit。"""
+
+    def __init__(self, initial: int, min_limit: int = ADAPTIVE_CONCURRENCY_MIN, max_limit: Optional[int] = None):
+        self.max_limit = max(1, max_limit or initial)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._short: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._last_backoff = 0.0
+        self.samples = 0
+        self.drops = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def begin(self) -> None:
+        with self._lock:
+            self._inflight += 1
+
+    def abandon(self) -> None:
+        """请求被取消（如对冲落败），不产生样本。"""
+        with self._lock:
+            self._inflight = max(0, self._inflight - 1)
+
+    def end(self, status_code: int, seconds: float, size: int) -> None:
+        with self._lock:
+            inflight = self._inflight
+            self._inflight = max(0, self._inflight - 1)
+            if _is_drop(status_code):
+                self.drops += 1
+                now = time.monotonic()
+                if now - self._last_backoff >= _BACKOFF_INTERVAL:
+                    self._last_backoff = now
+                    self._limit = max(self.min_limit, self._limit * ADAPTIVE_CONCURRENCY_BACKOFF)
+                return
+            if not 200 <= status_code < 300:
+                return  # 其他 4xx 与负载无关
+            self.samples += 1
+            rtt = seconds / (max(size, _MIN_SIZE_CHARS) / 1000.0)
+            if self._short is None:
+                self._short = self._baseline = rtt
+                return
+            self._short += _SHORT_ALPHA * (rtt - self._short)
+            # 无负载基线取平滑延迟的最小值；上限已降到下限时并发最低，此时的延迟即新的基线
+            # （上游整体变慢后不会一直被旧基线压在下限）
+            if self._limit <= self.min_limit:
+                self._baseline = self._short
+            else:
+                self._baseline = min(self._baseline, self._short)
+            gradient = max(0.5, min(1.0, ADAPTIVE_CONCURRENCY_TOLERANCE * self._baseline / self._short))
+            if gradient >= 1.0 and inflight < self._limit / 2:
+                return
+            new_limit = self._limit * gradient + math.sqrt(self._limit)
+            # 每个样本只走 1/上限 步：在途越多样本越密，按轮而不是按样本调整
+            step = ADAPTIVE_CONCURRENCY_SMOOTHING / self._limit
+            self._limit = min(self.max_limit, max(self.min_limit, self._limit + step * (new_limit - self._limit)))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "min": self.min_limit,
+                "max": self.max_limit,
+                "inflight_requests": self._inflight,
+                "short_rtt_per_kchar_s": round(self._short, 3) if self._short is not None else None,
+                "baseline_rtt_per_kchar_s": round(self._baseline, 3) if self._baseline is not None else None,
+                "samples": self.samples,
+                "drops": self.drops,
+            }
+
+
+_controller: Optional[AdaptiveConcurrencyLimit] = None
+_controller_lock = threading.Lock()
+
+
+def get_concurrency_limit() -> Optional[AdaptiveConcurrencyLimit]:
+    """本进程的自适应并发控制器；未启用时返回 None。上限取 MAX_PARALLEL_TASKS。"""
+    global _controller
+    if not ADAPTIVE_CONCURRENCY_ENABLED:
+        return None
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                max_parallel = int(os.getenv("MAX_PARALLEL_TASKS", "10"))
+                _controller = AdaptiveConcurrencyLimit(max_parallel, max_limit=max_parallel)
+    return _controller
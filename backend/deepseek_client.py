@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import hashlib
 import os
+import re
 import time
 import asyncio
 import threading
@@ -9,7 +11,12 @@ from typing import Optional, List, Dict, Any
 from dataclasses import dataclass
 import json
 
+from cassette import cassette_transport
+from concurrency import get_concurrency_limit
 from epub_processing import Article, get_audio_script_skip_rules_text
+from hedging import HedgeBudget, hedged_call
+from key_pool import KeyPoolExhausted, get_key_pool
+from metrics import DEEPSEEK_RESPONSES, DEEPSEEK_RETRIES
 
 DEEPSEEK_API_BASE = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com")
 DEEPSEEK_MODEL: str = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
@@ -33,11 +40,40 @@ class RequestConfig:
     retry_delay: float = 2.0
 
 
+@dataclass
+class TokenUsage:
+    """累计一次（或多次降级重试）调用的 usage；DeepSeek 另外返回前缀缓存命中/未命中的 prompt token。"""
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    prompt_cache_hit_tokens: int = 0
+    prompt_cache_miss_tokens: int = 0
+
+    def add(self, usage: Optional[Dict[str, Any]]) -> None:
+        self.requests += 1
+        usage = usage or {}
+        self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+        self.completion_tokens += int(usage.get("completion_tokens") or 0)
+        self.prompt_cache_hit_tokens += int(usage.get("prompt_cache_hit_tokens") or 0)
+        self.prompt_cache_miss_tokens += int(usage.get("prompt_cache_miss_tokens") or 0)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "prompt_cache_hit_tokens": self.prompt_cache_hit_tokens,
+            "prompt_cache_miss_tokens": self.prompt_cache_miss_tokens,
+        }
+
+
 class DeepSeekClient:
     """DeepSeek API客户端，支持连接复用和批量处理"""
 
     def __init__(self, api_key: str, base_url: Optional[str] = None, max_connections: int = DEEPSEEK_MAX_CONNECTIONS):
         self.api_key = api_key
+        # api_key 属于配置的 Key 池时，每次请求由池分配实际使用的 Key
+        self.key_pool = get_key_pool(api_key)
         self.base_url = (base_url or DEEPSEEK_API_BASE).rstrip('/')
         self.max_connections = max_connections
 
@@ -53,10 +89,13 @@ class DeepSeekClient:
             pool=30.0
         )
 
+        # 配置了 DEEPSEEK_CASSETTE 时录制或回放请求（回放不联网）；传入 transport 后 limits/http2 需交给它
+        transport = cassette_transport(lambda: httpx.AsyncHTTPTransport(limits=limits, http2=True))
         self._client = httpx.AsyncClient(
             limits=limits,
             timeout=timeout,
-            http2=True  # 启用HTTP/2以提高性能
+            http2=True,  # 启用HTTP/2以提高性能
+            transport=transport,
         )
 
     async def __aenter__(self):
@@ -81,10 +120,6 @@ class DeepSeekClient:
         """执行API请求，支持指数退避重试"""
         config = config or RequestConfig()
         url = f"{self.base_url}/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
 
         # 构建消息列表，如果提供了系统消息则添加
         msg_list = []
@@ -98,23 +133,84 @@ class DeepSeekClient:
             "temperature": temperature,
         }
 
+        # 自适应并发控制器按每次 HTTP 往返的耗时与状态调整上限（延迟按 prompt 长度归一化）
+        controller = get_concurrency_limit()
+        size = sum(len(m["content"]) for m in msg_list)
+
         last_exc = None
         for attempt in range(config.max_retries):
+            api_key = self.api_key
+            if self.key_pool is not None:
+                try:
+                    api_key = await self.key_pool.acquire()
+                except KeyPoolExhausted as e:
+                    raise DeepSeekError(str(e)) from e
+            # 每次借出的 Key 恰好归还一次：任何路径（含解析失败、未预期的异常、取消）都不能漏掉，
+            # 否则该 Key 的在途计数永远不减，池子逐渐失去容量
+            released = self.key_pool is None
+
+            def release(status: int, tokens: int = 0, retry_after: Optional[float] = None) -> None:
+                nonlocal released
+                if not released:
+                    released = True
+                    self.key_pool.release(api_key, status, tokens, retry_after=retry_after)
+
+            headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            }
+            status_code = 0
+            sent_at = time.perf_counter()
+            if controller is not None:
+                controller.begin()
             try:
-                response = await self._client.post(
-                    url,
-                    json=payload,
-                    headers=headers,
-                    timeout=config.timeout
-                )
+                try:
+                    response = await self._client.post(
+                        url,
+                        json=payload,
+                        headers=headers,
+                        timeout=config.timeout
+                    )
+                except asyncio.CancelledError:
+                    # 对冲请求中落败的一份会被取消：归还 Key，否则在途计数一直不减
+                    release(499)
+                    if controller is not None:
+                        controller.abandon()
+                    raise
+                except Exception:
+                    if controller is not None:
+                        controller.end(0, time.perf_counter() - sent_at, size)
+                    raise
+                if controller is not None:
+                    controller.end(response.status_code, time.perf_counter() - sent_at, size)
+                status_code = response.status_code
+                DEEPSEEK_RESPONSES.inc(status=str(status_code))
 
                 if response.status_code == 200:
-                    return response.json()
-                elif response.status_code in [429, 500, 502, 503, 504]:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        # 200 但响应体不是完整 JSON（截断等）
+                        raise DeepSeekError(f"解析 DeepSeek 响应失败: {e}") from e
+                    if not isinstance(data, dict):
+                        raise DeepSeekError(f"DeepSeek 响应格式异常: {response.text[:200]}")
+                    usage = data.get("usage") or {}
+                    release(200, int(usage.get("total_tokens") or 0))
+                    return data
+                release(status_code, retry_after=_parse_retry_after(response))
+                # 有其他健康 Key 时，限流/鉴权失败立即换 Key 重试，不做退避
+                switch_key = (
+                    self.key_pool is not None
+                    and status_code in (401, 403, 429)
+                    and self.key_pool.has_alternative(api_key)
+                )
+                if response.status_code in [429, 500, 502, 503, 504] or switch_key:
                     # 可重试的错误
                     if attempt < config.max_retries - 1:
-                        delay = config.retry_delay * (2 ** attempt)  # 指数退避
-                        await asyncio.sleep(delay)
+                        DEEPSEEK_RETRIES.inc(status=str(status_code))
+                        if not switch_key:
+                            delay = config.retry_delay * (2 ** attempt)  # 指数退避
+                            await asyncio.sleep(delay)
                         continue
                     else:
                         raise DeepSeekError(f"API返回错误状态码 {response.status_code}: {response.text}")
@@ -123,13 +219,20 @@ class DeepSeekClient:
                     raise DeepSeekError(f"API返回错误状态码 {response.status_code}: {response.text}")
 
             except (httpx.HTTPError, asyncio.TimeoutError) as e:
+                if status_code == 0:
+                    DEEPSEEK_RESPONSES.inc(status="0")
+                    release(0)
                 last_exc = e
                 if attempt < config.max_retries - 1:
+                    DEEPSEEK_RETRIES.inc(status="0")
                     delay = config.retry_delay * (2 ** attempt)
                     await asyncio.sleep(delay)
                     continue
                 else:
                     raise DeepSeekError(f"调用DeepSeek失败: {e}") from e
+            finally:
+                # 走到这里仍未归还说明是解析失败或未预期的异常：按无结果归还
+                release(0)
 
         if last_exc is not None:
             raise DeepSeekError(f"调用DeepSeek失败: {last_exc}")
@@ -173,6 +276,14 @@ class DeepSeekClient:
         return final_results
 
 
+def _parse_retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
 def _run_async_in_sync_context(coro):
     """在同步上下文中运行异步协程"""
     try:
@@ -186,14 +297,11 @@ def _run_async_in_sync_context(coro):
         return loop.run_until_complete(coro)
     except RuntimeError as e:
         if "There is no current event loop in thread" in str(e) or "no running event loop" in str(e):
-            # 当前线程没有事件循环，创建新的
+            # 当前线程没有事件循环，创建新的。不要在用完后关闭：线程局部的 httpx 客户端把连接池
+            # 绑定在这个循环上，关掉后同一线程的下一次调用会报 "Event loop is closed"
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            try:
-                return loop.run_until_complete(coro)
-            finally:
-                if not loop.is_closed():
-                    loop.close()
+            return loop.run_until_complete(coro)
         else:
             raise
     except Exception as e:
@@ -212,6 +320,36 @@ class DeepSeekError(Exception):
     """封装 DeepSeek 相关错误。"""
 
 
+class CancelToken:
+    """跨线程取消一次 DeepSeek 调用：调用在执行器线程自己的事件循环里进行，主循环中的协程被取消时
+    调用 cancel()，把线程里正在进行的请求（含对冲、重试等待）一并取消，Key 与连接立即归还。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def bind(self, task: asyncio.Task) -> None:
+        """在执行器线程的事件循环内登记当前请求；已被取消时立即取消。"""
+        with self._lock:
+            self._loop, self._task = task.get_loop(), task
+            cancelled = self._cancelled
+        if cancelled:
+            task.cancel()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            loop, task = self._loop, self._task
+        if loop is not None and task is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
+
+
 def get_deepseek_client(api_key: str, base_url: Optional[str] = None) -> DeepSeekClient:
     """获取或创建DeepSeekClient实例（线程局部单例模式）"""
     key = (api_key, base_url or DEEPSEEK_API_BASE)
@@ -289,16 +427,24 @@ AUDIO_SCRIPT_SYSTEM_MESSAGE = f"""# Role
 清晰、从容、讲述感强。就像一位知识渊博的朋友坐在副驾驶，把这篇文章一字不落地讲给你听。"""
 
 
+# user prompt 中固定不变的说明放在最前、文章相关内容（标题、正文）放在最后：DeepSeek 对
+# 逐字节相同的前缀（system + user 开头）做上下文缓存，命中部分计费更低、首 token 更快。
+_AUDIO_SCRIPT_USER_PREFIX = (
+    "请将以下英文文章转化为中文口播逐字稿。"
+    "若下方给出了原标题，口播稿首行标题请将其译为中文后填写。\n\n"
+)
+
+
 def _build_audio_script_prompt(article: Article, index: int, total: int) -> str:
-    """构建口播逐字稿用的 user prompt：简要说明 + 原标题 + 原文。"""
+    """构建口播逐字稿用的 user prompt：固定说明 + 原标题 + 原文。"""
     content = article.content
     if len(content) > MAX_CONTENT_CHARS:
         content = content[:MAX_CONTENT_CHARS] + "\n\n[... 原文过长已截断 ...]"
     title_hint = ""
     if article.title and article.title.strip():
-        title_hint = f"本文原标题（口播稿首行标题请译为中文后填写）：{article.title.strip()}\n\n"
+        title_hint = f"原标题：{article.title.strip()}\n\n"
     return (
-        "请将以下英文文章转化为中文口播逐字稿。\n\n"
+        f"{_AUDIO_SCRIPT_USER_PREFIX}"
         f"{title_hint}"
         "待转化的英文原文：\n\n"
         f"{content}"
@@ -337,15 +483,20 @@ TRANSLATE_SYSTEM_MESSAGE = """# Role
 客观、冷静、专业，兼具深度与可读性。"""
 
 
+_TRANSLATE_USER_PREFIX = (
+    "请将以下英文文章翻译成中文。\n\n"
+    "请严格按照 Output Format 输出：标题、正文、译者注（如有）。\n\n"
+    "待翻译的英文原文：\n\n"
+)
+
+
 def _build_translate_prompt(article: Article, index: int, total: int) -> str:
     """构建全文翻译用的 user prompt：简要说明 + 原文。"""
     content = article.content
     if len(content) > MAX_CONTENT_CHARS:
         content = content[:MAX_CONTENT_CHARS] + "\n\n[... 原文过长已截断 ...]"
     return (
-        "请将以下英文文章翻译成中文。\n\n"
-        "请严格按照 Output Format 输出：标题、正文、译者注（如有）。\n\n"
-        "待翻译的英文原文：\n\n"
+        f"{_TRANSLATE_USER_PREFIX}"
         f"{content}"
     )
 
@@ -355,21 +506,38 @@ def _do_api_call_with_system(
     user_content: str,
     api_key: str,
     timeout_seconds: float,
+    usage: Optional[TokenUsage] = None,
+    hedge: Optional[HedgeBudget] = None,
+    kind: str = "",
+    cancel: Optional[CancelToken] = None,
 ) -> tuple[int, str]:
-    """执行 API 调用，使用指定的 system message，返回 (status_code, response_text)。连接中断时自动重试。"""
+    """执行 API 调用，使用指定的 system message，返回 (status_code, response_text)。连接中断时自动重试。
+    传入 usage 时把成功响应的 token 用量累加进去；传入 hedge 时对长尾请求发起对冲（kind 区分耗时统计）；
+    cancel 被取消时中断请求并抛出 asyncio.CancelledError。"""
     # 使用新的异步客户端，但在同步上下文中运行
     async def _async_call():
+        if cancel is not None:
+            cancel.bind(asyncio.current_task())
         config = RequestConfig(timeout=timeout_seconds)
         client = get_deepseek_client(api_key)
         try:
             # 直接使用_make_request获取原始API响应
             messages = [{"role": "user", "content": user_content}]
-            response_data = await client._make_request(
-                messages=messages,
-                system_message=system_msg,
-                temperature=0.7,
-                config=config
-            )
+
+            def _request():
+                return client._make_request(
+                    messages=messages,
+                    system_message=system_msg,
+                    temperature=0.7,
+                    config=config
+                )
+
+            if hedge is None:
+                response_data = await _request()
+            else:
+                response_data = await hedged_call(_request, kind, len(user_content), hedge)
+            if usage is not None:
+                usage.add(response_data.get("usage"))
             # 返回状态码200和JSON字符串
             return (200, json.dumps(response_data))
         except DeepSeekError as e:
@@ -411,8 +579,12 @@ def analyze_article_with_deepseek(
     total: int,
     api_key: str,
     timeout_seconds: float = 120.0,
+    usage: Optional[TokenUsage] = None,
+    hedge: Optional[HedgeBudget] = None,
+    cancel: Optional[CancelToken] = None,
 ) -> str:
-    """调用 DeepSeek 对单篇文章生成口播逐字稿（听我），返回中文口播稿文本。"""
+    """调用 DeepSeek 对单篇文章生成口播逐字稿（听我），返回中文口播稿文本。usage 非空时累加 token 用量，
+    hedge 非空时允许对长尾请求发起对冲，cancel 用于从主循环取消。"""
     if not api_key:
         raise DeepSeekError("缺少 DeepSeek API Key。")
 
@@ -433,7 +605,7 @@ def analyze_article_with_deepseek(
         try:
             user_prompt = _build_audio_script_prompt(art, index, total)
             status_code, resp_text = _do_api_call_with_system(
-                AUDIO_SCRIPT_SYSTEM_MESSAGE, user_prompt, api_key, timeout_seconds
+                AUDIO_SCRIPT_SYSTEM_MESSAGE, user_prompt, api_key, timeout_seconds, usage, hedge, "listen", cancel
             )
         except httpx.HTTPError as exc:
             raise DeepSeekError(f"调用 DeepSeek 失败：{exc}") from exc
@@ -453,20 +625,58 @@ def analyze_article_with_deepseek(
         raise DeepSeekError(f"DeepSeek 返回错误状态码 {status_code}: {last_error}")
 
 
+TITLE_SYSTEM_MESSAGE = "你是一名专业翻译。请将用户给出的英文文章标题翻译成简洁、准确的中文标题。只输出翻译结果，不要引号、不要解释。"
+_TITLE_USER_PREFIX = "请将以下文章标题翻译为中文：\n\n"
+
+
+def prompt_cache_layout() -> Dict[str, int]:
+    """各类请求在不同文章之间逐字节相同的前缀长度（system + user，按字符），用于确认 prompt 布局。
+    DeepSeek 以 64 token 为单位缓存前缀，该值越接近整个固定部分的长度越好。"""
+    a = Article(title="Alpha headline", content="First article body.")
+    b = Article(title="Beta headline", content="Second article body.")
+
+    def _common(system: str, x: str, y: str) -> int:
+        n = 0
+        for cx, cy in zip(x, y):
+            if cx != cy:
+                break
+            n += 1
+        return len(system) + n
+
+    return {
+        "listen": _common(
+            AUDIO_SCRIPT_SYSTEM_MESSAGE, _build_audio_script_prompt(a, 1, 2), _build_audio_script_prompt(b, 2, 2)
+        ),
+        "translate": _common(
+            TRANSLATE_SYSTEM_MESSAGE, _build_translate_prompt(a, 1, 2), _build_translate_prompt(b, 2, 2)
+        ),
+        "title": _common(TITLE_SYSTEM_MESSAGE, _TITLE_USER_PREFIX + a.title, _TITLE_USER_PREFIX + b.title),
+        "point": _common(
+            DUAL_OUTPUT_SYSTEM_MESSAGE, _build_dual_output_prompt(a, 1, 2), _build_dual_output_prompt(b, 2, 2)
+        ),
+        "derive": _common(
+            AUDIO_FROM_TRANSLATION_SYSTEM_MESSAGE,
+            _build_audio_from_translation_prompt(a.content),
+            _build_audio_from_translation_prompt(b.content),
+        ),
+    }
+
+
 def translate_title_to_chinese(
     title: str,
     api_key: str,
     timeout_seconds: float = 10.0,
+    usage: Optional[TokenUsage] = None,
+    cancel: Optional[CancelToken] = None,
 ) -> str:
     """将英文文章标题翻译为中文，仅返回中文标题。用于口播稿标题兜底。"""
     if not api_key:
         raise DeepSeekError("缺少 DeepSeek API Key。")
     if not title or not title.strip():
         return title or ""
-    system_msg = "你是一名专业翻译。请将用户给出的英文文章标题翻译成简洁、准确的中文标题。只输出翻译结果，不要引号、不要解释。"
-    user_content = f"请将以下文章标题翻译为中文：\n\n{title.strip()}"
+    user_content = f"{_TITLE_USER_PREFIX}{title.strip()}"
     status_code, resp_text = _do_api_call_with_system(
-        system_msg, user_content, api_key, timeout_seconds
+        TITLE_SYSTEM_MESSAGE, user_content, api_key, timeout_seconds, usage, cancel=cancel
     )
     if status_code != 200:
         return title.strip()
@@ -484,14 +694,18 @@ def translate_article_with_deepseek(
     total: int,
     api_key: str,
     timeout_seconds: float = 180.0,
+    usage: Optional[TokenUsage] = None,
+    hedge: Optional[HedgeBudget] = None,
+    cancel: Optional[CancelToken] = None,
 ) -> str:
-    """调用 DeepSeek 对单篇文章进行全文翻译，返回含标题、正文、译者注的中文文本。"""
+    """调用 DeepSeek 对单篇文章进行全文翻译，返回含标题、正文、译者注的中文文本。usage 非空时累加 token 用量，
+    hedge 非空时允许对长尾请求发起对冲，cancel 用于从主循环取消。"""
     if not api_key:
         raise DeepSeekError("缺少 DeepSeek API Key。")
 
     user_prompt = _build_translate_prompt(article, index, total)
     status_code, resp_text = _do_api_call_with_system(
-        TRANSLATE_SYSTEM_MESSAGE, user_prompt, api_key, timeout_seconds
+        TRANSLATE_SYSTEM_MESSAGE, user_prompt, api_key, timeout_seconds, usage, hedge, "translate", cancel
     )
 
     if status_code != 200:
@@ -503,3 +717,150 @@ def translate_article_with_deepseek(
     except Exception as exc:
         raise DeepSeekError(f"解析 DeepSeek 响应失败：{exc}") from exc
 
+
+
+# point-me 单次请求双输出（POINT_ME_DUAL_OUTPUT，见 main）：
+# combined = 一次调用同时输出译文与口播稿，英文原文只发送一次；
+# derived = 先翻译，再把中文译文改写为口播稿（较短的 system message，输入为中文译文而不是英文原文）
+_DUAL_TRANSLATION_MARKER = "【译文】"
+_DUAL_SCRIPT_MARKER = "【口播稿】"
+
+DUAL_OUTPUT_SYSTEM_MESSAGE = f"""你需要对用户给出的同一篇英文文章一次完成两项任务，并严格按以下格式输出两部分：
+
+{_DUAL_TRANSLATION_MARKER}
+（按「任务一」的要求输出的全文翻译：标题、正文、译者注）
+
+{_DUAL_SCRIPT_MARKER}
+（按「任务二」的要求输出的口播逐字稿）
+
+两个标记各占一行、顺序固定，标记之外不要输出任何说明。若按任务二的跳过规则不生成口播正文，{_DUAL_SCRIPT_MARKER}部分只输出一行【不生成口播稿】，译文照常输出。
+
+## 任务一：全文翻译
+{TRANSLATE_SYSTEM_MESSAGE}
+
+## 任务二：口播逐字稿
+{AUDIO_SCRIPT_SYSTEM_MESSAGE}"""
+
+_DUAL_OUTPUT_USER_PREFIX = (
+    f"请对以下英文文章依次输出{_DUAL_TRANSLATION_MARKER}与{_DUAL_SCRIPT_MARKER}两部分。"
+    "若下方给出了原标题，口播稿首行标题请将其译为中文后填写。\n\n"
+)
+
+AUDIO_FROM_TRANSLATION_SYSTEM_MESSAGE = f"""# Role
+你是《经济学人》中文版有声书的播音稿编辑。用户给出的是一篇已经译好的中文文章，你的任务是把它改写成供通勤听众收听的**中文口播逐字稿**。
+
+{get_audio_script_skip_rules_text()}
+
+# Rules
+1. 信息零损失：保留译文的每个论点、案例、数据和人名，不删减、不概括；数据按中文读法写出（如「百分之二十四点五」）。
+2. 拆开长句：定语过长的句子拆成几个短句，让听众不必回看就能听懂。
+3. 口语化：书面词换成口头说法（「基于」改为「根据」，「旨在」改为「目的是」，「其」改为「它的」）。
+4. 显性衔接：段落和观点切换处加「首先」「比如说」「这就意味着」等连接词。
+
+# Output Format
+- 第一行为「标题：」+ 中文标题（沿用译文标题），空一行后接正文；标题前后不得有开场白或「这是第X篇」之类的说明，结尾不加收束语。
+- 按原文逻辑分段，多用逗号和句号，少用顿号和分号。"""
+
+_AUDIO_FROM_TRANSLATION_USER_PREFIX = "请将以下中文译文改写为口播逐字稿。\n\n待改写的中文译文：\n\n"
+
+
+def _build_dual_output_prompt(article: Article, index: int, total: int) -> str:
+    """构建双输出用的 user prompt：固定说明 + 原标题 + 原文。"""
+    content = article.content
+    if len(content) > MAX_CONTENT_CHARS:
+        content = content[:MAX_CONTENT_CHARS] + "\n\n[... 原文过长已截断 ...]"
+    title_hint = ""
+    if article.title and article.title.strip():
+        title_hint = f"原标题：{article.title.strip()}\n\n"
+    return f"{_DUAL_OUTPUT_USER_PREFIX}{title_hint}待处理的英文原文：\n\n{content}"
+
+
+def _build_audio_from_translation_prompt(translation: str) -> str:
+    """构建由译文改写口播稿用的 user prompt；译者注不需要播报，不发送。"""
+    text = re.split(r"\n\s*[#*]*\s*译者注", translation.strip(), maxsplit=1)[0].strip()
+    return f"{_AUDIO_FROM_TRANSLATION_USER_PREFIX}{text}"
+
+
+def _split_dual_output(text: str) -> tuple[str, str]:
+    """把双输出拆成 (译文, 口播稿)；缺少标记或任一部分为空时抛出 DeepSeekError。"""
+    parts = re.split(rf"^[\s#*]*{_DUAL_SCRIPT_MARKER}[\s*]*$", text, maxsplit=1, flags=re.M)
+    if len(parts) != 2:
+        raise DeepSeekError(f"双输出缺少{_DUAL_SCRIPT_MARKER}标记")
+    translation = re.sub(rf"^[\s#*]*{_DUAL_TRANSLATION_MARKER}[\s*]*\n", "", parts[0].strip() + "\n", count=1).strip()
+    script = parts[1].strip()
+    if not translation or not script:
+        raise DeepSeekError("双输出的译文或口播稿为空")
+    return translation, script
+
+
+def translate_and_script_with_deepseek(
+    article: Article,
+    index: int,
+    total: int,
+    api_key: str,
+    timeout_seconds: float = 300.0,
+    usage: Optional[TokenUsage] = None,
+    hedge: Optional[HedgeBudget] = None,
+    cancel: Optional[CancelToken] = None,
+) -> tuple[str, str]:
+    """一次调用同时生成全文翻译与口播逐字稿，返回 (translation, script)。
+    输出因长度上限被截断、格式不符或请求失败时抛出 DeepSeekError，由调用方改用两次独立调用。"""
+    if not api_key:
+        raise DeepSeekError("缺少 DeepSeek API Key。")
+
+    user_prompt = _build_dual_output_prompt(article, index, total)
+    status_code, resp_text = _do_api_call_with_system(
+        DUAL_OUTPUT_SYSTEM_MESSAGE, user_prompt, api_key, timeout_seconds, usage, hedge, "point", cancel
+    )
+    if status_code != 200:
+        raise DeepSeekError(f"DeepSeek 返回错误状态码 {status_code}: {resp_text}")
+    try:
+        choice = json.loads(resp_text)["choices"][0]
+        content = choice["message"]["content"].strip()
+    except Exception as exc:
+        raise DeepSeekError(f"解析 DeepSeek 响应失败：{exc}") from exc
+    if choice.get("finish_reason") == "length":
+        raise DeepSeekError("双输出超过输出长度上限被截断")
+    return _split_dual_output(content)
+
+
+def audio_script_from_translation_with_deepseek(
+    translation: str,
+    index: int,
+    total: int,
+    api_key: str,
+    timeout_seconds: float = 300.0,
+    usage: Optional[TokenUsage] = None,
+    hedge: Optional[HedgeBudget] = None,
+    cancel: Optional[CancelToken] = None,
+) -> str:
+    """把已完成的中文译文改写为口播逐字稿（听我），返回中文口播稿文本。"""
+    if not api_key:
+        raise DeepSeekError("缺少 DeepSeek API Key。")
+
+    user_prompt = _build_audio_from_translation_prompt(translation)
+    status_code, resp_text = _do_api_call_with_system(
+        AUDIO_FROM_TRANSLATION_SYSTEM_MESSAGE, user_prompt, api_key, timeout_seconds, usage, hedge, "derive", cancel
+    )
+    if status_code != 200:
+        raise DeepSeekError(f"DeepSeek 返回错误状态码 {status_code}: {resp_text}")
+    try:
+        data = json.loads(resp_text)
+        return data["choices"][0]["message"]["content"].strip()
+    except Exception as exc:
+        raise DeepSeekError(f"解析 DeepSeek 响应失败：{exc}") from exc
+
+
+_PROMPTS = {
+    "listen": (AUDIO_SCRIPT_SYSTEM_MESSAGE, _AUDIO_SCRIPT_USER_PREFIX),
+    "translate": (TRANSLATE_SYSTEM_MESSAGE, _TRANSLATE_USER_PREFIX),
+    "point": (DUAL_OUTPUT_SYSTEM_MESSAGE, _DUAL_OUTPUT_USER_PREFIX),
+    "derive": (AUDIO_FROM_TRANSLATION_SYSTEM_MESSAGE, _AUDIO_FROM_TRANSLATION_USER_PREFIX),
+}
+
+
+def prompt_version(call: str) -> str:
+    """某类调用（listen / translate / point / derive）的 prompt 版本：system message 与 user 固定说明的摘要。
+    跨期复用按该版本区分，prompt 改动或换用其他调用方式后，历史输出不再被复用。"""
+    system, prefix = _PROMPTS[call]
+    return hashlib.sha1(f"{DEEPSEEK_MODEL}\n{system}\n{prefix}".encode("utf-8")).hexdigest()[:12]
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import html
+import json
 import re
 from io import BytesIO
-from typing import List
+from typing import Callable, Dict, List
 
 from docx import Document
 from docx.shared import Pt
@@ -263,18 +265,7 @@ def get_pure_headings(
     return pure_headings
 
 
-def build_docx_from_analyses(
-    analyses: List[str],
-    articles: List[Article],
-    titles_override: List[str] | None = None,
-) -> BytesIO:
-    """将所有文章的中文分析结果写入单一 Word 文档并返回内存流。
-    titles_override: 若提供且与 analyses 等长，则优先用其非空项作为标题（与「看我」一致）。"""
-    if len(analyses) != len(articles):
-        raise ValueError("analyses 与 articles 数量不一致。")
-    if titles_override is not None and len(titles_override) != len(articles):
-        raise ValueError("titles_override 与 articles 数量不一致。")
-
+def _new_document() -> Document:
     doc = Document()
 
     # 设置全局字体：中文使用微软雅黑，英文使用Times New Roman
@@ -282,63 +273,107 @@ def build_docx_from_analyses(
     font = style.font
     _set_font_chinese_english(font, "微软雅黑", "Times New Roman")
     font.size = Pt(11)
-    
+
     # 设置标题字体：中文使用微软雅黑，英文使用Times New Roman
     heading_style = doc.styles["Heading 1"]
     heading_font = heading_style.font
     _set_font_chinese_english(heading_font, "微软雅黑", "Times New Roman")
+    return doc
 
-    pure_headings = get_pure_headings(articles, analyses, titles_override)
-    keep_indices = [i for i in range(len(articles)) if pure_headings[i] != "未命名文章"]
-
-    _title_only_line = re.compile(r"^\s*(?:#+\s*|\|\s*|\*+\s*)*标题\s*[：:]*\s*$", re.IGNORECASE)
-    _title_label_prefix = re.compile(r"^\s*(?:#+\s*|\|\s*|\*+\s*)*标题\s*[：:]*\s*", re.IGNORECASE)
-    display_index = 0
-
-    for idx in keep_indices:
-        analysis = analyses[idx]
-        pure_heading = pure_headings[idx]
-        title_content = pure_heading
-        dummy_heading = f"文章0：{pure_heading}"
-
-        # 去掉口播稿末尾固定结束语与推广/下载句，再去掉开头过渡语，然后拆段
-        body_text = re.sub(r"\s*这篇文章就为您播报到这里。感谢您的收听。\s*$", "", analysis)
-        body_text = _strip_listen_closings(body_text)
-        body_text = _strip_listen_openers(body_text)
-        chunks = [chunk.strip() for chunk in body_text.split("\n\n") if chunk.strip()]
-
-        paragraphs_to_add: List[str] = []
-        for chunk in chunks:
-            if re.match(r'^(?:【文章标题】|标题)\*?\*?\s*[：:]', chunk):
-                continue
-            if re.match(r'^\s*\*?\*?\s*标题\s*\*?\*?\s*$', chunk):
-                continue
-            lines = chunk.split("\n")
-            while lines and _title_only_line.match(lines[0].strip()):
-                lines.pop(0)
-            chunk = "\n".join(lines).strip()
-            chunk = _title_label_prefix.sub("", chunk).strip()
-            if not chunk:
-                continue
-            if chunk == title_content or chunk.strip() == dummy_heading:
-                continue
-            paragraphs_to_add.append(chunk)
-
-        if not paragraphs_to_add:
+
+def _save_document(doc: Document) -> BytesIO:
+    stream = BytesIO()
+    doc.save(stream)
+    stream.seek(0)
+    return stream
+
+
+_title_only_line = re.compile(r"^\s*(?:#+\s*|\|\s*|\*+\s*)*标题\s*[：:]*\s*$", re.IGNORECASE)
+_title_label_prefix = re.compile(r"^\s*(?:#+\s*|\|\s*|\*+\s*)*标题\s*[：:]*\s*", re.IGNORECASE)
+
+
+def _analysis_paragraphs(analysis: str, pure_heading: str) -> List[str]:
+    """口播稿正文拆段：去掉固定结束语、推广句、开头过渡语及重复的标题行。"""
+    title_content = pure_heading
+    dummy_heading = f"文章0：{pure_heading}"
+
+    # 去掉口播稿末尾固定结束语与推广/下载句，再去掉开头过渡语，然后拆段
+    body_text = re.sub(r"\s*这篇文章就为您播报到这里。感谢您的收听。\s*$", "", analysis)
+    body_text = _strip_listen_closings(body_text)
+    body_text = _strip_listen_openers(body_text)
+    chunks = [chunk.strip() for chunk in body_text.split("\n\n") if chunk.strip()]
+
+    paragraphs_to_add: List[str] = []
+    for chunk in chunks:
+        if re.match(r'^(?:【文章标题】|标题)\*?\*?\s*[：:]', chunk):
+            continue
+        if re.match(r'^\s*\*?\*?\s*标题\s*\*?\*?\s*$', chunk):
+            continue
+        lines = chunk.split("\n")
+        while lines and _title_only_line.match(lines[0].strip()):
+            lines.pop(0)
+        chunk = "\n".join(lines).strip()
+        chunk = _title_label_prefix.sub("", chunk).strip()
+        if not chunk:
             continue
+        if chunk == title_content or chunk.strip() == dummy_heading:
+            continue
+        paragraphs_to_add.append(chunk)
+    return paragraphs_to_add
+
 
-        display_index += 1
+def render_analysis(analysis: str, article: Article, title_override: str | None = None) -> tuple[str, List[str]] | None:
+    """单篇口播稿在文档中的 (标题, 段落)，与 build_docx_from_analyses 一致；标题无法确定或正文为空时返回 None
+    （该篇不写入文档）。每篇只需算一次，可缓存后用于部分下载。"""
+    pure_heading = get_pure_headings([article], [analysis], [title_override or ""] if title_override else None)[0]
+    if pure_heading == "未命名文章":
+        return None
+    paragraphs = _analysis_paragraphs(analysis, pure_heading)
+    if not paragraphs:
+        return None
+    return (pure_heading, paragraphs)
+
+
+def build_docx_from_rendered_analyses(rendered: List[tuple[str, List[str]]]) -> BytesIO:
+    """把 render_analysis 的结果按顺序写入 Word（标题按出现顺序编号）。"""
+    doc = _new_document()
+    for display_index, (pure_heading, paragraphs) in enumerate(rendered, start=1):
         heading = f"文章{display_index}：{pure_heading}"
         doc.add_heading(heading, level=1)
-        for p in paragraphs_to_add:
+        for p in paragraphs:
             doc.add_paragraph(p)
         doc.add_paragraph()
         doc.add_paragraph()
+    return _save_document(doc)
 
-    stream = BytesIO()
-    doc.save(stream)
-    stream.seek(0)
-    return stream
+
+def build_docx_from_analyses(
+    analyses: List[str],
+    articles: List[Article],
+    titles_override: List[str] | None = None,
+) -> BytesIO:
+    """将所有文章的中文分析结果写入单一 Word 文档并返回内存流。
+    titles_override: 若提供且与 analyses 等长，则优先用其非空项作为标题（与「看我」一致）。"""
+    if len(analyses) != len(articles):
+        raise ValueError("analyses 与 articles 数量不一致。")
+    if titles_override is not None and len(titles_override) != len(articles):
+        raise ValueError("titles_override 与 articles 数量不一致。")
+
+    return build_docx_from_rendered_analyses(render_analyses(analyses, articles, titles_override))
+
+
+def render_analyses(
+    analyses: List[str],
+    articles: List[Article],
+    titles_override: List[str] | None = None,
+) -> List[tuple[str, List[str]]]:
+    """按顺序渲染多篇口播稿，跳过不写入文档的篇目；结果可交给任一 build_*_from_rendered_analyses。"""
+    rendered = []
+    for i, (analysis, article) in enumerate(zip(analyses, articles)):
+        item = render_analysis(analysis, article, titles_override[i] if titles_override else None)
+        if item is not None:
+            rendered.append(item)
+    return rendered
 
 
 def _parse_translation(translation: str) -> tuple[str, str, str | None]:
@@ -387,6 +422,33 @@ def _parse_translation(translation: str) -> tuple[str, str, str | None]:
     return (title, body, translator_note if translator_note else None)
 
 
+def render_translation(translation: str, article: Article) -> tuple[str, List[str], str | None]:
+    """单篇译文在文档中的 (标题, 正文段落, 译者注)，与 build_docx_from_translations 一致。"""
+    title, body, translator_note = _parse_translation(translation)
+    if title == "未命名文章" and body == "" and not translator_note:
+        title = _extract_article_title(article.title) or "未命名文章"
+    paragraphs = [para.strip() for para in body.split("\n\n") if para.strip()]
+    return (title, paragraphs, translator_note)
+
+
+def build_docx_from_rendered_translations(rendered: List[tuple[str, List[str], str | None]]) -> BytesIO:
+    """把 render_translation 的结果按顺序写入 Word。"""
+    doc = _new_document()
+    for title, paragraphs, translator_note in rendered:
+        doc.add_heading(title, level=1)
+
+        for para in paragraphs:
+            doc.add_paragraph(para)
+
+        if translator_note:
+            doc.add_paragraph()
+            doc.add_paragraph("译者注：" + translator_note)
+
+        doc.add_paragraph()
+        doc.add_paragraph()
+    return _save_document(doc)
+
+
 def build_docx_from_translations(
     translations: List[str],
     articles: List[Article],
@@ -394,39 +456,138 @@ def build_docx_from_translations(
     """将全文翻译结果写入单一 Word 文档并返回内存流。"""
     if len(translations) != len(articles):
         raise ValueError("translations 与 articles 数量不一致。")
+    return build_docx_from_rendered_translations(render_translations(translations, articles))
 
-    doc = Document()
 
-    style = doc.styles["Normal"]
-    font = style.font
-    _set_font_chinese_english(font, "微软雅黑", "Times New Roman")
-    font.size = Pt(11)
+def render_translations(translations: List[str], articles: List[Article]) -> List[tuple[str, List[str], str | None]]:
+    """按顺序渲染多篇译文；结果可交给任一 build_*_from_rendered_translations。"""
+    return [render_translation(t, a) for a, t in zip(articles, translations, strict=True)]
 
-    heading_style = doc.styles["Heading 1"]
-    heading_font = heading_style.font
-    _set_font_chinese_english(heading_font, "微软雅黑", "Times New Roman")
 
-    for i, (article, raw_translation) in enumerate(zip(articles, translations, strict=True)):
-        title, body, translator_note = _parse_translation(raw_translation)
-        if title == "未命名文章" and body == "" and not translator_note:
-            title = _extract_article_title(article.title) or "未命名文章"
+# 轻量输出格式：与 Word 使用同一份渲染结果（标题、清洗后的段落、译者注），只是换一种写法，
+# 不经过 python-docx，生成更快、体积更小。
+OUTPUT_FORMATS = ("docx", "md", "html", "json")
+FORMAT_MEDIA_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "md": "text/markdown; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+    "json": "application/json",
+}
+
+_HTML_STYLE = (
+    "body{font-family:'Times New Roman','微软雅黑',serif;font-size:11pt;line-height:1.7;"
+    "max-width:46em;margin:2em auto;padding:0 1em}h1{font-size:1.4em;margin-top:2.5em}"
+)
 
-        doc.add_heading(title, level=1)
 
-        for para in body.split("\n\n"):
-            para = para.strip()
-            if para:
-                doc.add_paragraph(para)
+def _encode(text: str) -> BytesIO:
+    return BytesIO(text.encode("utf-8"))
 
+
+def _one_line(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _html_paragraph(text: str) -> str:
+    return "<p>" + "<br>".join(html.escape(line) for line in text.split("\n")) + "</p>"
+
+
+def _html_document(title: str, sections: List[str]) -> BytesIO:
+    head = (
+        '<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="utf-8">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+        f"<title>{html.escape(title)}</title>\n<style>{_HTML_STYLE}</style>\n</head>\n<body>\n"
+    )
+    return _encode(head + "\n".join(sections) + "\n</body>\n</html>\n")
+
+
+def build_markdown_from_rendered_analyses(rendered: List[tuple[str, List[str]]]) -> BytesIO:
+    """口播稿 Markdown：每篇一个一级标题（与 Word 相同的编号），段落之间空一行。"""
+    parts = []
+    for display_index, (pure_heading, paragraphs) in enumerate(rendered, start=1):
+        parts.append(f"# 文章{display_index}：{_one_line(pure_heading)}")
+        parts.extend(paragraphs)
+    return _encode("\n\n".join(parts) + "\n")
+
+
+def build_html_from_rendered_analyses(rendered: List[tuple[str, List[str]]], title: str = "") -> BytesIO:
+    """口播稿的独立 HTML 页面（内联样式，无外部资源）。"""
+    sections = []
+    for display_index, (pure_heading, paragraphs) in enumerate(rendered, start=1):
+        body = "\n".join(_html_paragraph(p) for p in paragraphs)
+        sections.append(f"<article>\n<h1>{html.escape(f'文章{display_index}：{pure_heading}')}</h1>\n{body}\n</article>")
+    return _html_document(title, sections)
+
+
+def build_json_from_rendered_analyses(rendered: List[tuple[str, List[str]]], title: str = "") -> BytesIO:
+    """口播稿 JSON：{"title", "articles": [{"index", "title", "paragraphs"}]}，index 为文档中的编号。"""
+    articles = [
+        {"index": i, "title": heading, "paragraphs": paragraphs}
+        for i, (heading, paragraphs) in enumerate(rendered, start=1)
+    ]
+    return _encode(json.dumps({"title": title, "articles": articles}, ensure_ascii=False))
+
+
+def build_markdown_from_rendered_translations(rendered: List[tuple[str, List[str], str | None]]) -> BytesIO:
+    """译文 Markdown：每篇一个一级标题，译者注单独一段。"""
+    parts = []
+    for heading, paragraphs, translator_note in rendered:
+        parts.append(f"# {_one_line(heading)}")
+        parts.extend(paragraphs)
         if translator_note:
-            doc.add_paragraph()
-            doc.add_paragraph("译者注：" + translator_note)
+            parts.append("译者注：" + translator_note)
+    return _encode("\n\n".join(parts) + "\n")
 
-        doc.add_paragraph()
-        doc.add_paragraph()
 
-    stream = BytesIO()
-    doc.save(stream)
-    stream.seek(0)
-    return stream
+def build_html_from_rendered_translations(
+    rendered: List[tuple[str, List[str], str | None]], title: str = ""
+) -> BytesIO:
+    """译文的独立 HTML 页面（内联样式，无外部资源）。"""
+    sections = []
+    for heading, paragraphs, translator_note in rendered:
+        body = [_html_paragraph(p) for p in paragraphs]
+        if translator_note:
+            body.append(_html_paragraph("译者注：" + translator_note))
+        sections.append(f"<article>\n<h1>{html.escape(heading)}</h1>\n" + "\n".join(body) + "\n</article>")
+    return _html_document(title, sections)
 
+
+def build_json_from_rendered_translations(
+    rendered: List[tuple[str, List[str], str | None]], title: str = ""
+) -> BytesIO:
+    """译文 JSON：{"title", "articles": [{"index", "title", "paragraphs", "note"}]}。"""
+    articles = [
+        {"index": i, "title": heading, "paragraphs": paragraphs, "note": translator_note}
+        for i, (heading, paragraphs, translator_note) in enumerate(rendered, start=1)
+    ]
+    return _encode(json.dumps({"title": title, "articles": articles}, ensure_ascii=False))
+
+
+_ANALYSIS_BUILDERS: Dict[str, Callable[..., BytesIO]] = {
+    "docx": lambda rendered, title="": build_docx_from_rendered_analyses(rendered),
+    "md": lambda rendered, title="": build_markdown_from_rendered_analyses(rendered),
+    "html": build_html_from_rendered_analyses,
+    "json": build_json_from_rendered_analyses,
+}
+_TRANSLATION_BUILDERS: Dict[str, Callable[..., BytesIO]] = {
+    "docx": lambda rendered, title="": build_docx_from_rendered_translations(rendered),
+    "md": lambda rendered, title="": build_markdown_from_rendered_translations(rendered),
+    "html": build_html_from_rendered_translations,
+    "json": build_json_from_rendered_translations,
+}
+
+
+def build_from_rendered_analyses(rendered: List[tuple[str, List[str]]], fmt: str = "docx", title: str = "") -> BytesIO:
+    """按 fmt（OUTPUT_FORMATS 之一）生成口播稿文档；title 用作 HTML/JSON 的文档标题。"""
+    if fmt not in _ANALYSIS_BUILDERS:
+        raise ValueError(f"不支持的输出格式: {fmt}")
+    return _ANALYSIS_BUILDERS[fmt](rendered, title=title)
+
+
+def build_from_rendered_translations(
+    rendered: List[tuple[str, List[str], str | None]], fmt: str = "docx", title: str = ""
+) -> BytesIO:
+    """按 fmt（OUTPUT_FORMATS 之一）生成译文文档；title 用作 HTML/JSON 的文档标题。"""
+    if fmt not in _TRANSLATION_BUILDERS:
+        raise ValueError(f"不支持的输出格式: {fmt}")
+    return _TRANSLATION_BUILDERS[fmt](rendered, title=title)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from metrics import DOCUMENT_CACHE_REQUESTS
+
+# 按需生成的结果文档缓存上限（MB）：任务完成时只保存单篇渲染结果，某种文档第一次被下载时才生成，
+# 生成后放入缓存；超过上限时淘汰最久未下载的文档（再次下载时重新生成）。0 表示不缓存。
+DOCUMENT_CACHE_MB = float(os.getenv("DOCUMENT_CACHE_MB", "64"))
+
+
+class DocumentCache:
+    """结果文档的 LRU 缓存，按字节数淘汰。键的第一项为 task_id（用于任务结果变化时整体失效）。
+    同一文档同时被多次请求时只生成一次，其余请求等待同一结果。只在事件循环中使用。"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, max_bytes)
+        self._items: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._building: Dict[Hashable, asyncio.Future] = {}
+        self.bytes = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+        return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        self._remove(key)
+        if len(data) > self.max_bytes:
+            return
+        self._items[key] = data
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            _, old = self._items.popitem(last=False)
+            self.bytes -= len(old)
+            self.evictions += 1
+
+    def _remove(self, key: tuple) -> None:
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old)
+
+    def discard_task(self, task_id: str) -> None:
+        """任务结果变化（重试）时丢弃其全部已生成文档；正在生成的不受影响（结果会被当作旧版本丢弃）。"""
+        for key in [k for k in self._items if k[0] == task_id]:
+            self._remove(key)
+        for key in [k for k in self._building if k[0] == task_id]:
+            self._building.pop(key)
+
+    async def get_or_build(self, key: tuple, build: Callable[[], bytes]) -> bytes:
+        """命中直接返回；否则在线程中执行 build() 生成并缓存。生成在独立任务中进行，
+        发起生成的请求被取消（客户端断开）时照常完成，共享同一生成的其他请求与缓存不受影响。"""
+        data = self.get(key)
+        if data is not None:
+            DOCUMENT_CACHE_REQUESTS.inc(result="hit")
+            return data
+        pending = self._building.get(key)
+        if pending is not None:
+            DOCUMENT_CACHE_REQUESTS.inc(result="shared")
+        else:
+            DOCUMENT_CACHE_REQUESTS.inc(result="miss")
+            pending = asyncio.ensure_future(asyncio.to_thread(build))
+            self._building[key] = pending
+            pending.add_done_callback(lambda task: self._built(key, task))
+        return await asyncio.shield(pending)
+
+    def _built(self, key: tuple, task: asyncio.Future) -> None:
+        if task.cancelled():
+            if self._building.get(key) is task:
+                self._building.pop(key)
+            return
+        error = task.exception()  # 取出异常：没有等待者时不报 "exception was never retrieved"
+        if self._building.get(key) is task:
+            self._building.pop(key)
+            if error is None:
+                self.put(key, task.result())
+
+    def snapshot(self) -> dict:
+        return {
+            "documents": len(self._items),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "building": len(self._building),
+        }
+
+
+_cache = DocumentCache(int(DOCUMENT_CACHE_MB * 1024 * 1024))
+
+
+def get_document_cache() -> DocumentCache:
+    return _cache
@@ -112,8 +112,10 @@ def _build_toc_title_by_href(book: epub.EpubBook) -> Dict[str, str]:
             elif isinstance(entry, (list, tuple)):
                 walk(list(entry))
 
-    if hasattr(book, "toc") and book.toc:
-        walk(list(book.toc))
+    toc = getattr(book, "toc", None)
+    if toc:
+        # ebooklib 读到空的 <navMap/> 时 book.toc 是单个 Link 而不是列表
+        walk(list(toc) if isinstance(toc, (list, tuple)) else [toc])
     return result
 
 
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from metrics import DEEPSEEK_HEDGES
+
+# 对冲请求（默认关闭）：一篇文章超过“近期同类请求耗时的分位数 × 本篇长度”仍未返回时，
+# 再发一份相同请求，先成功的胜出，另一个取消。用来削掉每期总有几篇拖慢整个任务的长尾。
+# 请求不是流式的，只能按整篇耗时判断（没有“首 token 迟迟不到”的信号），见 hedged_call。
+DEEPSEEK_HEDGE_ENABLED = os.getenv("DEEPSEEK_HEDGE_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+# 触发对冲的分位数（按每千字符耗时统计）
+DEEPSEEK_HEDGE_PERCENTILE = float(os.getenv("DEEPSEEK_HEDGE_PERCENTILE", "95"))
+# 每个任务最多对该比例的文章发起对冲（至少 1 篇），限制额外的 token 花费
+DEEPSEEK_HEDGE_BUDGET = float(os.getenv("DEEPSEEK_HEDGE_BUDGET", "0.1"))
+# 对冲等待时间下限（秒），以及样本不足时不对冲
+DEEPSEEK_HEDGE_MIN_DELAY = float(os.getenv("DEEPSEEK_HEDGE_MIN_DELAY", "10"))
+DEEPSEEK_HEDGE_MIN_SAMPLES = int(os.getenv("DEEPSEEK_HEDGE_MIN_SAMPLES", "20"))
+# 每类请求保留的最近样本数
+DEEPSEEK_HEDGE_WINDOW = int(os.getenv("DEEPSEEK_HEDGE_WINDOW", "200"))
+
+# 短文也按至少这么长计：固定开销（排队、首 token）不随长度缩短
+_MIN_SIZE_CHARS = 1000
+
+
+class LatencyTracker:
+    """按请求类型记录最近成功请求的每千字符耗时，给出本篇文章的对冲等待时间。
+    各执行器线程在各自的事件循环里调用，由线程锁保护。"""
+
+    def __init__(self, window: int = DEEPSEEK_HEDGE_WINDOW):
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, kind: str, size: int, seconds: float) -> None:
+        per_kchar = seconds / (max(size, _MIN_SIZE_CHARS) / 1000.0)
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self._window)).append(per_kchar)
+
+    def delay(self, kind: str, size: int, percentile: float = DEEPSEEK_HEDGE_PERCENTILE) -> Optional[float]:
+        """样本不足时返回 None（不对冲）。"""
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if len(samples) < DEEPSEEK_HEDGE_MIN_SAMPLES:
+            return None
+        rank = min(len(samples) - 1, max(0, math.ceil(percentile / 100.0 * len(samples)) - 1))
+        return max(DEEPSEEK_HEDGE_MIN_DELAY, samples[rank] * max(size, _MIN_SIZE_CHARS) / 1000.0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            kinds = list(self._samples)
+        return {
+            k: {"samples": len(self._samples[k]), "delay_per_kchar_s": self.delay(k, 1000)}
+            for k in kinds
+        }
+
+
+class HedgeBudget:
+    """单个任务的对冲额度。reserve 非空时，对冲请求发出前须经它占到并发槽位与速率配额
+    （与原请求受同一套上限约束）：返回释放函数，当前没有空闲槽位时返回 None（本次不对冲）。"""
+
+    def __init__(
+        self,
+        articles: int,
+        ratio: float = DEEPSEEK_HEDGE_BUDGET,
+        reserve: Optional[Callable[[], Awaitable[Optional[Callable[[], None]]]]] = None,
+    ):
+        self.limit = max(1, math.ceil(articles * ratio)) if ratio > 0 else 0
+        self.used = 0
+        self.reserve = reserve
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+_tracker = LatencyTracker()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    return _tracker
+
+
+async def _issue_hedge(
+    call: Callable[[], Awaitable[Any]],
+    kind: str,
+    budget: HedgeBudget,
+    primary: asyncio.Future,
+    tasks: list,
+) -> None:
+    """有额度且占到槽位时发出对冲请求并加入 tasks；槽位在对冲请求结束（含被取消）时归还。"""
+    if budget.used >= budget.limit:
+        DEEPSEEK_HEDGES.inc(kind=kind, outcome="no_budget")
+        return
+    release = None
+    if budget.reserve is not None:
+        release = await budget.reserve()
+        if release is None:
+            DEEPSEEK_HEDGES.inc(kind=kind, outcome="no_capacity")
+            return
+    if primary.done() or not budget.try_spend():
+        # 等待速率配额期间原请求已返回，或额度被同一任务的其他文章用完
+        if release is not None:
+            release()
+        if not primary.done():
+            DEEPSEEK_HEDGES.inc(kind=kind, outcome="no_budget")
+        return
+    DEEPSEEK_HEDGES.inc(kind=kind, outcome="issued")
+    hedge = asyncio.ensure_future(call())
+    if release is not None:
+        hedge.add_done_callback(lambda _: release())
+    tasks.append(hedge)
+
+
+async def hedged_call(
+    call: Callable[[], Awaitable[Any]],
+    kind: str,
+    size: int,
+    budget: Optional[HedgeBudget],
+) -> Any:
+    """执行 call()；超过对冲等待时间且任务仍有额度时再发一份，返回先成功的结果。
+    两份都失败时抛出原请求的异常。被取消的一份可能已产生部分 token 消耗，不计入用量。
+
+    只按总耗时触发：DeepSeek 请求不是流式的（不带 stream 参数，响应体一次返回），拿不到
+    “迟迟没有首个 token”这一信号，因此等待时间按整篇耗时的分位数而非首 token 时间计算。"""
+    started = time.perf_counter()
+    primary = asyncio.ensure_future(call())
+    tasks = [primary]
+    try:
+        delay = _tracker.delay(kind, size) if budget is not None else None
+        if delay is not None:
+            await asyncio.wait([primary], timeout=delay)
+            if not primary.done():
+                await _issue_hedge(call, kind, budget, primary, tasks)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((t for t in tasks if t in done and t.exception() is None), None)
+            if winner is None:
+                continue
+            if len(tasks) > 1:
+                DEEPSEEK_HEDGES.inc(kind=kind, outcome="hedge_won" if winner is not primary else "primary_won")
+            _tracker.observe(kind, size, time.perf_counter() - started)
+            return winner.result()
+        return primary.result()
+    finally:
+        leftovers = [t for t in tasks if not t.done()]
+        for t in leftovers:
+            t.cancel()
+        if leftovers:
+            await asyncio.gather(*leftovers, return_exceptions=True)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows：退化为进程内限制
+    fcntl = None
+
+# 同一主机上所有 worker 共享的锁文件目录（gunicorn -w N 时 N 个进程共用一套并发与速率上限）
+HOST_LIMIT_DIR = os.getenv(
+    "HOST_LIMIT_DIR", os.path.join(tempfile.gettempdir(), "epub-analyst-limits")
+)
+HOST_LIMITS_ENABLED = os.getenv("HOST_LIMITS_ENABLED", "1").strip().lower() in ("1", "true", "yes")
+
+_SLOT_POLL_SECONDS = 0.05
+_SLOT_POLL_MAX_SECONDS = 0.2
+
+
+class HostLimiter:
+    """主机级 DeepSeek 并发与速率上限。
+
+    并发：目录下 max_concurrency 个槽位文件，持有其中一个的 flock 即占用一个槽位；进程崩溃时
+    文件描述符关闭、锁自动释放，不会泄漏槽位。速率：一个状态文件记录下一个可发请求的时刻
+    （GCRA），在 flock 保护下读改写，各 worker 据此排队。没有 fcntl（Windows）或目录不可写时
+    退化为进程内的同等限制。"""
+
+    def __init__(self, max_concurrency: int, rate_limit: float, directory: str = HOST_LIMIT_DIR, shared: bool = True):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limit = rate_limit
+        self.directory = directory
+        self.shared = shared and fcntl is not None
+        if self.shared:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                self.shared = False
+        self._local_lock = threading.Lock()
+        self._local_next_at = 0.0
+        self._local_in_use = 0
+        self._held: List[int] = []  # 本进程当前持有的槽位编号
+
+    # ---- 速率 ----
+
+    def _reserve_send_time(self) -> float:
+        """预约下一个发送时刻，返回需要等待的秒数。"""
+        interval = 1.0 / self.rate_limit
+        now = time.time()
+        if not self.shared:
+            with self._local_lock:
+                at = max(now, self._local_next_at)
+                self._local_next_at = at + interval
+            return at - now
+        path = os.path.join(self.directory, "rate.state")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.pread(fd, 64, 0)
+            try:
+                next_at = float(raw.decode("ascii").strip() or 0)
+            except ValueError:
+                next_at = 0.0
+            at = max(now, next_at)
+            data = f"{at + interval:.6f}".encode("ascii")
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, data, 0)
+            return at - now
+        finally:
+            os.close(fd)  # 关闭即释放 flock
+
+    async def wait_rate(self) -> float:
+        """按主机级速率上限等待，返回等待秒数。"""
+        if self.rate_limit <= 0:
+            return 0.0
+        try:
+            # 共享状态文件的 flock 可能被其他 worker 占着，阻塞等待放到线程里，不卡住事件循环
+            delay = await asyncio.to_thread(self._reserve_send_time) if self.shared else self._reserve_send_time()
+        except OSError:
+            self.shared = False
+            delay = self._reserve_send_time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    # ---- 并发 ----
+
+    def _try_lock_slot(self) -> Optional[tuple[int, int]]:
+        # 对冲请求在执行器线程中占槽位，_held 由线程锁保护
+        with self._local_lock:
+            for i in range(self.max_concurrency):
+                if i in self._held:
+                    continue
+                fd = os.open(os.path.join(self.directory, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    continue
+                self._held.append(i)
+                return i, fd
+        return None
+
+    def _release_lock_slot(self, held: tuple[int, int]) -> None:
+        idx, fd = held
+        with self._local_lock:
+            self._held.remove(idx)
+        os.close(fd)
+
+    def try_slot(self) -> Optional[Callable[[], None]]:
+        """不等待地占用一个主机级槽位（对冲请求用），返回释放函数；没有空闲槽位时返回 None。可在任意线程调用。"""
+        if self.shared:
+            try:
+                held = self._try_lock_slot()
+            except OSError:
+                self.shared = False
+            else:
+                return None if held is None else (lambda: self._release_lock_slot(held))
+        if not self._try_local_slot():
+            return None
+
+        def _release() -> None:
+            with self._local_lock:
+                self._local_in_use -= 1
+        return _release
+
+    def _try_local_slot(self) -> bool:
+        with self._local_lock:
+            if self._local_in_use >= self.max_concurrency:
+                return False
+            self._local_in_use += 1
+            return True
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """占用一个主机级并发槽位，yield 等待的秒数。"""
+        start = time.monotonic()
+        delay = _SLOT_POLL_SECONDS
+        held: Optional[tuple[int, int]] = None
+        local = False
+        while True:
+            if self.shared:
+                try:
+                    held = self._try_lock_slot()
+                except OSError:
+                    self.shared = False
+                    continue
+                if held is not None:
+                    break
+            elif self._try_local_slot():
+                local = True
+                break
+            await asyncio.sleep(delay)
+            delay = min(_SLOT_POLL_MAX_SECONDS, delay * 2)
+        try:
+            yield time.monotonic() - start
+        finally:
+            if held is not None:
+                self._release_lock_slot(held)
+            if local:
+                with self._local_lock:
+                    self._local_in_use -= 1
+
+    def snapshot(self) -> dict:
+        """主机级槽位占用（含其他 worker）与本进程持有数。"""
+        in_use = self._local_in_use
+        if self.shared:
+            in_use = len(self._held)
+            for i in range(self.max_concurrency):
+                if i in self._held:
+                    continue
+                try:
+                    fd = os.open(os.path.join(self.directory, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                except OSError:
+                    continue
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                except OSError:
+                    in_use += 1
+                finally:
+                    os.close(fd)
+        return {
+            "shared": self.shared,
+            "directory": self.directory if self.shared else None,
+            "capacity": self.max_concurrency,
+            "in_use": in_use,
+            "held_by_this_worker": len(self._held) if self.shared else self._local_in_use,
+            "rate_limit": self.rate_limit,
+        }
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from host_limits import HOST_LIMIT_DIR, HOST_LIMITS_ENABLED
+
+try:
+    import fcntl
+except ImportError:  # Windows：退化为进程内状态
+    fcntl = None
+
+# 多个 DeepSeek API Key（逗号分隔）；未配置时退化为单个 DEEPSEEK_API_KEY
+DEEPSEEK_API_KEYS = [k.strip() for k in os.getenv("DEEPSEEK_API_KEYS", "").split(",") if k.strip()]
+# 每个 Key 的令牌桶：每秒请求数与突发容量（0 = 不限）
+DEEPSEEK_KEY_RATE_LIMIT = float(os.getenv("DEEPSEEK_KEY_RATE_LIMIT", "5"))
+DEEPSEEK_KEY_BURST = float(os.getenv("DEEPSEEK_KEY_BURST", "5"))
+# 每个 Key 每日（UTC）可用的 token 配额（0 = 不限），用尽后当天不再分配
+DEEPSEEK_KEY_DAILY_TOKENS = int(os.getenv("DEEPSEEK_KEY_DAILY_TOKENS", "0"))
+# 连续 401/403/429 达到该次数后暂时摘除该 Key；冷却时长随连续摘除次数翻倍（上限 1 小时）
+DEEPSEEK_KEY_FAILURE_THRESHOLD = int(os.getenv("DEEPSEEK_KEY_FAILURE_THRESHOLD", "3"))
+DEEPSEEK_KEY_COOLDOWN_SECONDS = float(os.getenv("DEEPSEEK_KEY_COOLDOWN_SECONDS", "60"))
+# 所有 Key 都不可用时，单次请求最多等待的秒数
+DEEPSEEK_KEY_ACQUIRE_TIMEOUT = float(os.getenv("DEEPSEEK_KEY_ACQUIRE_TIMEOUT", "120"))
+
+_MAX_COOLDOWN_SECONDS = 3600.0
+# 同一主机上各 worker 共享的字段：令牌桶、健康状态与每日用量（在途数与统计只反映本进程）
+_SHARED_FIELDS = ("tokens", "last_refill", "failures", "trips", "cooldown_until", "quota_day", "tokens_used_today")
+
+
+class KeyPoolExhausted(Exception):
+    """等待超时仍没有可用的 API Key。"""
+
+
+@dataclass
+class _KeyState:
+    key: str
+    tokens: float
+    last_refill: float
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0  # 连续 401/403/429 次数，成功后清零
+    trips: int = 0  # 连续被摘除的次数，用于冷却时长翻倍
+    cooldown_until: float = 0.0
+    last_status: int = 0
+    quota_day: str = ""
+    tokens_used_today: int = 0
+    status_counts: Dict[int, int] = field(default_factory=dict)
+
+
+def _utc_day() -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def mask_key(key: str) -> str:
+    return f"{key[:6]}...{key[-4:]}" if len(key) > 12 else "***"
+
+
+class ApiKeyPool:
+    """多个 API Key 的调度池：每个 Key 有独立的令牌桶、健康状态与每日配额。
+
+    请求总是分给健康且桶内有令牌的 Key 中在途请求最少的一个；连续返回 401/403/429 的 Key
+    被暂时摘除，冷却结束后自动恢复。调用发生在各执行器线程自己的事件循环里，状态由线程锁保护。
+
+    与 HostLimiter 一样，令牌桶、健康状态与每日用量记在 directory 下的状态文件里，在 flock 保护下
+    读改写，同一主机的所有 worker 共用一套每 Key 限额（文件中只有 Key 的哈希）。没有 fcntl（Windows）、
+    HOST_LIMITS_ENABLED=0 或目录不可写时退化为进程内状态，此时每个 worker 各自按完整限额分配。"""
+
+    def __init__(
+        self,
+        keys: List[str],
+        rate_limit: float = DEEPSEEK_KEY_RATE_LIMIT,
+        burst: float = DEEPSEEK_KEY_BURST,
+        daily_tokens: int = DEEPSEEK_KEY_DAILY_TOKENS,
+        directory: str = HOST_LIMIT_DIR,
+        shared: bool = HOST_LIMITS_ENABLED,
+    ):
+        now = time.time()
+        self.rate_limit = rate_limit
+        self.burst = max(1.0, burst)
+        self.daily_tokens = daily_tokens
+        self.directory = directory
+        self.shared = shared and fcntl is not None
+        if self.shared:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                self.shared = False
+        self._lock = threading.Lock()
+        self._keys: Dict[str, _KeyState] = {}
+        self._ids: Dict[str, str] = {}
+        for k in keys:
+            if k not in self._keys:
+                self._keys[k] = _KeyState(key=k, tokens=self.burst, last_refill=now)
+                self._ids[k] = hashlib.sha256(k.encode("utf-8")).hexdigest()[:16]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @contextmanager
+    def _state(self) -> Iterator[None]:
+        """在线程锁（共享时再加状态文件的 flock）内操作各 Key 的状态：进入时读入其他 worker 写下的
+        共享字段，退出时写回。"""
+        with self._lock:
+            fd: Optional[int] = None
+            saved: dict = {}
+            if self.shared:
+                try:
+                    fd = os.open(os.path.join(self.directory, "keys.state"), os.O_RDWR | os.O_CREAT, 0o644)
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    saved = self._load(fd)
+                except OSError:
+                    if fd is not None:
+                        os.close(fd)
+                    fd = None
+                    self.shared = False
+            try:
+                yield
+            finally:
+                if fd is not None:
+                    try:
+                        self._store(fd, saved)
+                    except OSError:
+                        self.shared = False
+                    finally:
+                        os.close(fd)  # 关闭即释放 flock
+
+    def _load(self, fd: int) -> dict:
+        try:
+            saved = json.loads(os.pread(fd, os.fstat(fd).st_size, 0) or b"{}")
+        except ValueError:
+            return {}
+        if not isinstance(saved, dict):
+            return {}
+        for k, st in self._keys.items():
+            entry = saved.get(self._ids[k])
+            if isinstance(entry, dict):
+                for name in _SHARED_FIELDS:
+                    if name in entry:
+                        setattr(st, name, entry[name])
+        return saved
+
+    def _store(self, fd: int, saved: dict) -> None:
+        # 保留文件中不属于本池的 Key（其他 worker 配置不同）的状态
+        for k, st in self._keys.items():
+            saved[self._ids[k]] = {name: getattr(st, name) for name in _SHARED_FIELDS}
+        data = json.dumps(saved, separators=(",", ":")).encode("ascii")
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, data, 0)
+
+    def _refill(self, st: _KeyState, now: float) -> None:
+        if self.rate_limit <= 0:
+            st.tokens = self.burst
+            return
+        st.tokens = min(self.burst, st.tokens + (now - st.last_refill) * self.rate_limit)
+        st.last_refill = now
+
+    def _quota_left(self, st: _KeyState) -> bool:
+        today = _utc_day()
+        if st.quota_day != today:
+            st.quota_day = today
+            st.tokens_used_today = 0
+        return self.daily_tokens <= 0 or st.tokens_used_today < self.daily_tokens
+
+    def _try_acquire(self) -> tuple[Optional[str], float]:
+        """返回 (分配到的 Key, 0) 或 (None, 建议等待秒数)。"""
+        now = time.time()
+        with self._state():
+            best: Optional[_KeyState] = None
+            wait = float("inf")
+            for st in self._keys.values():
+                if not self._quota_left(st):
+                    continue
+                if st.cooldown_until > now:
+                    wait = min(wait, st.cooldown_until - now)
+                    continue
+                self._refill(st, now)
+                if st.tokens < 1.0:
+                    wait = min(wait, (1.0 - st.tokens) / self.rate_limit)
+                    continue
+                if best is None or (st.in_flight, -st.tokens) < (best.in_flight, -best.tokens):
+                    best = st
+            if best is None:
+                return None, wait
+            best.tokens -= 1.0
+            best.in_flight += 1
+            best.requests += 1
+            return best.key, 0.0
+
+    async def acquire(self, timeout: float = DEEPSEEK_KEY_ACQUIRE_TIMEOUT) -> str:
+        """分配一个 Key；暂无可用 Key 时在当前事件循环中等待，超时抛 KeyPoolExhausted。"""
+        deadline = time.monotonic() + timeout
+        while True:
+            key, wait = self._try_acquire()
+            if key is not None:
+                return key
+            remaining = deadline - time.monotonic()
+            if wait == float("inf") or remaining <= 0:
+                raise KeyPoolExhausted("所有 DeepSeek API Key 暂不可用（冷却中或配额已用尽）")
+            await asyncio.sleep(min(wait, remaining, 5.0) + 0.01)
+
+    def has_alternative(self, key: str) -> bool:
+        """除 key 外是否还有健康的 Key（决定失败后是立即换 Key 重试还是退避）。"""
+        now = time.time()
+        with self._state():
+            return any(
+                st.key != key and st.cooldown_until <= now and self._quota_left(st)
+                for st in self._keys.values()
+            )
+
+    def release(
+        self,
+        key: str,
+        status_code: int,
+        tokens_used: int = 0,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """归还 Key 并记录结果：2xx 清零失败计数；401/403/429 累计，达到阈值后摘除冷却。"""
+        now = time.time()
+        with self._state():
+            st = self._keys.get(key)
+            if st is None:
+                return
+            st.in_flight = max(0, st.in_flight - 1)
+            st.last_status = status_code
+            st.status_counts[status_code] = st.status_counts.get(status_code, 0) + 1
+            if tokens_used:
+                self._quota_left(st)
+                st.tokens_used_today += tokens_used
+            if 200 <= status_code < 300:
+                st.failures = 0
+                st.trips = 0
+                return
+            if status_code not in (401, 403, 429):
+                return
+            st.failures += 1
+            if status_code == 429 and retry_after:
+                # 上游明确要求等待：至少在 Retry-After 内不再分给这个 Key
+                st.cooldown_until = max(st.cooldown_until, now + retry_after)
+            # 只有一个 Key 时摘除没有意义（无处可换），仅遵守 Retry-After
+            if len(self._keys) > 1 and st.failures >= DEEPSEEK_KEY_FAILURE_THRESHOLD:
+                cooldown = min(_MAX_COOLDOWN_SECONDS, DEEPSEEK_KEY_COOLDOWN_SECONDS * (2 ** st.trips))
+                st.cooldown_until = max(st.cooldown_until, now + cooldown)
+                st.trips += 1
+                st.failures = 0
+
+    def snapshot(self) -> List[dict]:
+        now = time.time()
+        out = []
+        with self._state():
+            for st in self._keys.values():
+                quota_ok = self._quota_left(st)
+                out.append({
+                    "key": mask_key(st.key),
+                    "healthy": st.cooldown_until <= now and quota_ok,
+                    "cooldown_s": round(max(0.0, st.cooldown_until - now), 1),
+                    "in_flight": st.in_flight,
+                    "requests": st.requests,
+                    "tokens_used_today": st.tokens_used_today,
+                    "daily_quota": self.daily_tokens or None,
+                    "last_status": st.last_status or None,
+                    "status_counts": dict(st.status_counts),
+                })
+        return out
+
+
+_pool: Optional[ApiKeyPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_default_api_key() -> Optional[str]:
+    """服务端使用的 API Key：配置了 DEEPSEEK_API_KEYS 时为池中第一个（调用时实际由池分配）。"""
+    if DEEPSEEK_API_KEYS:
+        return DEEPSEEK_API_KEYS[0]
+    return os.getenv("DEEPSEEK_API_KEY")
+
+
+def get_key_pool(api_key: Optional[str] = None) -> Optional[ApiKeyPool]:
+    """返回全局 Key 池；api_key 不属于池（如调用方自带 Key）时返回 None，直接使用该 Key。"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                keys = list(DEEPSEEK_API_KEYS)
+                single = os.getenv("DEEPSEEK_API_KEY")
+                if not keys and single:
+                    keys = [single]
+                _pool = ApiKeyPool(keys)
+    if api_key is not None and api_key not in _pool:
+        return None
+    return _pool
@@ -4,7 +4,7 @@ import os
 load_dotenv()
 
 def verify_env_loaded():
-    test_env_var = os.getenv("DEEPSEEK_API_KEY")
+    test_env_var = os.getenv("DEEPSEEK_API_KEY") or os.getenv("DEEPSEEK_API_KEYS")
     if test_env_var:
         print(f"[OK] .env 文件加载成功，示例环境变量（部分隐藏）：{test_env_var[:8]}...")
     else:
@@ -12,7 +12,7 @@ def verify_env_loaded():
 
 verify_env_loaded()
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import StreamingResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -23,27 +23,110 @@ import os
 from pathlib import Path
 
 import asyncio
+import gzip
+import json
 import re
+import signal
+import time
+import sqlite3
+import zlib
+from contextlib import asynccontextmanager
 from urllib.parse import quote
 from concurrent.futures import ThreadPoolExecutor
 from epub_processing import extract_articles_from_epub
 from deepseek_client import (
     analyze_article_with_deepseek,
+    audio_script_from_translation_with_deepseek,
+    translate_and_script_with_deepseek,
     translate_article_with_deepseek,
     translate_title_to_chinese,
+    CancelToken,
     DeepSeekError,
+    TokenUsage,
+    prompt_cache_layout,
+    prompt_version,
 )
 from doc_builder import (
-    build_docx_from_analyses,
-    build_docx_from_translations,
+    FORMAT_MEDIA_TYPES,
+    OUTPUT_FORMATS,
+    build_from_rendered_analyses,
+    build_from_rendered_translations,
     get_pure_headings,
+    render_analyses,
+    render_analysis,
+    render_translation,
+    render_translations,
     _extract_title_from_analysis,
     _extract_article_title,
     _parse_translation,
 )
+from admission import AdmissionController, TaskLoad, estimate_article_tokens
+from article_index import ARTICLE_REUSE_THRESHOLD, get_article_index
+from cassette import DEEPSEEK_CASSETTE_MODE, get_cassette
+from concurrency import get_concurrency_limit
+from document_cache import get_document_cache
+from hedging import DEEPSEEK_HEDGE_ENABLED, HedgeBudget, get_latency_tracker
+from host_limits import HOST_LIMITS_ENABLED, HostLimiter
+from key_pool import get_default_api_key, get_key_pool
+from metrics import (
+    DEEPSEEK_CALL_SECONDS,
+    DEEPSEEK_CONCURRENCY_LIMIT,
+    DEEPSEEK_PROMPT_CACHE_TOKENS,
+    DOCUMENT_BUILD_SECONDS,
+    DOCUMENT_CACHE_BYTES,
+    DOCX_BUILD_SECONDS,
+    EPUB_EXTRACT_SECONDS,
+    INFLIGHT_ARTICLES,
+    INFLIGHT_TASKS,
+    QUEUE_WAIT_SECONDS,
+    QUEUED_TASKS,
+    RATE_LIMIT_WAIT_SECONDS,
+    render_metrics,
+)
+from scheduler import FairScheduler
+from tracing import tracer
+from usage_ledger import get_usage_ledger, summarize_usage
+from task_journal import (
+    TASK_JOURNAL_TTL_HOURS,
+    JournalState,
+    cancel_requested,
+    claim_task,
+    clear_cancel_request,
+    create_task_journal,
+    journal_epub_path,
+    list_unfinished_tasks,
+    load_batch_manifest,
+    load_task_journal,
+    purge_expired_journals,
+    record_articles,
+    record_error,
+    record_result,
+    record_status,
+    release_task,
+    request_cancel,
+    save_batch_manifest,
+)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """启动时续跑未完成任务；退出时排空正在进行的文章并释放续跑声明。"""
+    _install_drain_signal_handler()
+    try:
+        purge_expired_journals()
+        await _resume_unfinished_tasks()
+    except OSError as e:
+        _trace("RESUME_ERR", error=f"{type(e).__name__}: {e}")
+    watcher = asyncio.create_task(_watch_cancel_requests())
+    purger = asyncio.create_task(_purge_expired_tasks())
+    yield
+    watcher.cancel()
+    purger.cancel()
+    await _drain_background_tasks()
+    tracer.flush()
 
 
-app = FastAPI(title="EPUB Analyst")
+app = FastAPI(title="EPUB Analyst", lifespan=_lifespan)
 
 # 配置CORS，允许跨域请求
 # 生产环境建议指定具体域名，开发环境可以使用 "*"
@@ -67,39 +150,79 @@ app.add_middleware(
 
 MAX_PARALLEL_TASKS = int(os.getenv("MAX_PARALLEL_TASKS", "10"))
 _executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_TASKS)
-_semaphore = asyncio.Semaphore(MAX_PARALLEL_TASKS)
+# 所有任务共享的 DeepSeek 并发槽位：按任务轮转分配，同步接口走优先通道。
+# 启用自适应并发时槽位数随上游延迟与错误在 [ADAPTIVE_CONCURRENCY_MIN, MAX_PARALLEL_TASKS] 内调整
+_concurrency = get_concurrency_limit()
+_scheduler = FairScheduler(MAX_PARALLEL_TASKS, capacity_fn=(lambda: _concurrency.limit) if _concurrency else None)
+DEEPSEEK_CONCURRENCY_LIMIT.set_function(lambda: _scheduler.capacity)
 _status_lock = asyncio.Lock()
 
 # 速率限制器配置
 API_RATE_LIMIT = int(os.getenv("API_RATE_LIMIT", "5"))  # 每秒最多请求数
 
-class RateLimiter:
-    """简单的速率限制器类"""
-    def __init__(self, rate_limit: int):
-        self.rate_limit = rate_limit
-        self.last_call_time = 0.0
-        self.lock = asyncio.Lock()
+# MAX_PARALLEL_TASKS 与 API_RATE_LIMIT 是整台主机的上限：gunicorn 的多个 worker 通过锁文件共享，
+# 不再各自为政（否则 -w 4 时实际是 4 倍）。本进程的公平队列只决定哪篇文章先去争抢主机槽位。
+_host_limiter = HostLimiter(MAX_PARALLEL_TASKS, API_RATE_LIMIT, shared=HOST_LIMITS_ENABLED)
 
-    async def wait(self):
-        """等待直到可以发送下一个请求"""
-        if self.rate_limit <= 0:
-            return
-
-        async with self.lock:
-            now = asyncio.get_event_loop().time()
-            elapsed = now - self.last_call_time
-            min_interval = 1.0 / self.rate_limit
+_processing_status: dict[str, dict] = {}  # 存储处理状态
+# task_id -> { "read_rendered"/"listen_rendered": 压缩后的单篇渲染列表（见 _pack_rendered）, "base_name": str }；
+# 文档在第一次下载时才生成，放入 _document_cache
+_results_store: dict[str, dict] = {}
+_document_cache = get_document_cache()
+
+_BUSY_DETAIL = "服务繁忙，排队任务已满，请稍后重试。"
+
+# 单次批量提交最多接受的 EPUB 数
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "20"))
+
+# 进程退出时等待正在进行的文章完成并落盘的最长时间（秒），应小于 gunicorn graceful_timeout
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "25"))
+# 检查取消请求（其他 worker 收到的 DELETE）与同步接口客户端断开的间隔（秒）
+CANCEL_POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", "2"))
+
+# point-me（听我 + 看我）每篇文章的 DeepSeek 调用方式：
+# off = 口播稿与译文各一次独立调用（英文原文发送两次）；combined = 一次调用同时输出两者；
+# derived = 先翻译，再用较短的 prompt 把中文译文改写为口播稿。节省情况见 python -m benchmarks.dual_output
+POINT_ME_DUAL_OUTPUT = os.getenv("POINT_ME_DUAL_OUTPUT", "off").strip().lower()
+if POINT_ME_DUAL_OUTPUT not in ("off", "combined", "derived"):
+    raise ValueError(f"POINT_ME_DUAL_OUTPUT 只能是 off、combined 或 derived，当前为 {POINT_ME_DUAL_OUTPUT!r}")
+
+_draining = False  # 收到 SIGTERM 后置为 True：不再发起新的 DeepSeek 调用，任务留待重启后续跑
+_journaled_tasks: set[str] = set()  # 写入任务日志（可续跑）的 task_id
+_active_tasks: dict[str, asyncio.Task] = {}  # task_id -> 正在运行的后台任务（含同步接口的文章处理）
+_queued_uploads: dict[str, str] = {}  # task_id -> 准入排队中任务的临时 EPUB 路径
+# task_id -> { "base_name", "total", "listen": {序号: 渲染结果}, "read": {...} }：后台任务处理中已完成文章的
+# 单篇渲染（None 表示该篇不进文档），供 partial=1 下载；任务结束后由 _results_store 中的完整文档取代
+_partial_renders: dict[str, dict] = {}
+# task_id -> NDJSON 结果流订阅者的队列：每完成一篇放入一条记录，任务结束时放入 None
+_result_streams: dict[str, list[asyncio.Queue]] = {}
+_batches: dict[str, dict] = {}  # batch_id -> { "mode": str, "tasks": [{task_id, file_name}] }
+_reuse_totals = {"hits": 0, "tokens_saved_est": 0}  # 本进程指纹库复用累计
+_task_modes: dict[str, str] = {}  # task_id -> mode（用于按模式汇总 token 用量）
+_task_usage: dict[str, dict] = {}  # task_id -> 本进程累计的 token 用量与调用耗时
+_task_hedges: dict[str, HedgeBudget] = {}  # task_id -> 对冲额度（仅 DEEPSEEK_HEDGE_ENABLED 时）
+_spawned_tasks: set[asyncio.Task] = set()  # 由排队/续跑启动的后台任务（保留引用，防止被 GC）
+_batch_runs: dict[str, asyncio.Task] = {}  # batch_id -> 并发运行该批次各期刊的后台任务
+# task_id -> 任务结束时间：超过 TASK_JOURNAL_TTL_HOURS 后，结果与上面各 per-task 状态随任务日志一起清除
+_task_finished_at: dict[str, float] = {}
+_PURGE_INTERVAL_SECONDS = 600
+
+# 上传准入：按已接受任务的剩余文章/估计 token/内存决定立即开始、排队或 429
+# （只计处理中的任务；已完成任务的结果按 TASK_JOURNAL_TTL_HOURS 过期清除，不占准入额度）
+_admission = AdmissionController(MAX_PARALLEL_TASKS)
+
+INFLIGHT_TASKS.set_function(
+    lambda: sum(1 for st in _processing_status.values() if st.get("status") in ("processing", "building_docx"))
+)
+QUEUED_TASKS.set_function(lambda: len(_admission.snapshot()["waiting_tasks"]))
+DOCUMENT_CACHE_BYTES.set_function(lambda: _document_cache.bytes)
 
-            if elapsed < min_interval:
-                await asyncio.sleep(min_interval - elapsed)
 
-            self.last_call_time = asyncio.get_event_loop().time()
+class _TaskInterrupted(Exception):
+    """进程正在退出，任务未完成部分留待重启后从 checkpoint 续跑。"""
 
-# 创建全局速率限制器实例
-_rate_limiter = RateLimiter(API_RATE_LIMIT)
-
-_processing_status: dict[str, dict] = {}  # 存储处理状态
-_results_store: dict[str, dict] = {}  # task_id -> { "read_docx": bytes, "listen_docx": bytes, "base_name": str }
+    def __init__(self) -> None:
+        super().__init__("服务正在重启，请稍后重试。")
 
 
 def _content_disposition_utf8(filename: str, fallback: str) -> str:
@@ -108,6 +231,46 @@ def _content_disposition_utf8(filename: str, fallback: str) -> str:
     return f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{encoded}'
 
 
+def _check_format(fmt: str) -> str:
+    if fmt not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format 只能是 {'、'.join(OUTPUT_FORMATS)}")
+    return fmt
+
+
+def _wants_gzip(request: Request, fmt: str) -> bool:
+    """Markdown/HTML/JSON 是未压缩文本（docx 本身是 zip），客户端接受时按 gzip 传输。"""
+    return fmt != "docx" and "gzip" in request.headers.get("accept-encoding", "")
+
+
+def _build_document(
+    kind: str, rendered: list, fmt: str, title: str = "", metric_kind: str | None = None, compress: bool = False
+) -> BytesIO:
+    """由单篇渲染列表生成 kind（listen 口播稿 / read 译文）的 fmt 格式文档并计时；compress 时返回 gzip 数据。"""
+    build = build_from_rendered_analyses if kind == "listen" else build_from_rendered_translations
+    metric_kind = metric_kind or kind
+    if fmt == "docx":
+        timer = DOCX_BUILD_SECONDS.time(kind=metric_kind)
+    else:
+        timer = DOCUMENT_BUILD_SECONDS.time(kind=metric_kind, format=fmt)
+    with timer:
+        data = build(rendered, fmt, title)
+        if compress:
+            data = BytesIO(gzip.compress(data.getvalue(), compresslevel=6))
+    return data
+
+
+def _document_response(
+    data, fmt: str, name: str, fallback: str, headers: dict | None = None, compressed: bool = False
+) -> StreamingResponse:
+    """结果文档的下载响应；name 为不含扩展名的文件名（可含中文），fallback 中的非 ASCII 字符会被去掉。"""
+    fallback = re.sub(r"[^A-Za-z0-9._-]+", "", fallback) or "result"
+    headers = {"Content-Disposition": _content_disposition_utf8(f"{name}.{fmt}", f"{fallback}.{fmt}"), **(headers or {})}
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(data, media_type=FORMAT_MEDIA_TYPES[fmt], headers=headers)
+
+
 def _is_title_mostly_english(title: str) -> bool:
     """判断标题是否主要为英文，用于口播稿标题兜底翻译。"""
     if not title or not title.strip():
@@ -159,45 +322,709 @@ def _should_exclude_article(article, analysis: str) -> bool:
     return any(re.search(pattern, intro) for pattern in exclude_patterns)
 
 
-def _trace(msg: str, clear: bool = False) -> None:
-    p = os.path.join(os.path.dirname(__file__), "last_error.txt")
+def _trace(msg: str, task_id: str | None = None, article: int | None = None, **fields) -> None:
+    """记录一条追踪事件（只入内存队列，由后台线程写入 last_error.txt，不阻塞事件循环）。"""
+    tracer.event(msg, task_id=task_id, article=article, **fields)
+
+
+def _install_drain_signal_handler() -> None:
+    """SIGTERM 时先进入排空模式，再交给原有处理器（uvicorn/gunicorn）执行正常退出。"""
     try:
-        with open(p, "w" if clear else "a", encoding="utf-8") as f:
-            f.write(f"{msg}\n")
-    except Exception:
+        previous = signal.getsignal(signal.SIGTERM)
+    except (AttributeError, ValueError):
+        return
+
+    def _handler(signum, frame):
+        global _draining
+        _draining = True
+        if callable(previous):
+            previous(signum, frame)
+
+    try:
+        signal.signal(signal.SIGTERM, _handler)
+    except ValueError:
+        # 非主线程（如测试客户端）无法安装信号处理器
         pass
 
 
+async def _checkpoint(task_id: str, kind: str, index: int, text: str | None, error: str | None = None) -> None:
+    """将单篇结果（或失败原因）追加到任务日志；未写日志的任务（同步接口）直接跳过。"""
+    if task_id not in _journaled_tasks:
+        return
+    try:
+        if error is None:
+            await asyncio.to_thread(record_result, task_id, kind, index, text or "")
+        else:
+            await asyncio.to_thread(record_error, task_id, kind, index, error)
+    except OSError as e:
+        _trace("JOURNAL_ERR", task_id, index, error=f"{type(e).__name__}: {e}")
+
+
+async def _set_task_error(task_id: str, error: str) -> None:
+    _processing_status[task_id] = {"status": "error", "error": error}
+    if task_id in _journaled_tasks:
+        try:
+            await asyncio.to_thread(record_status, task_id, "error", error)
+        except OSError:
+            pass
+
+
+async def _set_task_completed(task_id: str) -> None:
+    async with _status_lock:
+        if task_id in _processing_status:
+            _processing_status[task_id]["status"] = "completed"
+    if task_id in _journaled_tasks:
+        try:
+            await asyncio.to_thread(record_status, task_id, "completed")
+        except OSError:
+            pass
+
+
+async def _record_failures(task_id: str, kind: str, results: list[tuple[int, str | None, str | None]]) -> None:
+    """把失败文章序号写入任务状态（按 kind 区分），供前端展示与 /api/tasks/{task_id}/retry 使用。"""
+    failed = [idx for idx, _, err in results if err is not None]
+    async with _status_lock:
+        status = _processing_status.get(task_id)
+        if status is None:
+            return
+        by_kind = status.setdefault("failed_indices", {})
+        if failed:
+            by_kind[kind] = failed
+        else:
+            by_kind.pop(kind, None)
+        status["failed_count"] = sum(len(v) for v in by_kind.values())
+
+
+async def _start_task_journal(task_id: str, mode: str, file_name: str, tmp_path: str) -> None:
+    """为后台任务建立日志并声明由当前进程负责（复制 EPUB 与 fsync 在线程中进行）；日志目录不可写时退化为纯内存任务。"""
+    _task_modes[task_id] = mode
+    try:
+        await asyncio.to_thread(create_task_journal, task_id, mode, file_name, tmp_path)
+        await asyncio.to_thread(claim_task, task_id)
+        _journaled_tasks.add(task_id)
+    except OSError as e:
+        _trace("JOURNAL_ERR", task_id, error=f"{type(e).__name__}: {e}")
+
+
+async def _load_task_articles(task_id: str, tmp_path: str, state: JournalState | None) -> list:
+    """续跑时直接用日志中的文章列表，否则在线程中解析 EPUB（不阻塞事件循环）并落盘。"""
+    if state is not None and state.articles is not None:
+        return state.articles
+    with EPUB_EXTRACT_SECONDS.time(), tracer.span("EXTRACT", task_id):
+        articles = await asyncio.to_thread(extract_articles_from_epub, tmp_path)
+    if articles and task_id in _journaled_tasks:
+        try:
+            await asyncio.to_thread(record_articles, task_id, articles)
+        except OSError as e:
+            _trace("JOURNAL_ERR", task_id, error=f"{type(e).__name__}: {e}")
+    return articles
+
+
+def _task_load(articles: list, kinds: int, done_count: int) -> TaskLoad:
+    """任务剩余的文章数、估计 token 与内存。"""
+    remaining = max(0, len(articles) * kinds - done_count)
+    per_pass = sum(estimate_article_tokens(a.content) for a in articles)
+    tokens = per_pass * remaining // max(1, len(articles))
+    memory = sum(len(a.content) + len(a.title) for a in articles) * (1 + kinds)
+    return TaskLoad(articles=remaining, tokens=tokens, memory=memory)
+
+
+def _account_task_load(task_id: str, articles: list, kinds: int, done_count: int) -> None:
+    """解析出文章后，用实际的剩余篇数、估计 token 与内存更新准入控制的登记。"""
+    load = _task_load(articles, kinds, done_count)
+    _admission.update(task_id, load.articles, load.tokens, load.memory, total_articles=len(articles))
+
+
+async def _after(first: asyncio.Future, coro):
+    await first
+    return await coro
+
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _spawned_tasks.add(task)
+    task.add_done_callback(_spawned_tasks.discard)
+    return task
+
+
+def _pack_rendered(rendered: list) -> bytes:
+    """任务完成时只保存单篇渲染列表（zlib 压缩，体积与 docx 相当），任何文档都在下载时才生成。"""
+    return zlib.compress(json.dumps(rendered, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def _unpack_rendered(blob: bytes) -> list:
+    return [tuple(item) for item in json.loads(zlib.decompress(blob))]
+
+
+def _store_results(task_id: str, base_name: str, **rendered: list) -> None:
+    _results_store[task_id] = {"base_name": base_name, **{f"{k}_rendered": _pack_rendered(v) for k, v in rendered.items()}}
+    _document_cache.discard_task(task_id)  # 重试后结果可能变化
+
+
+def _finish_background_task(task_id: str, tmp_path: str) -> None:
+    _active_tasks.pop(task_id, None)
+    _task_finished_at[task_id] = time.time()
+    _partial_renders.pop(task_id, None)
+    _close_result_streams(task_id)
+    _task_hedges.pop(task_id, None)
+    _admission.release(task_id)
+    if task_id in _journaled_tasks:
+        release_task(task_id)
+    if tmp_path and os.path.exists(tmp_path):
+        try:
+            os.remove(tmp_path)
+        except Exception:
+            pass
+
+
+async def _resume_unfinished_tasks() -> None:
+    """启动时扫描任务日志，续跑上次进程未完成的任务（只对尚无结果的文章调用 DeepSeek）。
+    这些任务在重启前已被接受过，不再经过准入控制，由 _account_task_load 直接登记负载。"""
+    api_key = get_default_api_key()
+    if not api_key:
+        return
+    for task_id in list_unfinished_tasks():
+        if not claim_task(task_id):
+            continue
+        state = load_task_journal(task_id)
+        runner = _task_runner(state.mode) if state is not None else None
+        if state is None or state.finished or runner is None:
+            release_task(task_id)
+            continue
+        if state.mode in _SYNC_MODES:
+            # 同步接口的客户端连接已断开，不自动续跑，留待 /api/tasks/{task_id}/retry
+            await asyncio.to_thread(record_status, task_id, "error", "服务重启导致处理中断，可重试未完成的文章。")
+            release_task(task_id)
+            continue
+        tmp_path = journal_epub_path(task_id) if state.articles is None else ""
+        _journaled_tasks.add(task_id)
+        _task_modes[task_id] = state.mode
+        _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0, "resumed": True}
+        _trace("RESUME", task_id, mode=state.mode)
+        _spawn(runner(task_id, tmp_path, api_key, state.file_name, state))
+
+
+async def _drain_background_tasks() -> None:
+    """等待后台任务中正在进行的文章完成（新文章不再开始），超时后取消；未完成任务留在日志中。"""
+    global _draining
+    _draining = True
+    # 已启动但协程尚未开始执行（还没登记到 _active_tasks）的后台任务也要等
+    pending = {t for t in (*_active_tasks.values(), *_spawned_tasks) if not t.done()}
+    if pending:
+        _, still_running = await asyncio.wait(pending, timeout=SHUTDOWN_DRAIN_SECONDS)
+        for t in still_running:
+            t.cancel()
+    for task_id in list(_journaled_tasks):
+        release_task(task_id)
+
+
+async def _cancel_task(task_id: str, reason: str) -> bool:
+    """取消本进程中的任务：准入排队中的移出队列；运行中的取消其协程，排队与在途的文章一并取消
+    （在途 HTTP 请求随之中断），槽位、准入容量与 Key 立即归还其他任务。任务不在本进程时返回 False。"""
+    if _admission.cancel_waiting(task_id):
+        tmp_path = _queued_uploads.pop(task_id, "")
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    else:
+        task = _active_tasks.get(task_id)
+        if task is None or task.done():
+            return False
+        # 先置状态：协程退出时关闭的结果流据此输出 cancelled
+        _processing_status[task_id] = {"status": "cancelled"}
+        task.cancel()
+        await asyncio.wait([task], timeout=5.0)
+    _processing_status[task_id] = {"status": "cancelled"}
+    _task_finished_at[task_id] = time.time()
+    _task_hedges.pop(task_id, None)
+    _partial_renders.pop(task_id, None)
+    _close_result_streams(task_id)
+    if task_id in _journaled_tasks:
+        try:
+            await asyncio.to_thread(record_status, task_id, "cancelled")
+        except OSError:
+            pass
+        release_task(task_id)
+    clear_cancel_request(task_id)
+    _trace("CANCELLED", task_id, reason=reason)
+    return True
+
+
+def _forget_expired_tasks(now: float) -> int:
+    """清除结束超过 TASK_JOURNAL_TTL_HOURS 的任务在内存中的结果与状态（与任务日志的保留时长一致），返回清除的任务数。"""
+    cutoff = now - TASK_JOURNAL_TTL_HOURS * 3600
+    expired = [
+        tid for tid, finished in _task_finished_at.items()
+        if finished < cutoff and tid not in _active_tasks and tid not in _queued_uploads
+    ]
+    for task_id in expired:
+        _task_finished_at.pop(task_id, None)
+        _results_store.pop(task_id, None)
+        _processing_status.pop(task_id, None)
+        _task_usage.pop(task_id, None)
+        _task_modes.pop(task_id, None)
+        _task_hedges.pop(task_id, None)
+        _document_cache.discard_task(task_id)
+    if expired:
+        for batch_id, manifest in list(_batches.items()):
+            if not any(t["task_id"] in _processing_status for t in manifest["tasks"]):
+                _batches.pop(batch_id, None)
+    return len(expired)
+
+
+async def _purge_expired_tasks() -> None:
+    """定期清除过期任务：内存中的结果与状态，以及磁盘上的任务日志。"""
+    while True:
+        await asyncio.sleep(_PURGE_INTERVAL_SECONDS)
+        forgotten = _forget_expired_tasks(time.time())
+        try:
+            purged = await asyncio.to_thread(purge_expired_journals)
+        except OSError as e:
+            _trace("PURGE_ERR", error=f"{type(e).__name__}: {e}")
+            purged = 0
+        if forgotten or purged:
+            _trace("PURGE", forgotten=forgotten, journals=purged)
+
+
+async def _watch_cancel_requests() -> None:
+    """定期检查本进程持有的任务是否被其他 worker 收到的 DELETE 请求取消。"""
+    while True:
+        await asyncio.sleep(CANCEL_POLL_SECONDS)
+        owned = list(_active_tasks) + list(_queued_uploads)
+        for task_id in owned:
+            try:
+                requested = cancel_requested(task_id)
+            except OSError:
+                continue
+            if requested:
+                await _cancel_task(task_id, "delete")
+
+
+async def _cancel_on_disconnect(request: Request, task_id: str, coro):
+    """同步接口的文章处理：客户端断开（或收到 DELETE）时取消 coro，不再为没人接收的结果调用 DeepSeek。"""
+    work = asyncio.ensure_future(coro)
+    _active_tasks[task_id] = work
+    try:
+        while not work.done():
+            await asyncio.wait([work], timeout=CANCEL_POLL_SECONDS)
+            if not work.done() and await request.is_disconnected():
+                await _cancel_task(task_id, "client_disconnected")
+                raise HTTPException(status_code=499, detail="客户端已断开")
+        if work.cancelled():
+            raise HTTPException(status_code=409, detail="任务已取消")
+        return work.result()
+    finally:
+        _active_tasks.pop(task_id, None)
+        if not work.done():
+            work.cancel()
+
+
+def _status_from_journal(task_id: str) -> dict:
+    """本进程内存中没有该任务（其他 worker 或重启前创建）时，从任务日志推出进度。"""
+    state = load_task_journal(task_id)
+    if state is None:
+        return {"status": "not_found"}
+    if state.status == "error":
+        return {"status": "error", "error": state.error or "处理失败"}
+    kinds = len(_MODE_KINDS.get(state.mode, ("listen",)))
+    total = len(state.articles) * kinds if state.articles is not None else 0
+    current = sum(
+        len(state.results.get(k, {})) + len(state.errors.get(k, {})) for k in _MODE_KINDS.get(state.mode, ())
+    )
+    return {"status": state.status, "current": min(current, total), "total": total}
+
+
+def _render_article(kind: str, article, text: str):
+    """单篇结果在最终文档中的渲染；按与完整文档相同的规则被过滤掉时返回 None。"""
+    if kind == "listen":
+        if (
+            text.strip() == "【不生成口播稿】"
+            or _is_cartoon_article(article, text)
+            or _should_exclude_article(article, text)
+        ):
+            return None
+        return render_analysis(text, article)
+    if _is_cartoon_translation(article, text):
+        return None
+    return render_translation(text, article)
+
+
+def _render_partial(task_id: str, kind: str, index: int, article, text: str) -> None:
+    """文章完成时渲染一次并缓存，partial=1 下载只需按序拼装。同步接口的任务不缓存。"""
+    entry = _partial_renders.get(task_id)
+    if entry is not None:
+        entry[kind][index] = _render_article(kind, article, text)
+
+
+def _article_record(
+    kind: str,
+    index: int,
+    total: int,
+    article,
+    text: str | None,
+    error: str | None = None,
+    timings: dict | None = None,
+    usage: TokenUsage | None = None,
+    reused: bool = False,
+) -> dict:
+    """单篇结果的 NDJSON 记录。标题与正文段落取自与文档相同的渲染（不生成 docx），
+    按文档规则被过滤掉的文章 excluded=True、text 为空。"""
+    record = {
+        "type": "article", "kind": kind, "index": index, "total": total,
+        "title": article.title, "text": None, "excluded": False, "error": error,
+    }
+    if error is None:
+        rendered = _render_article(kind, article, text or "")
+        if rendered is None:
+            record["excluded"] = True
+        else:
+            record["title"] = rendered[0]
+            record["text"] = "\n".join(rendered[1])
+            if kind == "read" and rendered[2]:
+                record["note"] = rendered[2]
+    if timings is not None:
+        record["timings"] = timings
+    if usage is not None and usage.requests:
+        record["tokens"] = usage.as_dict()
+    if reused:
+        record["reused"] = True
+    return record
+
+
+def _publish_result(task_id: str, kind: str, index: int, total: int, article, text: str | None, **extra) -> None:
+    """把单篇结果推给该任务的 NDJSON 结果流订阅者（没有订阅者时不做任何渲染）。
+    在 checkpoint 之后调用：订阅后再读任务日志的客户端不会漏掉结果。"""
+    queues = _result_streams.get(task_id)
+    if queues:
+        record = _article_record(kind, index, total, article, text, **extra)
+        for q in queues:
+            q.put_nowait(record)
+
+
+def _close_result_streams(task_id: str) -> None:
+    for q in _result_streams.pop(task_id, []):
+        q.put_nowait(None)
+
+
+async def _gather_articles(
+    kind: str,
+    articles: list,
+    api_key: str,
+    task_id: str,
+    done: dict[int, str] | None = None,
+    priority: bool = False,
+) -> list[tuple[int, str | None, str | None]]:
+    """并发处理尚无结果的文章，按序号返回 (index, text, error)；done 中已 checkpoint 的结果直接复用。
+    priority=True 用于同步接口，其文章在公平队列中优先调度。"""
+    done = done or {}
+    worker = _process_single_article if kind == "listen" else _process_single_translation
+    total = len(articles)
+    pending = [(idx, art) for idx, art in enumerate(articles, start=1) if idx not in done]
+    reused = await _prepare_articles(kind, articles, task_id, done, "listen" if kind == "listen" else "translate")
+    tasks = [
+        worker(art, idx, total, api_key, task_id, priority)
+        for idx, art in pending
+        if idx not in reused
+    ]
+    results = list(await asyncio.gather(*tasks, return_exceptions=False))
+    if _draining:
+        raise _TaskInterrupted()
+    results.extend((idx, text, None) for idx, text in done.items())
+    results.extend((idx, text, None) for idx, text in reused.items())
+    return sorted(results, key=lambda r: r[0])
+
+
+async def _prepare_articles(
+    kind: str, articles: list, task_id: str, done: dict[int, str], call: str
+) -> dict[int, str]:
+    """查询尚无结果的文章能否跨期复用（只复用同一 prompt 产生的输出，见 _reuse_kind）；
+    已 checkpoint 与复用的结果计入部分文档，复用的推给结果流。"""
+    total = len(articles)
+    pending = [(idx, art) for idx, art in enumerate(articles, start=1) if idx not in done]
+    reused = await _lookup_reused_outputs(kind, pending, task_id, call)
+    for idx, text in list(done.items()) + list(reused.items()):
+        _render_partial(task_id, kind, idx, articles[idx - 1], text)
+    for idx, text in sorted(reused.items()):
+        _publish_result(task_id, kind, idx, total, articles[idx - 1], text, reused=True)
+    return reused
+
+
+async def _gather_dual_articles(
+    articles: list,
+    api_key: str,
+    task_id: str,
+    listen_done: dict[int, str],
+    read_done: dict[int, str],
+    priority: bool = False,
+) -> tuple[list, list]:
+    """point-me 的单次请求双输出（POINT_ME_DUAL_OUTPUT 非 off）：每篇文章的口播稿与译文由同一组调用产生，
+    返回与 _gather_articles 相同格式的 (口播稿结果, 译文结果)。两种结果中只缺一种的文章（续跑、复用）
+    按原方式单独补齐；derived 模式下已有译文的文章直接由译文改写口播稿。"""
+    total = len(articles)
+    combined = POINT_ME_DUAL_OUTPUT == "combined"
+    listen_known = {
+        **listen_done,
+        **await _prepare_articles("listen", articles, task_id, listen_done, "point" if combined else "derive"),
+    }
+    read_known = {
+        **read_done,
+        **await _prepare_articles("read", articles, task_id, read_done, "point" if combined else "translate"),
+    }
+
+    async def one(idx: int, art) -> tuple[tuple, tuple]:
+        known_listen = (idx, listen_known[idx], None) if idx in listen_known else None
+        known_read = (idx, read_known[idx], None) if idx in read_known else None
+        if POINT_ME_DUAL_OUTPUT == "combined" and known_listen is None and known_read is None:
+            return await _process_single_dual(art, idx, total, api_key, task_id, priority)
+        if POINT_ME_DUAL_OUTPUT == "derived" and known_listen is None:
+            read_res = known_read or await _process_single_translation(art, idx, total, api_key, task_id, priority)
+            if read_res[2] is not None:
+                return (await _skip_article(task_id, "listen", idx, total, art, f"译文生成失败：{read_res[2]}"), read_res)
+            listen_res = await _process_single_article(art, idx, total, api_key, task_id, priority, translation=read_res[1])
+            return (listen_res, read_res)
+        listen_res, read_res = await asyncio.gather(
+            _completed(known_listen) if known_listen else _process_single_article(art, idx, total, api_key, task_id, priority),
+            _completed(known_read) if known_read else _process_single_translation(art, idx, total, api_key, task_id, priority),
+        )
+        return (listen_res, read_res)
+
+    pairs = await asyncio.gather(*(one(idx, art) for idx, art in enumerate(articles, start=1)))
+    if _draining:
+        raise _TaskInterrupted()
+    return ([p[0] for p in pairs], [p[1] for p in pairs])
+
+
+async def _completed(result: tuple) -> tuple:
+    return result
+
+
+async def _skip_article(task_id: str, kind: str, index: int, total: int, article, error: str) -> tuple[int, None, str]:
+    """不调用 DeepSeek 直接记为失败（例如 derived 模式下译文失败，无法改写口播稿），可通过重试补齐。"""
+    _admission.article_done(task_id)
+    await _checkpoint(task_id, kind, index, None, error)
+    _publish_result(task_id, kind, index, total, article, None, error=error)
+    return (index, None, error)
+
+
+def _reuse_kind(kind: str, call: str) -> str:
+    """指纹库中的 kind：结果种类 + 产生它的调用方式与 prompt 版本。prompt 改动后旧输出自然失效，
+    point-me 双输出/由译文改写的口播稿也不会被普通的听我任务复用（反之亦然）。"""
+    return f"{kind}:{call}:{prompt_version(call)}"
+
+
+async def _lookup_reused_outputs(kind: str, pending: list, task_id: str, call: str) -> dict[int, str]:
+    """调度前查询跨期指纹库，近似相同的文章直接复用历史输出（并 checkpoint），不再调用 DeepSeek。"""
+    index = get_article_index()
+    if index is None or not pending:
+        return {}
+    index_kind = _reuse_kind(kind, call)
+
+    def _lookup_all() -> dict:
+        hits = {}
+        for idx, art in pending:
+            try:
+                hit = index.lookup(art.content, index_kind)
+            except (sqlite3.Error, OSError) as e:
+                _trace("REUSE_ERR", task_id, idx, error=f"{type(e).__name__}: {e}")
+                return hits
+            if hit is not None:
+                hits[idx] = hit
+        return hits
+
+    hits = await asyncio.to_thread(_lookup_all)
+    if not hits:
+        return {}
+    saved = sum(h.tokens for h in hits.values())
+    _reuse_totals["hits"] += len(hits)
+    _admission.article_done(task_id, len(hits))
+    _reuse_totals["tokens_saved_est"] += saved
+    async with _status_lock:
+        status = _processing_status.get(task_id)
+        if status is not None:
+            status["current"] = status.get("current", 0) + len(hits)
+            reuse = status.setdefault("reuse", {"hits": 0, "tokens_saved_est": 0})
+            reuse["hits"] += len(hits)
+            reuse["tokens_saved_est"] += saved
+    for idx, hit in sorted(hits.items()):
+        _trace("REUSE", task_id, idx, kind=kind, similarity=round(hit.similarity, 2))
+        await _checkpoint(task_id, kind, idx, hit.output)
+    return {idx: hit.output for idx, hit in hits.items()}
+
+
+async def _remember_output(kind: str, call: str, article, text: str) -> None:
+    """把成功结果登记到指纹库，供之后的期刊复用；call 为产生该结果的调用方式（见 _reuse_kind）。"""
+    index = get_article_index()
+    if index is None:
+        return
+    try:
+        await asyncio.to_thread(index.add, article.content, _reuse_kind(kind, call), text)
+    except (sqlite3.Error, OSError) as e:
+        _trace("REUSE_ERR", error=f"{type(e).__name__}: {e}")
+
+
+async def _note_queue_wait(task_id: str, waited: float) -> None:
+    """累计任务在公平队列中的等待时间，写入任务状态。"""
+    async with _status_lock:
+        status = _processing_status.get(task_id)
+        if status is None:
+            return
+        q = status.setdefault("queue_wait", {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        q["count"] += 1
+        q["total_s"] = round(q["total_s"] + waited, 3)
+        q["max_s"] = round(max(q["max_s"], waited), 3)
+        q["avg_s"] = round(q["total_s"] / q["count"], 3)
+
+
+async def _record_usage(task_id: str, kind: str, index: int, usage: TokenUsage, seconds: float) -> None:
+    """把单篇文章（或标题）的 token 用量累加到任务状态，并写入用量台账。"""
+    if usage.requests == 0:
+        return
+    counts = usage.as_dict()
+    DEEPSEEK_PROMPT_CACHE_TOKENS.inc(usage.prompt_cache_hit_tokens, kind=kind, cache="hit")
+    DEEPSEEK_PROMPT_CACHE_TOKENS.inc(usage.prompt_cache_miss_tokens, kind=kind, cache="miss")
+    _trace("USAGE", task_id, index, kind=kind, **counts)
+    async with _status_lock:
+        raw = _task_usage.setdefault(task_id, {"seconds": 0.0})
+        for k, v in counts.items():
+            raw[k] = raw.get(k, 0) + v
+        raw["seconds"] += seconds
+        status = _processing_status.get(task_id)
+        if status is not None:
+            status["usage"] = summarize_usage(raw)
+    ledger = get_usage_ledger()
+    if ledger is None:
+        return
+    try:
+        await asyncio.to_thread(
+            ledger.record, task_id, _task_modes.get(task_id, ""), kind, index, counts, seconds
+        )
+    except (sqlite3.Error, OSError) as e:
+        _trace("USAGE_ERR", task_id, index, error=f"{type(e).__name__}: {e}")
+
+
+def _article_timings(queue_wait: float, deepseek_seconds: float) -> dict:
+    return {"queue_wait_s": round(queue_wait, 3), "deepseek_s": round(deepseek_seconds, 3)}
+
+
+async def _run_deepseek(fn):
+    """在执行器线程中运行 fn(cancel)；本协程被取消（任务取消、客户端断开）时，线程中正在进行的
+    HTTP 请求随之取消，不必等它跑完才归还 Key 与连接。"""
+    cancel = CancelToken()
+    future = asyncio.get_running_loop().run_in_executor(_executor, fn, cancel)
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancel.cancel()
+        raise
+
+
+def _hedge_budget(task_id: str, total: int) -> HedgeBudget | None:
+    """任务的对冲额度（按文章数计，同一任务的听/读两条流程共用）；未启用对冲时返回 None。"""
+    if not DEEPSEEK_HEDGE_ENABLED:
+        return None
+    budget = _task_hedges.get(task_id)
+    if budget is None:
+        budget = _task_hedges[task_id] = HedgeBudget(total, reserve=_hedge_reserver(task_id, asyncio.get_running_loop()))
+    return budget
+
+
+def _hedge_reserver(task_id: str, loop: asyncio.AbstractEventLoop):
+    """对冲请求的槽位预留：与原请求一样占用公平队列槽位（自适应并发上限）与主机级槽位，并按主机速率排队。
+    在执行器线程的事件循环中调用；公平队列只在主循环中操作。没有空闲槽位时不等待，直接放弃对冲。"""
+    async def reserve():
+        got = await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(_call_soon(_scheduler.try_acquire, task_id), loop)
+        )
+        if not got:
+            return None
+        release_host = _host_limiter.try_slot()
+        if release_host is None:
+            loop.call_soon_threadsafe(_scheduler.release, task_id)
+            return None
+
+        def release() -> None:
+            release_host()
+            loop.call_soon_threadsafe(_scheduler.release, task_id)
+
+        try:
+            RATE_LIMIT_WAIT_SECONDS.observe(await _host_limiter.wait_rate())
+        except BaseException:
+            release()
+            raise
+        return release
+
+    return reserve
+
+
+async def _call_soon(fn, *args):
+    return fn(*args)
+
+
 async def _process_single_article(
     article,
     index: int,
     total: int,
     api_key: str,
     task_id: str,
+    priority: bool = False,
+    translation: str | None = None,
 ) -> tuple[int, str | None, str | None]:
-    """处理单篇文章，返回 (index, analysis, error)。成功时 error 为 None。"""
-    async with _semaphore:
-        # 应用速率限制
-        await _rate_limiter.wait()
-        _trace(f"STEP3: calling DeepSeek for article {index}/{total}")
+    """处理单篇文章，返回 (index, analysis, error)。成功时 error 为 None。
+    给出 translation 时由该中文译文改写口播稿（POINT_ME_DUAL_OUTPUT=derived），不再发送英文原文。"""
+    call_kind = "listen" if translation is None else "derive"
+    analysis = error = None
+    usage = TokenUsage()
+    async with _scheduler.slot(task_id, priority) as waited, _host_limiter.slot() as host_waited:
+        await _note_queue_wait(task_id, waited + host_waited)
+        QUEUE_WAIT_SECONDS.observe(waited + host_waited, lane="priority" if priority else "normal")
+        if _draining:
+            return (index, None, "服务正在重启")
+        # 应用速率限制（主机内所有 worker 共享）
+        RATE_LIMIT_WAIT_SECONDS.observe(await _host_limiter.wait_rate())
+        _trace("STEP3", task_id, index, kind="listen", total=total, derived=translation is not None)
+        started = time.perf_counter()
         try:
-            loop = asyncio.get_event_loop()
-            analysis = await loop.run_in_executor(
-                _executor,
-                lambda a=article, i=index, t=total, k=api_key: analyze_article_with_deepseek(
-                    article=a, index=i, total=t, api_key=k, timeout_seconds=300.0
-                ),
-            )
-            async with _status_lock:
-                if task_id in _processing_status:
-                    _processing_status[task_id]["current"] = (
-                        _processing_status[task_id].get("current", 0) + 1
+            with INFLIGHT_ARTICLES.track_inprogress(kind="listen"):
+                if translation is None:
+                    analysis = await _run_deepseek(
+                        lambda c, a=article, i=index, t=total, k=api_key, u=usage, h=_hedge_budget(task_id, total): (
+                            analyze_article_with_deepseek(
+                                article=a, index=i, total=t, api_key=k, timeout_seconds=300.0, usage=u, hedge=h, cancel=c
+                            )
+                        ),
+                    )
+                else:
+                    analysis = await _run_deepseek(
+                        lambda c, tr=translation, i=index, t=total, k=api_key, u=usage, h=_hedge_budget(task_id, total): (
+                            audio_script_from_translation_with_deepseek(
+                                tr, i, t, k, timeout_seconds=300.0, usage=u, hedge=h, cancel=c
+                            )
+                        ),
                     )
-            _trace(f"STEP3_DONE: article {index}/{total} completed")
-            return (index, analysis, None)
         except DeepSeekError as e:
-            _trace(f"STEP_ERR: DeepSeekError article={index} error={str(e)}")
-            return (index, None, str(e))
+            error = str(e)
+        elapsed = time.perf_counter() - started
+        DEEPSEEK_CALL_SECONDS.observe(elapsed, kind=call_kind, outcome="ok" if error is None else "error")
+    # 用量台账、任务日志与指纹库的写入在退出槽位后进行，磁盘 I/O 不占用 DeepSeek 并发槽位
+    await _record_usage(task_id, "listen", index, usage, elapsed)
+    _admission.article_done(task_id)
+    timings = _article_timings(waited + host_waited, elapsed)
+    if error is not None:
+        _trace("STEP_ERR", task_id, index, kind="listen", error=error, duration_ms=round(elapsed * 1000, 1))
+        await _checkpoint(task_id, "listen", index, None, error)
+        _publish_result(task_id, "listen", index, total, article, None, error=error, timings=timings, usage=usage)
+        return (index, None, error)
+    async with _status_lock:
+        if task_id in _processing_status:
+            _processing_status[task_id]["current"] = _processing_status[task_id].get("current", 0) + 1
+    _trace("STEP3_DONE", task_id, index, kind="listen", duration_ms=round(elapsed * 1000, 1))
+    _render_partial(task_id, "listen", index, article, analysis)
+    await _checkpoint(task_id, "listen", index, analysis)
+    _publish_result(task_id, "listen", index, total, article, analysis, timings=timings, usage=usage)
+    await _remember_output("listen", call_kind, article, analysis)
+    return (index, analysis, None)
 
 
 async def _process_single_translation(
@@ -206,59 +1033,142 @@ async def _process_single_translation(
     total: int,
     api_key: str,
     task_id: str,
+    priority: bool = False,
 ) -> tuple[int, str | None, str | None]:
     """处理单篇翻译，返回 (index, translation, error)。成功时 error 为 None。"""
-    async with _semaphore:
-        # 应用速率限制
-        await _rate_limiter.wait()
-        _trace(f"TRANSLATE: calling DeepSeek for article {index}/{total}")
+    translation = error = None
+    usage = TokenUsage()
+    async with _scheduler.slot(task_id, priority) as waited, _host_limiter.slot() as host_waited:
+        await _note_queue_wait(task_id, waited + host_waited)
+        QUEUE_WAIT_SECONDS.observe(waited + host_waited, lane="priority" if priority else "normal")
+        if _draining:
+            return (index, None, "服务正在重启")
+        # 应用速率限制（主机内所有 worker 共享）
+        RATE_LIMIT_WAIT_SECONDS.observe(await _host_limiter.wait_rate())
+        _trace("TRANSLATE", task_id, index, kind="read", total=total)
+        started = time.perf_counter()
         try:
-            loop = asyncio.get_event_loop()
-            translation = await loop.run_in_executor(
-                _executor,
-                lambda a=article, i=index, t=total, k=api_key: translate_article_with_deepseek(
-                    article=a, index=i, total=t, api_key=k, timeout_seconds=180.0
-                ),
-            )
-            async with _status_lock:
-                if task_id in _processing_status:
-                    _processing_status[task_id]["current"] = (
-                        _processing_status[task_id].get("current", 0) + 1
-                    )
-            _trace(f"TRANSLATE_DONE: article {index}/{total} completed")
-            return (index, translation, None)
+            with INFLIGHT_ARTICLES.track_inprogress(kind="translate"):
+                translation = await _run_deepseek(
+                    lambda c, a=article, i=index, t=total, k=api_key, u=usage, h=_hedge_budget(task_id, total): (
+                        translate_article_with_deepseek(
+                            article=a, index=i, total=t, api_key=k, timeout_seconds=180.0, usage=u, hedge=h, cancel=c
+                        )
+                    ),
+                )
+        except DeepSeekError as e:
+            error = str(e)
+        elapsed = time.perf_counter() - started
+        DEEPSEEK_CALL_SECONDS.observe(elapsed, kind="translate", outcome="ok" if error is None else "error")
+    # 与 _process_single_article 相同：落盘在退出槽位后进行
+    await _record_usage(task_id, "read", index, usage, elapsed)
+    _admission.article_done(task_id)
+    timings = _article_timings(waited + host_waited, elapsed)
+    if error is not None:
+        _trace("TRANSLATE_ERR", task_id, index, kind="read", error=error, duration_ms=round(elapsed * 1000, 1))
+        await _checkpoint(task_id, "read", index, None, error)
+        _publish_result(task_id, "read", index, total, article, None, error=error, timings=timings, usage=usage)
+        return (index, None, error)
+    async with _status_lock:
+        if task_id in _processing_status:
+            _processing_status[task_id]["current"] = _processing_status[task_id].get("current", 0) + 1
+    _trace("TRANSLATE_DONE", task_id, index, kind="read", duration_ms=round(elapsed * 1000, 1))
+    _render_partial(task_id, "read", index, article, translation)
+    await _checkpoint(task_id, "read", index, translation)
+    _publish_result(task_id, "read", index, total, article, translation, timings=timings, usage=usage)
+    await _remember_output("read", "translate", article, translation)
+    return (index, translation, None)
+
+
+async def _process_single_dual(
+    article,
+    index: int,
+    total: int,
+    api_key: str,
+    task_id: str,
+    priority: bool = False,
+) -> tuple[tuple, tuple]:
+    """一次调用同时生成单篇的口播稿与译文（POINT_ME_DUAL_OUTPUT=combined），返回 (口播稿结果, 译文结果)，
+    格式同 _process_single_article。双输出失败（截断、格式不符、请求出错）时改用两次独立调用。"""
+    translation = analysis = None
+    usage = TokenUsage()
+    async with _scheduler.slot(task_id, priority) as waited, _host_limiter.slot() as host_waited:
+        await _note_queue_wait(task_id, waited + host_waited)
+        QUEUE_WAIT_SECONDS.observe(waited + host_waited, lane="priority" if priority else "normal")
+        if _draining:
+            return ((index, None, "服务正在重启"), (index, None, "服务正在重启"))
+        # 应用速率限制（主机内所有 worker 共享）
+        RATE_LIMIT_WAIT_SECONDS.observe(await _host_limiter.wait_rate())
+        _trace("DUAL", task_id, index, kind="point", total=total)
+        started = time.perf_counter()
+        try:
+            with INFLIGHT_ARTICLES.track_inprogress(kind="point"):
+                translation, analysis = await _run_deepseek(
+                    lambda c, a=article, i=index, t=total, k=api_key, u=usage, h=_hedge_budget(task_id, total): (
+                        translate_and_script_with_deepseek(
+                            article=a, index=i, total=t, api_key=k, timeout_seconds=300.0, usage=u, hedge=h, cancel=c
+                        )
+                    ),
+                )
         except DeepSeekError as e:
-            _trace(f"TRANSLATE_ERR: article={index} error={str(e)}")
-            return (index, None, str(e))
+            _trace("DUAL_FALLBACK", task_id, index, kind="point", error=str(e))
+        elapsed = time.perf_counter() - started
+        DEEPSEEK_CALL_SECONDS.observe(elapsed, kind="point", outcome="ok" if translation is not None else "error")
+    # 与 _process_single_article 相同：落盘在退出槽位后进行
+    await _record_usage(task_id, "point", index, usage, elapsed)
+    if translation is None:
+        # 退出槽位后再改用独立调用，两次调用各自排队
+        listen_res, read_res = await asyncio.gather(
+            _process_single_article(article, index, total, api_key, task_id, priority),
+            _process_single_translation(article, index, total, api_key, task_id, priority),
+        )
+        return (listen_res, read_res)
+    async with _status_lock:
+        if task_id in _processing_status:
+            _processing_status[task_id]["current"] = _processing_status[task_id].get("current", 0) + 2
+    _admission.article_done(task_id, 2)
+    _trace("DUAL_DONE", task_id, index, kind="point", duration_ms=round(elapsed * 1000, 1))
+    timings = _article_timings(waited + host_waited, elapsed)
+    for kind, text in (("listen", analysis), ("read", translation)):
+        _render_partial(task_id, kind, index, article, text)
+        await _checkpoint(task_id, kind, index, text)
+        # 两种结果来自同一次调用，token 用量只随口播稿记录报告一次
+        _publish_result(
+            task_id, kind, index, total, article, text, timings=timings, usage=usage if kind == "listen" else None
+        )
+        await _remember_output(kind, "point", article, text)
+    return ((index, analysis, None), (index, translation, None))
 
 
 async def process_listen_task_background(
-    task_id: str, tmp_path: str, api_key: str, file_name: str
+    task_id: str, tmp_path: str, api_key: str, file_name: str, state: JournalState | None = None
 ) -> None:
-    """Background task: process listen-me (口播稿)."""
+    """Background task: process listen-me (口播稿)。state 非空时为重启后续跑。"""
+    _active_tasks[task_id] = asyncio.current_task()
     try:
-        articles = extract_articles_from_epub(tmp_path)
+        articles = await _load_task_articles(task_id, tmp_path, state)
         if not articles:
-            _processing_status[task_id] = {"status": "error", "error": "未能解析出有效文章"}
+            await _set_task_error(task_id, "未能解析出有效文章")
             return
         total_n = len(articles)
+        done = state.results.get("listen", {}) if state else {}
+        _account_task_load(task_id, articles, 1, len(done))
         async with _status_lock:
             if task_id in _processing_status:
                 _processing_status[task_id]["total"] = total_n
+                _processing_status[task_id]["current"] = len(done)
         base_name = re.sub(r"\.epub$", "", file_name or "", flags=re.I).strip() or "result"
+        _partial_renders[task_id] = {"base_name": base_name, "total": total_n, "listen": {}, "read": {}}
 
-        tasks = [
-            _process_single_article(art, idx, total_n, api_key, task_id)
-            for idx, art in enumerate(articles, start=1)
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=False)
+        results = await _gather_articles("listen", articles, api_key, task_id, done)
+        await _record_failures(task_id, "listen", results)
         successful = [(idx, a) for idx, a, err in results if err is None]
         if not successful:
             failed = [(idx, e) for idx, a, e in results if e is not None]
             failed_detail = "; ".join(f"第{i}篇: {e}" for i, e in failed[:5])
             if len(failed) > 5:
                 failed_detail += f" ... 共{len(failed)}篇失败"
-            _processing_status[task_id] = {"status": "error", "error": f"听我：{failed_detail}"}
+            await _set_task_error(task_id, f"听我：{failed_detail}")
             return
         filtered = [
             (idx, a)
@@ -270,70 +1180,71 @@ async def process_listen_task_background(
         analyses = [a for _, a in filtered]
         arts_listen = [articles[i - 1] for i, _ in filtered]
         pure_headings = get_pure_headings(arts_listen, analyses, None)
+        # 标题译名记入任务日志（kind="title"），从日志重建文档时与这里一致；续跑时已有的译名不再调用
+        known_titles = state.results.get("title", {}) if state else {}
         titles_final: List[str] = []
         for i, h in enumerate(pure_headings):
+            index = filtered[i][0]
             if h == "未命名文章" or not _is_title_mostly_english(h):
                 titles_final.append(h)
+            elif index in known_titles:
+                titles_final.append(known_titles[index])
             else:
+                started = time.perf_counter()
+                usage = TokenUsage()
                 try:
-                    loop = asyncio.get_event_loop()
-                    translated = await loop.run_in_executor(
-                        _executor,
-                        lambda _h=h, _key=api_key: translate_title_to_chinese(_h, _key),
+                    translated = await _run_deepseek(
+                        lambda c, _h=h, _key=api_key, _u=usage: translate_title_to_chinese(_h, _key, usage=_u, cancel=c),
                     )
+                    DEEPSEEK_CALL_SECONDS.observe(time.perf_counter() - started, kind="title", outcome="ok")
+                    await _record_usage(task_id, "title", index, usage, time.perf_counter() - started)
                     titles_final.append((translated or h).strip() or h)
                 except Exception:
+                    DEEPSEEK_CALL_SECONDS.observe(time.perf_counter() - started, kind="title", outcome="error")
                     titles_final.append(h)
-        async with _status_lock:
-            if task_id in _processing_status:
-                _processing_status[task_id]["status"] = "building_docx"
-        listen_docx = build_docx_from_analyses(analyses, arts_listen, titles_override=titles_final)
-        listen_docx.seek(0)
-        _results_store[task_id] = {
-            "listen_docx": listen_docx.getvalue(),
-            "base_name": base_name,
-        }
-        async with _status_lock:
-            if task_id in _processing_status:
-                _processing_status[task_id]["status"] = "completed"
+                    continue
+                if titles_final[-1] != h:
+                    await _checkpoint(task_id, "title", index, titles_final[-1])
+        _store_results(task_id, base_name, listen=render_analyses(analyses, arts_listen, titles_final))
+        await _set_task_completed(task_id)
+    except _TaskInterrupted:
+        _trace("LISTEN_ME_BG_INTERRUPTED", task_id)
     except Exception as e:
-        _trace(f"LISTEN_ME_BG: {type(e).__name__}: {e}")
-        _processing_status[task_id] = {"status": "error", "error": str(e)}
+        _trace("LISTEN_ME_BG_ERR", task_id, error=f"{type(e).__name__}: {e}")
+        await _set_task_error(task_id, str(e))
     finally:
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+        _finish_background_task(task_id, tmp_path)
 
 
 async def process_read_task_background(
-    task_id: str, tmp_path: str, api_key: str, file_name: str
+    task_id: str, tmp_path: str, api_key: str, file_name: str, state: JournalState | None = None
 ) -> None:
-    """Background task: process read-me (翻译稿)."""
+    """Background task: process read-me (翻译稿)。state 非空时为重启后续跑。"""
+    _active_tasks[task_id] = asyncio.current_task()
     try:
-        articles = extract_articles_from_epub(tmp_path)
+        articles = await _load_task_articles(task_id, tmp_path, state)
         if not articles:
-            _processing_status[task_id] = {"status": "error", "error": "未能解析出有效文章"}
+            await _set_task_error(task_id, "未能解析出有效文章")
             return
         total_n = len(articles)
+        done = state.results.get("read", {}) if state else {}
+        _account_task_load(task_id, articles, 1, len(done))
         async with _status_lock:
             if task_id in _processing_status:
                 _processing_status[task_id]["total"] = total_n
+                _processing_status[task_id]["current"] = len(done)
         base_name = re.sub(r"\.epub$", "", file_name or "", flags=re.I).strip() or "result"
+        _partial_renders[task_id] = {"base_name": base_name, "total": total_n, "listen": {}, "read": {}}
 
-        tasks = [
-            _process_single_translation(art, idx, total_n, api_key, task_id)
-            for idx, art in enumerate(articles, start=1)
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=False)
+        results = await _gather_articles("read", articles, api_key, task_id, done)
+        await _record_failures(task_id, "read", results)
         successful = [(idx, t) for idx, t, err in results if err is None]
         if not successful:
             failed = [(idx, e) for idx, t, e in results if e is not None]
             failed_detail = "; ".join(f"第{i}篇: {e}" for i, e in failed[:5])
             if len(failed) > 5:
                 failed_detail += f" ... 共{len(failed)}篇失败"
-            _processing_status[task_id] = {"status": "error", "error": f"看我：{failed_detail}"}
+            await _set_task_error(task_id, f"看我：{failed_detail}")
             return
         filtered = [
             (idx, t)
@@ -342,50 +1253,42 @@ async def process_read_task_background(
         ]
         translations = [t for _, t in filtered]
         arts_read = [articles[idx - 1] for idx, _ in filtered]
-        async with _status_lock:
-            if task_id in _processing_status:
-                _processing_status[task_id]["status"] = "building_docx"
-        read_docx = build_docx_from_translations(translations, arts_read)
-        read_docx.seek(0)
-        _results_store[task_id] = {
-            "read_docx": read_docx.getvalue(),
-            "base_name": base_name,
-        }
-        async with _status_lock:
-            if task_id in _processing_status:
-                _processing_status[task_id]["status"] = "completed"
+        _store_results(task_id, base_name, read=render_translations(translations, arts_read))
+        await _set_task_completed(task_id)
+    except _TaskInterrupted:
+        _trace("READ_ME_BG_INTERRUPTED", task_id)
     except Exception as e:
-        _trace(f"READ_ME_BG: {type(e).__name__}: {e}")
-        _processing_status[task_id] = {"status": "error", "error": str(e)}
+        _trace("READ_ME_BG_ERR", task_id, error=f"{type(e).__name__}: {e}")
+        await _set_task_error(task_id, str(e))
     finally:
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+        _finish_background_task(task_id, tmp_path)
 
 
 async def process_point_task_background(
-    task_id: str, tmp_path: str, api_key: str, file_name: str
+    task_id: str, tmp_path: str, api_key: str, file_name: str, state: JournalState | None = None
 ) -> None:
-    """Background task: process point-me (听我 + 读我)."""
+    """Background task: process point-me (听我 + 读我)。state 非空时为重启后续跑。"""
+    _active_tasks[task_id] = asyncio.current_task()
     try:
-        articles = extract_articles_from_epub(tmp_path)
+        articles = await _load_task_articles(task_id, tmp_path, state)
         if not articles:
-            _processing_status[task_id] = {"status": "error", "error": "未能解析出有效文章"}
+            await _set_task_error(task_id, "未能解析出有效文章")
             return
         total_n = len(articles)
         base_name = re.sub(r"\.epub$", "", file_name or "", flags=re.I).strip() or "result"
+        _partial_renders[task_id] = {"base_name": base_name, "total": total_n, "listen": {}, "read": {}}
+        listen_done = state.results.get("listen", {}) if state else {}
+        read_done = state.results.get("read", {}) if state else {}
+        _account_task_load(task_id, articles, 2, len(listen_done) + len(read_done))
         async with _status_lock:
             if task_id in _processing_status:
                 _processing_status[task_id]["total"] = 2 * total_n
+                _processing_status[task_id]["current"] = len(listen_done) + len(read_done)
 
-        async def flow_listen() -> tuple[list[str], list, list[tuple[int, str]]]:
-            tasks = [
-                _process_single_article(art, idx, total_n, api_key, task_id)
-                for idx, art in enumerate(articles, start=1)
-            ]
-            results = await asyncio.gather(*tasks, return_exceptions=False)
+        async def flow_listen(results: list | None = None) -> tuple[list[str], list, list[tuple[int, str]]]:
+            if results is None:
+                results = await _gather_articles("listen", articles, api_key, task_id, listen_done)
+            await _record_failures(task_id, "listen", results)
             successful = [(idx, a) for idx, a, err in results if err is None]
             if not successful:
                 raise ValueError("听我：所有文章口播稿生成失败")
@@ -400,12 +1303,10 @@ async def process_point_task_background(
             arts = [articles[i - 1] for i, _ in filtered]
             return (analyses, arts, filtered)
 
-        async def flow_read() -> tuple[list[str], list, list[tuple[int, str]]]:
-            tasks = [
-                _process_single_translation(art, idx, total_n, api_key, task_id)
-                for idx, art in enumerate(articles, start=1)
-            ]
-            results = await asyncio.gather(*tasks, return_exceptions=False)
+        async def flow_read(results: list | None = None) -> tuple[list[str], list, list[tuple[int, str]]]:
+            if results is None:
+                results = await _gather_articles("read", articles, api_key, task_id, read_done)
+            await _record_failures(task_id, "read", results)
             successful = [(idx, t) for idx, t, err in results if err is None]
             if not successful:
                 raise ValueError("看我：所有文章翻译失败")
@@ -418,56 +1319,158 @@ async def process_point_task_background(
             arts = [articles[i - 1] for i, _ in filtered]
             return (translations, arts, filtered)
 
-        (analyses, arts_listen, listen_filtered), (translations, arts_read, read_filtered) = (
-            await asyncio.gather(flow_listen(), flow_read())
-        )
+        if POINT_ME_DUAL_OUTPUT == "off":
+            # 两路都跑完再处理异常，避免一路失败时另一路的 checkpoint 被中途丢弃
+            outcomes = await asyncio.gather(flow_listen(), flow_read(), return_exceptions=True)
+        else:
+            listen_results, read_results = await _gather_dual_articles(
+                articles, api_key, task_id, listen_done, read_done
+            )
+            outcomes = await asyncio.gather(
+                flow_listen(listen_results), flow_read(read_results), return_exceptions=True
+            )
+        for out in outcomes:
+            if isinstance(out, _TaskInterrupted):
+                raise out
+        for out in outcomes:
+            if isinstance(out, BaseException):
+                raise out
+        (analyses, arts_listen, listen_filtered), (translations, arts_read, read_filtered) = outcomes
         read_title_map = {idx: _parse_translation(t)[0] for idx, t in read_filtered}
         titles_for_listen = [read_title_map.get(idx, "") for idx, _ in listen_filtered]
-        async with _status_lock:
-            if task_id in _processing_status:
-                _processing_status[task_id]["status"] = "building_docx"
-        listen_docx = build_docx_from_analyses(
-            analyses, arts_listen, titles_override=titles_for_listen
+        _store_results(
+            task_id,
+            base_name,
+            listen=render_analyses(analyses, arts_listen, titles_for_listen),
+            read=render_translations(translations, arts_read),
         )
-        read_docx = build_docx_from_translations(translations, arts_read)
-        listen_docx.seek(0)
-        read_docx.seek(0)
-        _results_store[task_id] = {
-            "read_docx": read_docx.getvalue(),
-            "listen_docx": listen_docx.getvalue(),
-            "base_name": base_name,
-        }
-        async with _status_lock:
-            if task_id in _processing_status:
-                _processing_status[task_id]["status"] = "completed"
+        await _set_task_completed(task_id)
+    except _TaskInterrupted:
+        _trace("POINT_ME_BG_INTERRUPTED", task_id)
     except Exception as e:
-        _trace(f"POINT_ME_BG: {type(e).__name__}: {e}")
-        _processing_status[task_id] = {"status": "error", "error": str(e)}
+        _trace("POINT_ME_BG_ERR", task_id, error=f"{type(e).__name__}: {e}")
+        await _set_task_error(task_id, str(e))
     finally:
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+        _finish_background_task(task_id, tmp_path)
+
+
+# 同步接口（连接保持到结果返回）写入任务日志时使用的 mode
+# （stream 为 NDJSON 流式接口同时生成两种结果的任务）
+_SYNC_MODES = ("analyze", "translate", "stream")
+# 各 mode 需要生成的结果种类（listen=口播稿，read=翻译稿）
+_MODE_KINDS = {
+    "point": ("listen", "read"),
+    "listen": ("listen",),
+    "read": ("read",),
+    "analyze": ("listen",),
+    "translate": ("read",),
+    "stream": ("listen", "read"),
+}
+# NDJSON 流式接口的 mode → 任务日志中的 mode
+_STREAM_JOURNAL_MODES = {"listen": "analyze", "read": "translate", "point": "stream"}
+
+
+def _task_runner(mode: str):
+    """任务日志中的 mode → 后台处理函数；同步接口的任务重试时按听我/读我生成文档。"""
+    return {
+        "point": process_point_task_background,
+        "listen": process_listen_task_background,
+        "read": process_read_task_background,
+        "analyze": process_listen_task_background,
+        "translate": process_read_task_background,
+        "stream": process_point_task_background,
+    }.get(mode)
+
+
+def _current_status(task_id: str) -> dict:
+    """内存中的任务状态（排队中的任务刷新排队位置与 ETA），没有则从任务日志推出。"""
+    status = _processing_status.get(task_id)
+    if status is None:
+        return _status_from_journal(task_id)
+    if status.get("status") == "queued":
+        pos = _admission.position(task_id)
+        if pos is not None:
+            status["queue_position"], status["eta_seconds"] = pos
+    return status
 
 
 @app.get("/api/analyze-status/{task_id}")
 def get_analyze_status(task_id: str) -> JSONResponse:
     """查询处理状态"""
-    status = _processing_status.get(task_id, {"status": "not_found"})
-    return JSONResponse(status)
+    return JSONResponse(_current_status(task_id))
+
+
+@app.get("/api/tasks/{task_id}/trace")
+def task_trace(task_id: str) -> JSONResponse:
+    """任务最近的追踪事件（本 worker 内存中的环形缓冲；完整记录见 last_error.txt）。"""
+    return JSONResponse({"task_id": task_id, "events": tracer.task_events(task_id), "tracer": tracer.stats()})
+
+
+@app.get("/api/scheduler")
+def scheduler_status() -> JSONResponse:
+    """公平队列当前状态：容量（自适应并发上限）、占用、各任务运行/排队篇数，上传准入的负载与等待队列，以及各 API Key 的健康与用量。"""
+    cassette = get_cassette()
+    return JSONResponse({
+        **_scheduler.snapshot(),
+        "admission": _admission.snapshot(),
+        "host": _host_limiter.snapshot(),
+        "concurrency": _concurrency.snapshot() if _concurrency else None,
+        "api_keys": get_key_pool().snapshot(),
+        "cassette": {"mode": DEEPSEEK_CASSETTE_MODE, **cassette.stats()} if cassette else None,
+        "hedging": {
+            "latency": get_latency_tracker().snapshot(),
+            "tasks": {tid: {"used": b.used, "limit": b.limit} for tid, b in _task_hedges.items()},
+        } if DEEPSEEK_HEDGE_ENABLED else None,
+    })
+
+
+@app.get("/api/usage")
+def usage_report(day: str | None = None, task_id: str | None = None) -> JSONResponse:
+    """DeepSeek token 用量：按 日期 × 模式 × 种类 汇总（可按 day=YYYY-MM-DD 或 task_id 过滤），含缓存命中率与输出 token/秒。
+    stable_prefix_chars 为各类请求在文章之间逐字节相同的 prompt 前缀长度（前缀缓存可命中的上限）。"""
+    ledger = get_usage_ledger()
+    if ledger is None:
+        return JSONResponse({"enabled": False, "stable_prefix_chars": prompt_cache_layout()})
+    try:
+        return JSONResponse({
+            "enabled": True,
+            **ledger.summary(day=day, task_id=task_id),
+            "stable_prefix_chars": prompt_cache_layout(),
+        })
+    except (sqlite3.Error, OSError) as e:
+        return JSONResponse({"enabled": True, "error": str(e)})
+
+
+@app.get("/api/article-index/stats")
+def article_index_stats() -> JSONResponse:
+    """跨期文章指纹库：条目数与本进程的复用命中、估计节省的 token。"""
+    index = get_article_index()
+    if index is None:
+        return JSONResponse({"enabled": False})
+    try:
+        entries = index.stats()
+    except (sqlite3.Error, OSError) as e:
+        return JSONResponse({"enabled": True, "error": str(e)})
+    return JSONResponse({
+        "enabled": True,
+        "threshold": ARTICLE_REUSE_THRESHOLD,
+        "entries": entries,
+        **_reuse_totals,
+    })
 
 
 @app.post("/api/analyze-epub")
-async def analyze_epub(file: UploadFile = File(...)) -> StreamingResponse:
+async def analyze_epub(request: Request, file: UploadFile = File(...), format: str = "docx") -> StreamingResponse:
+    """上传 EPUB，生成口播稿文档并流式返回；format 为 docx（默认）、md、html 或 json。"""
     import uuid
+    fmt = _check_format(format)
     task_id = str(uuid.uuid4())
     _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0}
-    _trace("STEP0: request started", clear=True)
+    _trace("STEP0", task_id, endpoint="analyze-epub")
     if not file.filename.lower().endswith(".epub"):
         raise HTTPException(status_code=400, detail="仅支持 EPUB 文件。")
 
-    api_key = os.getenv("DEEPSEEK_API_KEY")
+    api_key = get_default_api_key()
     if not api_key:
         raise HTTPException(
             status_code=500,
@@ -475,25 +1478,31 @@ async def analyze_epub(file: UploadFile = File(...)) -> StreamingResponse:
         )
 
     try:
-        _trace("STEP1: reading file")
+        _trace("STEP1", task_id)
         with tempfile.NamedTemporaryFile(delete=False, suffix=".epub") as tmp:
             content = await file.read()
             tmp.write(content)
             tmp_path = tmp.name
-
-        _trace("STEP2: extracting articles")
-        articles = extract_articles_from_epub(tmp_path)
+        # 同步接口的连接一直挂着，不排队：容量不足直接 429
+        if not _admission.admit_if_fits(task_id, _admission.estimate_for_upload(len(content))):
+            await _set_task_error(task_id, _BUSY_DETAIL)
+            raise _busy_error()
+        await _start_task_journal(task_id, "analyze", file.filename or "", tmp_path)
+
+        _trace("STEP2", task_id)
+        articles = await _load_task_articles(task_id, tmp_path, None)
         if not articles:
+            await _set_task_error(task_id, "未能从 EPUB 中解析出有效文章。")
             raise HTTPException(status_code=400, detail="未能从 EPUB 中解析出有效文章。")
 
         total = len(articles)
         _processing_status[task_id]["total"] = total
+        _account_task_load(task_id, articles, 1, 0)
 
-        tasks = [
-            _process_single_article(article, idx, total, api_key, task_id)
-            for idx, article in enumerate(articles, start=1)
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=False)
+        results = await _cancel_on_disconnect(
+            request, task_id, _gather_articles("listen", articles, api_key, task_id, priority=True)
+        )
+        await _record_failures(task_id, "listen", results)
 
         successful = [(idx, analysis) for idx, analysis, err in results if err is None]
         failed = [(idx, err) for idx, analysis, err in results if err is not None]
@@ -502,7 +1511,7 @@ async def analyze_epub(file: UploadFile = File(...)) -> StreamingResponse:
             failed_detail = "; ".join(f"第{i}篇: {e}" for i, e in failed[:5])
             if len(failed) > 5:
                 failed_detail += f" ... 共{len(failed)}篇失败"
-            _processing_status[task_id] = {"status": "error", "error": failed_detail}
+            await _set_task_error(task_id, failed_detail)
             raise HTTPException(status_code=502, detail=f"所有文章分析失败: {failed_detail}")
 
         sorted_successful = sorted(successful, key=lambda x: x[0])
@@ -516,33 +1525,27 @@ async def analyze_epub(file: UploadFile = File(...)) -> StreamingResponse:
         analyses = [analysis for _, analysis in filtered]
         articles_for_doc = [articles[idx - 1] for idx, _ in filtered]
 
-        if failed:
-            _processing_status[task_id]["failed_count"] = len(failed)
-            _processing_status[task_id]["failed_indices"] = [i for i, _ in failed]
-
-        _trace("STEP4: building docx")
+        _trace("STEP4", task_id)
         _processing_status[task_id]["status"] = "building_docx"
-        doc_stream: BytesIO = build_docx_from_analyses(analyses, articles_for_doc)
-        _processing_status[task_id]["status"] = "completed"
         base_name = re.sub(r"\.epub$", "", file.filename or "", flags=re.I).strip() or "analysis_result"
-        docx_name = f"{base_name}.docx"
-        fallback = docx_name if docx_name.isascii() else "analysis_result.docx"
-        headers = {"Content-Disposition": _content_disposition_utf8(docx_name, fallback)}
-        return StreamingResponse(
-            doc_stream,
-            media_type=(
-                "application/vnd.openxmlformats-officedocument.wordprocessingml."
-                "document"
-            ),
-            headers=headers,
-        )
+        compress = _wants_gzip(request, fmt)
+        doc_stream = _build_document("listen", render_analyses(analyses, articles_for_doc), fmt, base_name, compress=compress)
+        await _set_task_completed(task_id)
+        fallback = base_name if base_name.isascii() else "analysis_result"
+        return _document_response(doc_stream, fmt, base_name, fallback, {"X-Task-Id": task_id}, compress)
     except HTTPException:
         raise
     except Exception as e:
-        _trace(f"STEP_UNHANDLED: {type(e).__name__}: {e}")
-        _processing_status[task_id] = {"status": "error", "error": str(e)}
+        _trace("STEP_UNHANDLED", task_id, error=f"{type(e).__name__}: {e}")
+        await _set_task_error(task_id, str(e))
         raise HTTPException(status_code=500, detail=f"服务器内部错误: {e}") from e
     finally:
+        _task_finished_at[task_id] = time.time()
+        _task_hedges.pop(task_id, None)
+        _close_result_streams(task_id)
+        _admission.release(task_id)
+        if task_id in _journaled_tasks:
+            release_task(task_id)
         try:
             if "tmp_path" in locals() and os.path.exists(tmp_path):
                 os.remove(tmp_path)
@@ -551,16 +1554,17 @@ async def analyze_epub(file: UploadFile = File(...)) -> StreamingResponse:
 
 
 @app.post("/api/translate-epub")
-async def translate_epub(file: UploadFile = File(...)) -> StreamingResponse:
-    """上传 EPUB，全文翻译后生成 Word 并流式返回。"""
+async def translate_epub(request: Request, file: UploadFile = File(...), format: str = "docx") -> StreamingResponse:
+    """上传 EPUB，全文翻译后生成 Word（或 format=md/html/json）并流式返回。"""
     import uuid
+    fmt = _check_format(format)
     task_id = str(uuid.uuid4())
     _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0}
-    _trace("TRANSLATE_STEP0: request started", clear=True)
+    _trace("TRANSLATE_STEP0", task_id, endpoint="translate-epub")
     if not file.filename.lower().endswith(".epub"):
         raise HTTPException(status_code=400, detail="仅支持 EPUB 文件。")
 
-    api_key = os.getenv("DEEPSEEK_API_KEY")
+    api_key = get_default_api_key()
     if not api_key:
         raise HTTPException(
             status_code=500,
@@ -568,25 +1572,31 @@ async def translate_epub(file: UploadFile = File(...)) -> StreamingResponse:
         )
 
     try:
-        _trace("TRANSLATE_STEP1: reading file")
+        _trace("TRANSLATE_STEP1", task_id)
         with tempfile.NamedTemporaryFile(delete=False, suffix=".epub") as tmp:
             content = await file.read()
             tmp.write(content)
             tmp_path = tmp.name
-
-        _trace("TRANSLATE_STEP2: extracting articles")
-        articles = extract_articles_from_epub(tmp_path)
+        # 同步接口的连接一直挂着，不排队：容量不足直接 429
+        if not _admission.admit_if_fits(task_id, _admission.estimate_for_upload(len(content))):
+            await _set_task_error(task_id, _BUSY_DETAIL)
+            raise _busy_error()
+        await _start_task_journal(task_id, "translate", file.filename or "", tmp_path)
+
+        _trace("TRANSLATE_STEP2", task_id)
+        articles = await _load_task_articles(task_id, tmp_path, None)
         if not articles:
+            await _set_task_error(task_id, "未能从 EPUB 中解析出有效文章。")
             raise HTTPException(status_code=400, detail="未能从 EPUB 中解析出有效文章。")
 
         total = len(articles)
         _processing_status[task_id]["total"] = total
+        _account_task_load(task_id, articles, 1, 0)
 
-        tasks = [
-            _process_single_translation(article, idx, total, api_key, task_id)
-            for idx, article in enumerate(articles, start=1)
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=False)
+        results = await _cancel_on_disconnect(
+            request, task_id, _gather_articles("read", articles, api_key, task_id, priority=True)
+        )
+        await _record_failures(task_id, "read", results)
 
         successful = [(idx, trans) for idx, trans, err in results if err is None]
         failed = [(idx, err) for idx, trans, err in results if err is not None]
@@ -595,7 +1605,7 @@ async def translate_epub(file: UploadFile = File(...)) -> StreamingResponse:
             failed_detail = "; ".join(f"第{i}篇: {e}" for i, e in failed[:5])
             if len(failed) > 5:
                 failed_detail += f" ... 共{len(failed)}篇失败"
-            _processing_status[task_id] = {"status": "error", "error": failed_detail}
+            await _set_task_error(task_id, failed_detail)
             raise HTTPException(status_code=502, detail=f"所有文章翻译失败: {failed_detail}")
 
         sorted_successful = sorted(successful, key=lambda x: x[0])
@@ -607,32 +1617,27 @@ async def translate_epub(file: UploadFile = File(...)) -> StreamingResponse:
         translations = [trans for _, trans in filtered]
         articles_for_doc = [articles[idx - 1] for idx, _ in filtered]
 
-        if failed:
-            _processing_status[task_id]["failed_count"] = len(failed)
-            _processing_status[task_id]["failed_indices"] = [i for i, _ in failed]
-
-        _trace("TRANSLATE_STEP4: building docx")
+        _trace("TRANSLATE_STEP4", task_id)
         _processing_status[task_id]["status"] = "building_docx"
-        doc_stream: BytesIO = build_docx_from_translations(translations, articles_for_doc)
-        _processing_status[task_id]["status"] = "completed"
         base_name = re.sub(r"\.epub$", "", file.filename or "", flags=re.I).strip() or "translation_result"
-        docx_name = f"{base_name}.docx"
-        fallback = docx_name if docx_name.isascii() else "translation_result.docx"
-        headers = {"Content-Disposition": _content_disposition_utf8(docx_name, fallback)}
-        return StreamingResponse(
-            doc_stream,
-            media_type=(
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            ),
-            headers=headers,
-        )
+        compress = _wants_gzip(request, fmt)
+        doc_stream = _build_document("read", render_translations(translations, articles_for_doc), fmt, base_name, compress=compress)
+        await _set_task_completed(task_id)
+        fallback = base_name if base_name.isascii() else "translation_result"
+        return _document_response(doc_stream, fmt, base_name, fallback, {"X-Task-Id": task_id}, compress)
     except HTTPException:
         raise
     except Exception as e:
-        _trace(f"TRANSLATE_UNHANDLED: {type(e).__name__}: {e}")
-        _processing_status[task_id] = {"status": "error", "error": str(e)}
+        _trace("TRANSLATE_UNHANDLED", task_id, error=f"{type(e).__name__}: {e}")
+        await _set_task_error(task_id, str(e))
         raise HTTPException(status_code=500, detail=f"服务器内部错误: {e}") from e
     finally:
+        _task_finished_at[task_id] = time.time()
+        _task_hedges.pop(task_id, None)
+        _close_result_streams(task_id)
+        _admission.release(task_id)
+        if task_id in _journaled_tasks:
+            release_task(task_id)
         try:
             if "tmp_path" in locals() and os.path.exists(tmp_path):
                 os.remove(tmp_path)
@@ -640,119 +1645,655 @@ async def translate_epub(file: UploadFile = File(...)) -> StreamingResponse:
             pass
 
 
+async def _admit_upload(
+    task_id: str, mode: str, file_name: str, content: bytes, api_key: str, extra_status: dict | None = None
+) -> tuple[str, str]:
+    """上传任务的准入：写临时文件，返回 (决定, 临时文件路径)。决定为 "admitted"（调用方立即启动）、
+    "queued"（容量空出后自动启动）或 "rejected"（已删除临时文件，调用方返回 429）。"""
+    runner = _task_runner(mode)
+    extra_status = extra_status or {}
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".epub") as tmp:
+        tmp.write(content)
+        tmp_path = tmp.name
+
+    def _start() -> None:
+        _queued_uploads.pop(task_id, None)
+        if _draining:
+            return  # 留在任务日志中，重启后续跑
+        _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0, **extra_status}
+        _trace("ADMIT_STARTED", task_id)
+        _spawn(_after(journal, runner(task_id, tmp_path, api_key, file_name)))
+
+    estimate = _admission.estimate_for_upload(len(content), kinds=len(_MODE_KINDS[mode]))
+    decision = _admission.try_admit(task_id, estimate, _start)
+    if decision == "rejected":
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return decision, ""
+    if decision == "queued":
+        _queued_uploads[task_id] = tmp_path
+        pos, eta = _admission.position(task_id) or (1, 0)
+        _processing_status[task_id] = {
+            "status": "queued", "current": 0, "total": 0,
+            "queue_position": pos, "eta_seconds": eta, **extra_status,
+        }
+    else:
+        _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0, **extra_status}
+    # 排队的任务可能在建立日志期间就被 _start 启动：runner 等日志建好后再开始
+    journal = asyncio.ensure_future(_start_task_journal(task_id, mode, file_name, tmp_path))
+    await journal
+    return decision, tmp_path
+
+
+def _upload_response(task_id: str) -> JSONResponse:
+    status = _current_status(task_id)
+    body = {"task_id": task_id, "status": status["status"]}
+    if status["status"] == "queued":
+        body["queue_position"] = status.get("queue_position")
+        body["eta_seconds"] = status.get("eta_seconds")
+    return JSONResponse(body)
+
+
+def _busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=429, detail=_BUSY_DETAIL, headers={"Retry-After": str(_admission.retry_after())}
+    )
+
+
 @app.post("/api/point-me")
-async def point_me(
-    background_tasks: BackgroundTasks, file: UploadFile = File(...)
-) -> JSONResponse:
+async def point_me(file: UploadFile = File(...)) -> JSONResponse:
     """点我：同时跑「看我」（书面翻译）与「听我」（口播稿），结果按 task_id 存，供读我/听我下载。"""
     import uuid
 
     task_id = str(uuid.uuid4())
     if not file.filename or not file.filename.lower().endswith(".epub"):
         raise HTTPException(status_code=400, detail="仅支持 EPUB 文件。")
-    api_key = os.getenv("DEEPSEEK_API_KEY")
+    api_key = get_default_api_key()
     if not api_key:
         raise HTTPException(
             status_code=500,
             detail="后端未配置 DEEPSEEK_API_KEY 环境变量，请在服务器上设置后重试。",
         )
+    if _draining:
+        raise HTTPException(status_code=503, detail="服务正在重启，请稍后重试。")
     content = await file.read()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".epub") as tmp:
-        tmp.write(content)
-        tmp_path = tmp.name
-    _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0}
-    background_tasks.add_task(
-        process_point_task_background, task_id, tmp_path, api_key, file.filename or ""
-    )
-    return JSONResponse({"task_id": task_id, "status": "processing"})
+    decision, tmp_path = await _admit_upload(task_id, "point", file.filename or "", content, api_key)
+    if decision == "rejected":
+        raise _busy_error()
+    if decision == "admitted":
+        # 独立任务（而非 BackgroundTasks）：DELETE 取消它时不会连带中断这次请求所在的连接
+        _spawn(process_point_task_background(task_id, tmp_path, api_key, file.filename or ""))
+    return _upload_response(task_id)
 
 
 @app.post("/api/listen-me")
-async def listen_me(
-    background_tasks: BackgroundTasks, file: UploadFile = File(...)
-) -> JSONResponse:
+async def listen_me(file: UploadFile = File(...)) -> JSONResponse:
     """听我：仅生成口播稿，结果供 /api/download/listen/{task_id} 下载。"""
     import uuid
 
     task_id = str(uuid.uuid4())
     if not file.filename or not file.filename.lower().endswith(".epub"):
         raise HTTPException(status_code=400, detail="仅支持 EPUB 文件。")
-    api_key = os.getenv("DEEPSEEK_API_KEY")
+    api_key = get_default_api_key()
     if not api_key:
         raise HTTPException(
             status_code=500,
             detail="后端未配置 DEEPSEEK_API_KEY 环境变量，请在服务器上设置后重试。",
         )
+    if _draining:
+        raise HTTPException(status_code=503, detail="服务正在重启，请稍后重试。")
     content = await file.read()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".epub") as tmp:
-        tmp.write(content)
-        tmp_path = tmp.name
-    _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0}
-    background_tasks.add_task(
-        process_listen_task_background, task_id, tmp_path, api_key, file.filename or ""
-    )
-    return JSONResponse({"task_id": task_id, "status": "processing"})
+    decision, tmp_path = await _admit_upload(task_id, "listen", file.filename or "", content, api_key)
+    if decision == "rejected":
+        raise _busy_error()
+    if decision == "admitted":
+        # 独立任务（而非 BackgroundTasks）：DELETE 取消它时不会连带中断这次请求所在的连接
+        _spawn(process_listen_task_background(task_id, tmp_path, api_key, file.filename or ""))
+    return _upload_response(task_id)
 
 
 @app.post("/api/read-me")
-async def read_me(
-    background_tasks: BackgroundTasks, file: UploadFile = File(...)
-) -> JSONResponse:
+async def read_me(file: UploadFile = File(...)) -> JSONResponse:
     """读我：仅生成翻译稿，结果供 /api/download/read/{task_id} 下载。"""
     import uuid
 
     task_id = str(uuid.uuid4())
     if not file.filename or not file.filename.lower().endswith(".epub"):
         raise HTTPException(status_code=400, detail="仅支持 EPUB 文件。")
-    api_key = os.getenv("DEEPSEEK_API_KEY")
+    api_key = get_default_api_key()
+    if not api_key:
+        raise HTTPException(
+            status_code=500,
+            detail="后端未配置 DEEPSEEK_API_KEY 环境变量，请在服务器上设置后重试。",
+        )
+    if _draining:
+        raise HTTPException(status_code=503, detail="服务正在重启，请稍后重试。")
+    content = await file.read()
+    decision, tmp_path = await _admit_upload(task_id, "read", file.filename or "", content, api_key)
+    if decision == "rejected":
+        raise _busy_error()
+    if decision == "admitted":
+        # 独立任务（而非 BackgroundTasks）：DELETE 取消它时不会连带中断这次请求所在的连接
+        _spawn(process_read_task_background(task_id, tmp_path, api_key, file.filename or ""))
+    return _upload_response(task_id)
+
+
+@app.post("/api/tasks/{task_id}/retry")
+async def retry_task(task_id: str) -> JSONResponse:
+    """只重跑任务中失败（或尚无结果）的文章，复用任务日志中已成功的结果并重新生成文档。
+    与新上传一样经过准入控制：容量不足时排队（status=queued），排队已满返回 429。"""
+    api_key = get_default_api_key()
+    if not api_key:
+        raise HTTPException(
+            status_code=500,
+            detail="后端未配置 DEEPSEEK_API_KEY 环境变量，请在服务器上设置后重试。",
+        )
+    if _draining:
+        raise HTTPException(status_code=503, detail="服务正在重启，请稍后重试。")
+    if task_id in _active_tasks or _processing_status.get(task_id, {}).get("status") == "queued":
+        raise HTTPException(status_code=409, detail="任务仍在处理中，请等待完成后再重试。")
+    state = load_task_journal(task_id)
+    runner = _task_runner(state.mode) if state is not None else None
+    if state is None or runner is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+
+    tmp_path = ""
+    pending: dict[str, list[int]] = {}
+    if state.articles is None:
+        tmp_path = journal_epub_path(task_id)
+        if not os.path.exists(tmp_path):
+            raise HTTPException(status_code=409, detail="任务缺少原始 EPUB，无法重试，请重新上传。")
+    else:
+        for kind in _MODE_KINDS[state.mode]:
+            have = state.results.get(kind, {})
+            missing = [i for i in range(1, len(state.articles) + 1) if i not in have]
+            if missing:
+                pending[kind] = missing
+    if state.status == "completed" and not pending and task_id in _results_store:
+        return JSONResponse({"task_id": task_id, "status": "completed", "retry_articles": {}})
+
+    if not claim_task(task_id):
+        raise HTTPException(status_code=409, detail="任务正在其他进程中处理，请稍后再试。")
+
+    try:
+        await asyncio.to_thread(record_status, task_id, "processing")
+    except OSError as e:
+        release_task(task_id)
+        raise HTTPException(status_code=500, detail=f"无法写入任务日志: {e}") from e
+
+    def _start() -> None:
+        _queued_uploads.pop(task_id, None)
+        if _draining:
+            return  # 留在任务日志中，重启后续跑
+        _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0}
+        _trace("ADMIT_STARTED", task_id)
+        _spawn(runner(task_id, tmp_path, api_key, state.file_name, state))
+
+    # 与新上传相同的准入：容量不足时排队，排队满时 429（重启后的续跑不经过这里）
+    kinds = len(_MODE_KINDS[state.mode])
+    if state.articles is None:
+        estimate = _admission.estimate_for_upload(os.path.getsize(tmp_path), kinds=kinds)
+    else:
+        estimate = _task_load(state.articles, kinds, len(state.articles) * kinds - sum(map(len, pending.values())))
+    decision = _admission.try_admit(task_id, estimate, _start)
+    if decision == "rejected":
+        try:
+            await asyncio.to_thread(record_status, task_id, state.status, state.error)
+        except OSError:
+            pass
+        release_task(task_id)
+        raise _busy_error()
+    _journaled_tasks.add(task_id)
+    _task_modes[task_id] = state.mode
+    _trace("RETRY", task_id, mode=state.mode, pending={k: len(v) for k, v in pending.items()}, admission=decision)
+    body = {"task_id": task_id, "status": "processing", "retry_articles": pending}
+    if decision == "queued":
+        # 排队的重试没有上传的临时文件（EPUB 在任务日志中）：取消时无需删除
+        _queued_uploads[task_id] = ""
+        pos, eta = _admission.position(task_id) or (1, 0)
+        _processing_status[task_id] = {
+            "status": "queued", "current": 0, "total": 0, "queue_position": pos, "eta_seconds": eta,
+        }
+        body.update(status="queued", queue_position=pos, eta_seconds=eta)
+    else:
+        _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0}
+        _spawn(runner(task_id, tmp_path, api_key, state.file_name, state))
+    return JSONResponse(body)
+
+
+@app.delete("/api/tasks/{task_id}")
+async def cancel_task(task_id: str) -> JSONResponse:
+    """取消任务（准入排队、处理中或同步接口的任务均可）。任务由其他 worker 处理时写入取消请求，
+    由该 worker 在 CANCEL_POLL_SECONDS 内取消，返回 202。已取消的任务可通过 /retry 继续。"""
+    if await _cancel_task(task_id, "delete"):
+        return JSONResponse({"task_id": task_id, "status": "cancelled"})
+    status = _current_status(task_id)
+    if status["status"] == "not_found":
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    if status["status"] in ("completed", "error", "cancelled"):
+        raise HTTPException(status_code=409, detail="任务已结束，无需取消")
+    try:
+        request_cancel(task_id)
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"无法写入取消请求: {e}") from e
+    return JSONResponse({"task_id": task_id, "status": "cancelling"}, status_code=202)
+
+
+def _ndjson(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _end_record(task_id: str, articles: int) -> dict:
+    status = _current_status(task_id)
+    record = {"type": "end", "task_id": task_id, "status": status["status"], "articles": articles}
+    if status.get("error"):
+        record["error"] = status["error"]
+    return record
+
+
+def _journal_records(task_id: str, kind: str | None, emitted: set) -> tuple[list[dict], bool]:
+    """任务日志中尚未输出的结果（按种类、序号），以及任务是否已结束（或日志不存在）。在线程中调用。"""
+    state = load_task_journal(task_id)
+    if state is None:
+        return [], True
+    records = []
+    arts = state.articles or []
+    for k in _MODE_KINDS.get(state.mode, ()):
+        if kind is not None and k != kind:
+            continue
+        outcomes = [(i, t, None) for i, t in state.results.get(k, {}).items()]
+        outcomes += [(i, None, e) for i, e in state.errors.get(k, {}).items()]
+        for i, text, error in sorted(outcomes, key=lambda o: o[0]):
+            if (k, i) in emitted or not 0 < i <= len(arts):
+                continue
+            emitted.add((k, i))
+            records.append(_article_record(k, i, len(arts), arts[i - 1], text, error=error))
+    return records, state.finished
+
+
+async def _follow_task_results(task_id: str, kind: str | None, queue: asyncio.Queue | None):
+    """先输出任务日志中已有的结果，再输出 queue 中新完成的结果直到任务结束；
+    queue 为 None（任务在其他 worker）时按 CANCEL_POLL_SECONDS 轮询任务日志。"""
+    emitted: set = set()
+    try:
+        while True:
+            records, finished = await asyncio.to_thread(_journal_records, task_id, kind, emitted)
+            for record in records:
+                yield _ndjson(record)
+            if queue is not None or finished:
+                break
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+        while queue is not None:
+            record = await queue.get()
+            if record is None:
+                break
+            key = (record["kind"], record["index"])
+            if (kind is None or record["kind"] == kind) and key not in emitted:
+                emitted.add(key)
+                yield _ndjson(record)
+        yield _ndjson(_end_record(task_id, len(emitted)))
+    finally:
+        if queue is not None and queue in _result_streams.get(task_id, ()):
+            _result_streams[task_id].remove(queue)
+
+
+@app.get("/api/tasks/{task_id}/results")
+async def stream_task_results(task_id: str, kind: str | None = None) -> StreamingResponse:
+    """任务逐篇结果的 NDJSON 流（每行一条 JSON，见 _article_record），最后一行 type=end。
+    先输出已完成的文章，再随处理进度输出；kind=listen/read 只输出一种。可用于重新接入 /api/stream-epub。"""
+    if kind not in (None, "listen", "read"):
+        raise HTTPException(status_code=400, detail="kind 只能是 listen 或 read")
+    queue = None
+    if task_id in _active_tasks or task_id in _queued_uploads:
+        # 先订阅再读任务日志：两者之间完成的文章按 (种类, 序号) 去重
+        queue = asyncio.Queue()
+        _result_streams.setdefault(task_id, []).append(queue)
+    elif _current_status(task_id)["status"] == "not_found":
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return StreamingResponse(_follow_task_results(task_id, kind, queue), media_type="application/x-ndjson")
+
+
+async def _run_stream_task(task_id: str, kinds: tuple, articles: list, api_key: str, tmp_path: str) -> None:
+    """流式接口的文章处理：结果经 _publish_result 推给订阅者，不生成文档。"""
+    try:
+        if POINT_ME_DUAL_OUTPUT != "off" and kinds == ("listen", "read"):
+            outcomes = await _gather_dual_articles(articles, api_key, task_id, {}, {}, priority=True)
+        else:
+            outcomes = await asyncio.gather(
+                *(_gather_articles(k, articles, api_key, task_id, priority=True) for k in kinds)
+            )
+        for k, results in zip(kinds, outcomes):
+            await _record_failures(task_id, k, results)
+        if any(err is None for results in outcomes for _, _, err in results):
+            await _set_task_completed(task_id)
+        else:
+            await _set_task_error(task_id, "所有文章处理失败")
+    except _TaskInterrupted:
+        _trace("STREAM_INTERRUPTED", task_id)
+    except Exception as e:
+        _trace("STREAM_ERR", task_id, error=f"{type(e).__name__}: {e}")
+        await _set_task_error(task_id, str(e))
+    finally:
+        _finish_background_task(task_id, tmp_path)
+
+
+async def _stream_new_task(task_id: str, mode: str, kinds: tuple, total: int, work: asyncio.Task, queue: asyncio.Queue):
+    emitted = 0
+    try:
+        yield _ndjson({"type": "task", "task_id": task_id, "mode": mode, "kinds": list(kinds), "total": total})
+        while True:
+            record = await queue.get()
+            if record is None:
+                break
+            emitted += 1
+            yield _ndjson(record)
+        yield _ndjson(_end_record(task_id, emitted))
+    finally:
+        if not work.done():
+            # 客户端断开：在独立任务中取消（本生成器所在的作用域已被取消，不能再 await）
+            _spawn(_cancel_task(task_id, "client_disconnected"))
+
+
+@app.post("/api/stream-epub")
+async def stream_epub(file: UploadFile = File(...), mode: str = "listen") -> StreamingResponse:
+    """上传 EPUB，逐篇以 NDJSON 流式返回结果，不生成 Word（mode=listen 口播稿 / read 翻译稿 / point 两者）。
+    首行 type=task 给出 task_id（可 DELETE 取消），之后每完成一篇一行 type=article，最后一行 type=end。
+    客户端断开时取消剩余文章。"""
+    import uuid
+
+    if mode not in _STREAM_JOURNAL_MODES:
+        raise HTTPException(status_code=400, detail="mode 只能是 listen、read 或 point")
+    if not file.filename or not file.filename.lower().endswith(".epub"):
+        raise HTTPException(status_code=400, detail="仅支持 EPUB 文件。")
+    api_key = get_default_api_key()
     if not api_key:
         raise HTTPException(
             status_code=500,
             detail="后端未配置 DEEPSEEK_API_KEY 环境变量，请在服务器上设置后重试。",
         )
+    if _draining:
+        raise HTTPException(status_code=503, detail="服务正在重启，请稍后重试。")
+    task_id = str(uuid.uuid4())
+    journal_mode = _STREAM_JOURNAL_MODES[mode]
+    kinds = _MODE_KINDS[journal_mode]
+    _trace("STREAM_STEP0", task_id, endpoint="stream-epub", mode=mode)
     content = await file.read()
     with tempfile.NamedTemporaryFile(delete=False, suffix=".epub") as tmp:
         tmp.write(content)
         tmp_path = tmp.name
+    # 与同步接口相同：连接一直挂着，不排队，容量不足直接 429
+    if not _admission.admit_if_fits(task_id, _admission.estimate_for_upload(len(content), kinds=len(kinds))):
+        os.remove(tmp_path)
+        raise _busy_error()
     _processing_status[task_id] = {"status": "processing", "current": 0, "total": 0}
-    background_tasks.add_task(
-        process_read_task_background, task_id, tmp_path, api_key, file.filename or ""
+    await _start_task_journal(task_id, journal_mode, file.filename, tmp_path)
+    try:
+        articles = await _load_task_articles(task_id, tmp_path, None)
+    except Exception as e:
+        _finish_background_task(task_id, tmp_path)
+        await _set_task_error(task_id, str(e))
+        raise HTTPException(status_code=400, detail=f"EPUB 解析失败: {e}") from e
+    if not articles:
+        _finish_background_task(task_id, tmp_path)
+        await _set_task_error(task_id, "未能从 EPUB 中解析出有效文章。")
+        raise HTTPException(status_code=400, detail="未能从 EPUB 中解析出有效文章。")
+    _processing_status[task_id]["total"] = len(articles) * len(kinds)
+    _account_task_load(task_id, articles, len(kinds), 0)
+    queue: asyncio.Queue = asyncio.Queue()
+    _result_streams.setdefault(task_id, []).append(queue)
+    # 处理在独立任务中进行（响应体未开始发送就断开时也会跑完并释放容量），响应体只负责转发结果
+    work = asyncio.create_task(_run_stream_task(task_id, kinds, articles, api_key, tmp_path))
+    _active_tasks[task_id] = work
+    return StreamingResponse(
+        _stream_new_task(task_id, mode, kinds, len(articles), work, queue),
+        media_type="application/x-ndjson",
+        headers={"X-Task-Id": task_id},
     )
-    return JSONResponse({"task_id": task_id, "status": "processing"})
 
 
-@app.get("/api/download/read/{task_id}")
-def download_read(task_id: str):
-    """下载「看我」Word：看+（上传文件名）.docx"""
-    if task_id not in _results_store or "read_docx" not in _results_store[task_id]:
+async def _run_batch(batch_id: str, jobs: list[tuple], api_key: str) -> None:
+    """同一批次的所有期刊并发运行，全部文章共用全局并发与速率限制，期刊之间不留空档。"""
+    try:
+        await asyncio.gather(
+            *(runner(task_id, tmp_path, api_key, file_name) for runner, task_id, tmp_path, file_name in jobs),
+            return_exceptions=True,
+        )
+    finally:
+        _batch_runs.pop(batch_id, None)
+
+
+@app.post("/api/batch")
+async def submit_batch(
+    files: List[UploadFile] = File(...),
+    mode: str = Form("point"),
+) -> JSONResponse:
+    """批量提交多本 EPUB：每本一个 task_id（可单独查询/下载/重试），另返回 batch_id 查询总体进度。"""
+    import uuid
+
+    if mode not in ("point", "listen", "read"):
+        raise HTTPException(status_code=400, detail="mode 仅支持 point / listen / read。")
+    if not files:
+        raise HTTPException(status_code=400, detail="请至少上传一个 EPUB 文件。")
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"单次最多提交 {MAX_BATCH_FILES} 个文件。")
+    if any(not f.filename or not f.filename.lower().endswith(".epub") for f in files):
+        raise HTTPException(status_code=400, detail="仅支持 EPUB 文件。")
+    api_key = get_default_api_key()
+    if not api_key:
+        raise HTTPException(
+            status_code=500,
+            detail="后端未配置 DEEPSEEK_API_KEY 环境变量，请在服务器上设置后重试。",
+        )
+    if _draining:
+        raise HTTPException(status_code=503, detail="服务正在重启，请稍后重试。")
+
+    runner = _task_runner(mode)
+    batch_id = str(uuid.uuid4())
+    jobs = []
+    tasks = []
+    rejected = []
+    for f in files:
+        task_id = str(uuid.uuid4())
+        content = await f.read()
+        decision, tmp_path = await _admit_upload(
+            task_id, mode, f.filename or "", content, api_key, {"batch_id": batch_id}
+        )
+        if decision == "rejected":
+            rejected.append(f.filename or "")
+            continue
+        if decision == "admitted":
+            jobs.append((runner, task_id, tmp_path, f.filename or ""))
+        tasks.append({"task_id": task_id, "file_name": f.filename or ""})
+    if not tasks:
+        raise _busy_error()
+    manifest = {"batch_id": batch_id, "mode": mode, "tasks": tasks}
+    _batches[batch_id] = manifest
+    try:
+        save_batch_manifest(batch_id, manifest)
+    except OSError as e:
+        _trace("JOURNAL_ERR", batch_id=batch_id, error=f"{type(e).__name__}: {e}")
+    if jobs:
+        # 与单本上传相同经 _spawn 启动：停机排空时会等待，DELETE /api/batch/{batch_id} 可整批取消
+        _batch_runs[batch_id] = _spawn(_run_batch(batch_id, jobs, api_key))
+    body = {
+        "batch_id": batch_id,
+        "status": "processing",
+        "tasks": [{**t, "status": _current_status(t["task_id"])["status"]} for t in tasks],
+    }
+    if rejected:
+        # 部分期刊因等待队列已满被拒绝：其余照常处理，被拒的稍后单独重新提交
+        body["rejected"] = rejected
+        body["retry_after"] = _admission.retry_after()
+    return JSONResponse(body)
+
+
+@app.get("/api/batch/{batch_id}")
+def get_batch_status(batch_id: str) -> JSONResponse:
+    """批次总体进度：各期刊状态 + 汇总的 current/total。"""
+    manifest = _batches.get(batch_id) or load_batch_manifest(batch_id)
+    if manifest is None:
+        return JSONResponse({"status": "not_found"})
+    items = []
+    for t in manifest["tasks"]:
+        st = _current_status(t["task_id"])
+        items.append({**t, **st})
+    counts: dict[str, int] = {}
+    for it in items:
+        counts[it["status"]] = counts.get(it["status"], 0) + 1
+    if counts.get("completed", 0) == len(items):
+        overall = "completed"
+    elif counts.get("completed", 0) + counts.get("error", 0) == len(items):
+        overall = "error" if not counts.get("completed") else "partial"
+    else:
+        overall = "processing"
+    return JSONResponse({
+        "batch_id": batch_id,
+        "mode": manifest["mode"],
+        "status": overall,
+        "current": sum(it.get("current", 0) for it in items),
+        "total": sum(it.get("total", 0) for it in items),
+        "counts": counts,
+        "tasks": items,
+    })
+
+
+@app.delete("/api/batch/{batch_id}")
+async def cancel_batch(batch_id: str) -> JSONResponse:
+    """取消整个批次：本进程中排队或处理中的期刊立即取消，其他 worker 上的写入取消请求；已结束的期刊不受影响。"""
+    manifest = _batches.get(batch_id) or load_batch_manifest(batch_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="批次不存在或已过期")
+    items = []
+    for t in manifest["tasks"]:
+        task_id = t["task_id"]
+        if await _cancel_task(task_id, "delete_batch"):
+            status = "cancelled"
+        else:
+            status = _current_status(task_id)["status"]
+            if status not in ("completed", "error", "cancelled", "not_found"):
+                try:
+                    request_cancel(task_id)
+                    status = "cancelling"
+                except OSError as e:
+                    _trace("JOURNAL_ERR", task_id, error=f"{type(e).__name__}: {e}")
+        items.append({**t, "status": status})
+    run = _batch_runs.get(batch_id)
+    if run is not None and not run.done():
+        # 各期刊已逐个取消，这里只是收尾：尚未开始执行的期刊不再启动
+        run.cancel()
+    return JSONResponse({"batch_id": batch_id, "tasks": items})
+
+
+def _snapshot_from_journal(task_id: str, kind: str) -> tuple[str, int, list, dict, str] | None:
+    """本进程内存中没有该任务的结果（其他 worker 处理、进程重启、同步接口或任务已失败）时，
+    从任务日志渲染已完成的文章：(base_name, 总篇数, [(序号, 渲染结果)], 标题覆盖, 任务状态)。
+    标题覆盖与完整文档一致：点我任务用同一篇译文的标题，听我任务用翻译后的英文标题。"""
+    state = load_task_journal(task_id)
+    if state is None or state.articles is None or kind not in _MODE_KINDS.get(state.mode, ()):
+        return None
+    base_name = re.sub(r"\.epub$", "", state.file_name or "", flags=re.I).strip() or "result"
+    arts = state.articles
+    rendered = sorted(
+        (i, _render_article(kind, arts[i - 1], t)) for i, t in state.results.get(kind, {}).items() if 0 < i <= len(arts)
+    )
+    read_titles = {}
+    if kind == "listen" and "read" in _MODE_KINDS[state.mode]:
+        read_titles = {i: render_translation(t, arts[i - 1])[0] for i, t in state.results.get("read", {}).items()}
+    elif kind == "listen":
+        # 听我任务：英文标题在全部文章完成后翻译，译名记在日志的 "title" 中
+        read_titles = dict(state.results.get("title", {}))
+    return base_name, len(arts), rendered, read_titles, state.status
+
+
+def _assemble_items(kind: str, rendered: list, read_titles: dict) -> list:
+    """按序号排好的单篇渲染 → 文档条目（去掉不进文档的篇目）。"""
+    if kind == "listen":
+        # 与完整文档一致：口播稿标题优先用覆盖标题（点我为同一篇译文的标题，听我为标题译名）
+        return [
+            (read_titles[i], r[1]) if read_titles.get(i, "未命名文章") != "未命名文章" else r
+            for i, r in rendered if r is not None
+        ]
+    return [r for _, r in rendered if r is not None]
+
+
+async def _partial_download(task_id: str, kind: str, fmt: str, compress: bool, snapshot=None) -> StreamingResponse:
+    """只含目前已完成文章（按文档顺序）的文档，由缓存的单篇渲染拼装（本进程处理中的任务），
+    或从任务日志渲染。听我的英文标题暂不翻译，完整文档中会翻译。部分文档随处理进度变化，不缓存。"""
+    entry = _partial_renders.get(task_id)
+    if entry is not None:
+        read_titles = {i: r[0] for i, r in entry["read"].items() if r is not None}
+        snapshot = (entry["base_name"], entry["total"], sorted(entry[kind].items()), read_titles, "processing")
+    elif snapshot is None:
+        snapshot = await asyncio.to_thread(_snapshot_from_journal, task_id, kind)
+    if snapshot is None:
+        # 任务已受理但文章尚未解析出来（准入排队或正在解析 EPUB）：与没有完成的文章同样处理
+        if kind in _MODE_KINDS.get(_task_modes.get(task_id, ""), ()) and _current_status(task_id)["status"] in (
+            "queued", "processing"
+        ):
+            raise HTTPException(status_code=409, detail="尚无已完成的文章，请稍后再试")
         raise HTTPException(status_code=404, detail="任务不存在或已过期")
-    base_name = _results_store[task_id]["base_name"]
-    docx_bytes = _results_store[task_id]["read_docx"]
-    filename = f"看{base_name}.docx"
-    fallback = f"read_{base_name}.docx"
-    cd_header = _content_disposition_utf8(filename, fallback)
-    return StreamingResponse(
-        BytesIO(docx_bytes),
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": cd_header},
+    base_name, total, rendered, read_titles, _ = snapshot
+    items = _assemble_items(kind, rendered, read_titles)
+    if not items:
+        raise HTTPException(status_code=409, detail="尚无已完成的文章，请稍后再试")
+    prefix = "听" if kind == "listen" else "看"
+    name = f"{prefix}{base_name}（部分 {len(rendered)}／{total}）"
+    data = await asyncio.to_thread(_build_document, kind, items, fmt, name, f"{kind}_partial", compress)
+    return _document_response(
+        data, fmt, name, f"{kind}_partial_{len(rendered)}_of_{total}", {"X-Partial-Articles": f"{len(rendered)}/{total}"},
+        compress,
     )
 
 
-@app.get("/api/download/listen/{task_id}")
-def download_listen(task_id: str):
-    """下载「听我」Word：听+（上传文件名）.docx"""
-    if task_id not in _results_store or "listen_docx" not in _results_store[task_id]:
+async def _download(request: Request, task_id: str, kind: str, partial: bool, fmt: str) -> StreamingResponse:
+    """完整文档：第一次下载某种格式时由保存的单篇渲染生成，之后从 _document_cache 返回。"""
+    compress = _wants_gzip(request, fmt)
+    field = f"{kind}_rendered"
+    stored = _results_store.get(task_id)
+    if (stored is None or field not in stored) and task_id not in _active_tasks:
+        snapshot = await asyncio.to_thread(_snapshot_from_journal, task_id, kind)
+        if snapshot is not None and snapshot[4] == "completed":
+            base_name, _, rendered, read_titles, _ = snapshot
+            blob = await asyncio.to_thread(_pack_rendered, _assemble_items(kind, rendered, read_titles))
+            stored = _results_store.setdefault(task_id, {"base_name": base_name})
+            stored[field] = blob
+            _task_finished_at[task_id] = time.time()
+        elif partial and snapshot is not None:
+            return await _partial_download(task_id, kind, fmt, compress, snapshot)
+    if stored is None or field not in stored:
+        if partial:
+            return await _partial_download(task_id, kind, fmt, compress)
         raise HTTPException(status_code=404, detail="任务不存在或已过期")
-    base_name = _results_store[task_id]["base_name"]
-    docx_bytes = _results_store[task_id]["listen_docx"]
-    filename = f"听{base_name}.docx"
-    fallback = f"listen_{base_name}.docx"
-    cd_header = _content_disposition_utf8(filename, fallback)
-    return StreamingResponse(
-        BytesIO(docx_bytes),
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": cd_header},
+    base_name = stored["base_name"]
+    name = f"{'听' if kind == 'listen' else '看'}{base_name}"
+    blob = stored[field]
+    data = await _document_cache.get_or_build(
+        (task_id, kind, fmt, compress),
+        lambda: _build_document(kind, _unpack_rendered(blob), fmt, name, compress=compress).getvalue(),
     )
+    return _document_response(BytesIO(data), fmt, name, f"{kind}_{base_name}", compressed=compress)
+
+
+@app.get("/api/download/read/{task_id}")
+async def download_read(request: Request, task_id: str, partial: bool = False, format: str = "docx"):
+    """下载「看我」：看+（上传文件名）.docx，format=md/html/json 时为对应格式。
+    partial=1 时任务未完成也可下载已完成的文章。"""
+    return await _download(request, task_id, "read", partial, _check_format(format))
+
+
+@app.get("/api/download/listen/{task_id}")
+async def download_listen(request: Request, task_id: str, partial: bool = False, format: str = "docx"):
+    """下载「听我」：听+（上传文件名）.docx，format=md/html/json 时为对应格式。
+    partial=1 时任务未完成也可下载已完成的文章。"""
+    return await _download(request, task_id, "listen", partial, _check_format(format))
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Prometheus 抓取端点（本 worker 进程的指标）。"""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/health")
@@ -765,7 +2306,7 @@ async def debug_analyze_first(file: UploadFile = File(...)) -> JSONResponse:
     """上传 EPUB，仅分析第一篇文章，返回结果或错误详情。"""
     if not file.filename.lower().endswith(".epub"):
         return JSONResponse({"ok": False, "error": "仅支持 EPUB 文件"})
-    api_key = os.getenv("DEEPSEEK_API_KEY")
+    api_key = get_default_api_key()
     if not api_key:
         return JSONResponse({"ok": False, "error": "缺少 DEEPSEEK_API_KEY"})
     try:
@@ -795,7 +2336,7 @@ async def debug_analyze_first(file: UploadFile = File(...)) -> JSONResponse:
 @app.get("/debug-deepseek")  # 备用：直接访问后端时用
 def debug_deepseek() -> JSONResponse:
     """诊断 DeepSeek 连接，返回实际错误信息。"""
-    api_key = os.getenv("DEEPSEEK_API_KEY")
+    api_key = get_default_api_key()
     if not api_key:
         return JSONResponse({"ok": False, "error": "缺少 DEEPSEEK_API_KEY"})
     try:
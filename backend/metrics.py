@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 不引入 prometheus_client：指标种类很少，手写 text exposition 格式即可。
+# 每个 worker 进程各自计数，Prometheus 按实例抓取后用 sum() 聚合。
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEEPSEEK_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 90.0, 120.0, 180.0, 300.0)
+
+_LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+def _format_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # DeepSeek 调用在执行器线程中记录
+
+    def _key(self, labels: Dict[str, str]) -> _LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """可 inc/dec 的值；也可用 set_function 在抓取时从现有状态计算（无需在各处维护计数）。"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[_LabelKey, float] = {}
+        self._fn: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        self._fn = fn
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> List[str]:
+        if self._fn is not None:
+            try:
+                return [f"{self.name} {_format_value(self._fn())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[_LabelKey, List[int]] = {}
+        self._sums: Dict[_LabelKey, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[idx] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def totals(self) -> Dict[_LabelKey, Tuple[int, float]]:
+        """各标签组合的 (观测次数, 累计值)，供基准测试前后相减得出单次运行的分阶段耗时。"""
+        with self._lock:
+            return {k: (sum(v), self._sums[k]) for k, v in self._counts.items()}
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v), self._sums[k]) for k, v in self._counts.items())
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+_registry: List[_Metric] = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition（version 0.0.4）。"""
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+EPUB_EXTRACT_SECONDS = _register(Histogram(
+    "epub_extract_seconds", "EPUB 解析为文章列表的耗时",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+))
+QUEUE_WAIT_SECONDS = _register(Histogram(
+    "article_queue_wait_seconds", "文章在公平队列与主机并发槽位上的等待时间", ["lane"],
+))
+RATE_LIMIT_WAIT_SECONDS = _register(Histogram(
+    "rate_limiter_wait_seconds", "文章在主机级速率限制器上的等待时间",
+))
+DEEPSEEK_CALL_SECONDS = _register(Histogram(
+    "deepseek_call_seconds", "单篇 DeepSeek 调用耗时（含重试与降级）", ["kind", "outcome"],
+    buckets=DEEPSEEK_BUCKETS,
+))
+DEEPSEEK_RESPONSES = _register(Counter(
+    "deepseek_http_responses_total", "DeepSeek HTTP 响应数（status=0 为连接错误/超时）", ["status"],
+))
+DEEPSEEK_RETRIES = _register(Counter(
+    "deepseek_retries_total", "DeepSeek 请求重试次数，按触发重试的状态码", ["status"],
+))
+DEEPSEEK_HEDGES = _register(Counter(
+    "deepseek_hedges_total", "对冲请求：issued 发起、no_budget 额度用尽、primary_won/hedge_won 哪一份先成功", ["kind", "outcome"],
+))
+DEEPSEEK_PROMPT_CACHE_TOKENS = _register(Counter(
+    "deepseek_prompt_cache_tokens_total", "prompt token 中命中/未命中 DeepSeek 前缀缓存的数量", ["kind", "cache"],
+))
+DOCX_BUILD_SECONDS = _register(Histogram(
+    "docx_build_seconds", "生成 Word 文档耗时", ["kind"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+))
+DOCUMENT_BUILD_SECONDS = _register(Histogram(
+    "document_build_seconds", "生成 Markdown/HTML/JSON 结果文档耗时", ["kind", "format"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+))
+DOCUMENT_CACHE_REQUESTS = _register(Counter(
+    "document_cache_requests_total", "结果文档下载：hit 命中缓存、miss 按需生成、shared 等待同一文档的生成", ["result"],
+))
+DOCUMENT_CACHE_BYTES = _register(Gauge("document_cache_bytes", "已生成结果文档缓存占用的字节数"))
+INFLIGHT_ARTICLES = _register(Gauge(
+    "inflight_articles", "正在调用 DeepSeek 的文章数", ["kind"],
+))
+DEEPSEEK_CONCURRENCY_LIMIT = _register(Gauge(
+    "deepseek_concurrency_limit", "本进程当前允许同时调用 DeepSeek 的文章数（自适应并发上限）",
+))
+INFLIGHT_TASKS = _register(Gauge("inflight_tasks", "处理中（含生成文档）的任务数"))
+QUEUED_TASKS = _register(Gauge("queued_tasks", "准入控制等待队列中的任务数"))
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Optional
+
+
+class FairScheduler:
+    """按任务轮转分配 DeepSeek 并发槽位的公平队列。
+
+    每个任务一个 FIFO；槽位空出时按 round-robin 从下一个有排队文章的任务中取一篇，
+    因此大任务不会饿死随后提交的小任务。priority 通道（同步接口，客户端连接一直挂着）
+    总是先于普通通道被调度。capacity_fn 非空时每次调度都从它读取当前容量（自适应并发上限），
+    容量下调时已在途的文章照常完成，只是不再补位。"""
+
+    def __init__(self, capacity: int, capacity_fn: Optional[Callable[[], int]] = None):
+        self._capacity = max(1, capacity)
+        self._capacity_fn = capacity_fn
+        self._in_use = 0
+        self._lanes: tuple[OrderedDict[str, Deque[asyncio.Future]], ...] = (OrderedDict(), OrderedDict())
+        self._running: Dict[str, int] = {}
+
+    @property
+    def capacity(self) -> int:
+        if self._capacity_fn is not None:
+            return max(1, self._capacity_fn())
+        return self._capacity
+
+    def _queued_total(self) -> int:
+        return sum(len(q) for lane in self._lanes for q in lane.values())
+
+    def _pop_next(self) -> tuple[str, asyncio.Future] | None:
+        for lane in self._lanes:
+            while lane:
+                task_id, queue = next(iter(lane.items()))
+                lane.move_to_end(task_id)  # 轮转：本任务取一篇后排到队尾
+                while queue:
+                    fut = queue.popleft()
+                    if not fut.done():
+                        if not queue:
+                            del lane[task_id]
+                        return task_id, fut
+                del lane[task_id]
+        return None
+
+    def _dispatch(self) -> None:
+        while self._in_use < self.capacity:
+            nxt = self._pop_next()
+            if nxt is None:
+                return
+            task_id, fut = nxt
+            self._in_use += 1
+            self._running[task_id] = self._running.get(task_id, 0) + 1
+            fut.set_result(None)
+
+    async def acquire(self, task_id: str, priority: bool = False) -> float:
+        """获取一个槽位，返回排队等待的秒数。"""
+        if self.try_acquire(task_id):
+            return 0.0
+        start = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        lane = self._lanes[0 if priority else 1]
+        lane.setdefault(task_id, deque()).append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # 槽位已分配给本协程但它被取消了：归还槽位
+                self.release(task_id)
+            else:
+                queue = lane.get(task_id)
+                if queue is not None and fut in queue:
+                    queue.remove(fut)
+                    if not queue:
+                        del lane[task_id]
+            raise
+        return time.monotonic() - start
+
+    def try_acquire(self, task_id: str) -> bool:
+        """不排队地获取一个槽位（对冲请求用）：有空闲且没有文章在排队时才成功。"""
+        if self._in_use < self.capacity and self._queued_total() == 0:
+            self._in_use += 1
+            self._running[task_id] = self._running.get(task_id, 0) + 1
+            return True
+        return False
+
+    def release(self, task_id: str) -> None:
+        self._in_use = max(0, self._in_use - 1)
+        n = self._running.get(task_id, 0) - 1
+        if n > 0:
+            self._running[task_id] = n
+        else:
+            self._running.pop(task_id, None)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, task_id: str, priority: bool = False) -> AsyncIterator[float]:
+        waited = await self.acquire(task_id, priority)
+        try:
+            yield waited
+        finally:
+            self.release(task_id)
+
+    def snapshot(self) -> dict:
+        """当前调度状态：容量、占用及每个任务的运行/排队篇数。"""
+        tasks: Dict[str, dict] = {}
+        for task_id, n in self._running.items():
+            tasks.setdefault(task_id, {"running": 0, "queued": 0})["running"] = n
+        for lane_name, lane in zip(("priority", "normal"), self._lanes):
+            for task_id, queue in lane.items():
+                entry = tasks.setdefault(task_id, {"running": 0, "queued": 0})
+                entry["queued"] += sum(1 for f in queue if not f.done())
+                entry["lane"] = lane_name
+        return {
+            "capacity": self.capacity,
+            "in_use": self._in_use,
+            "queued": self._queued_total(),
+            "tasks": tasks,
+        }
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from epub_processing import Article
+
+# 任务日志目录：每个任务一个 <task_id>.jsonl（逐条追加），解析前另存一份 <task_id>.epub
+TASK_JOURNAL_DIR = os.getenv(
+    "TASK_JOURNAL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "task_journal"),
+)
+# 已结束任务的日志保留时长（小时），超时后在启动时清理
+TASK_JOURNAL_TTL_HOURS = float(os.getenv("TASK_JOURNAL_TTL_HOURS", "48"))
+# 每条记录写入后是否 fsync（关闭可减少磁盘开销，但掉电时可能丢最后几条）
+TASK_JOURNAL_FSYNC = os.getenv("TASK_JOURNAL_FSYNC", "1").strip().lower() in ("1", "true", "yes")
+
+_TASK_ID_RE = re.compile(r"^[0-9a-zA-Z-]{8,64}$")
+_write_lock = threading.Lock()
+
+
+@dataclass
+class JournalState:
+    """从日志回放得到的任务快照。results/errors 按 kind（"listen" / "read"，听我的标题译名为 "title"）→ 文章序号 组织。"""
+    task_id: str
+    mode: str
+    file_name: str
+    created_at: float = 0.0
+    articles: Optional[List[Article]] = None
+    results: Dict[str, Dict[int, str]] = field(default_factory=dict)
+    errors: Dict[str, Dict[int, str]] = field(default_factory=dict)
+    status: str = "processing"
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "error", "cancelled")
+
+
+def _is_valid_task_id(task_id: str) -> bool:
+    return bool(task_id) and bool(_TASK_ID_RE.match(task_id))
+
+
+def _journal_path(task_id: str) -> str:
+    return os.path.join(TASK_JOURNAL_DIR, f"{task_id}.jsonl")
+
+
+def journal_epub_path(task_id: str) -> str:
+    """日志目录中保存的 EPUB 副本路径（仅在文章列表落盘前存在）。"""
+    return os.path.join(TASK_JOURNAL_DIR, f"{task_id}.epub")
+
+
+def _lock_path(task_id: str) -> str:
+    return os.path.join(TASK_JOURNAL_DIR, f"{task_id}.lock")
+
+
+def _append(task_id: str, record: dict) -> None:
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    with _write_lock:
+        with open(_journal_path(task_id), "ab+") as f:
+            # 上一个进程写到一半被杀时末行没有换行：先补上，否则这条记录会与半行粘成一行被回放丢弃
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            if TASK_JOURNAL_FSYNC:
+                os.fsync(f.fileno())
+
+
+def has_task_journal(task_id: str) -> bool:
+    return _is_valid_task_id(task_id) and os.path.exists(_journal_path(task_id))
+
+
+def create_task_journal(task_id: str, mode: str, file_name: str, epub_path: str) -> None:
+    """新建任务日志，并把上传的 EPUB 复制一份，保证解析完成前被杀也能重来。"""
+    os.makedirs(TASK_JOURNAL_DIR, exist_ok=True)
+    shutil.copyfile(epub_path, journal_epub_path(task_id))
+    _append(task_id, {
+        "t": "meta",
+        "task_id": task_id,
+        "mode": mode,
+        "file_name": file_name,
+        "created_at": time.time(),
+    })
+
+
+def record_articles(task_id: str, articles: List[Article]) -> None:
+    """记录解析出的文章列表；之后续跑不再需要 EPUB 副本。"""
+    _append(task_id, {
+        "t": "articles",
+        "articles": [{"title": a.title, "content": a.content} for a in articles],
+    })
+    try:
+        os.remove(journal_epub_path(task_id))
+    except OSError:
+        pass
+
+
+def record_result(task_id: str, kind: str, index: int, text: str) -> None:
+    _append(task_id, {"t": "result", "kind": kind, "index": index, "text": text})
+
+
+def record_error(task_id: str, kind: str, index: int, error: str) -> None:
+    _append(task_id, {"t": "error", "kind": kind, "index": index, "error": error})
+
+
+def record_status(task_id: str, status: str, error: Optional[str] = None) -> None:
+    """记录任务整体状态；completed / error / cancelled 视为已结束，不再续跑。"""
+    record = {"t": "status", "status": status}
+    if error:
+        record["error"] = error
+    _append(task_id, record)
+
+
+def load_task_journal(task_id: str) -> Optional[JournalState]:
+    """回放日志得到任务快照；日志不存在或损坏时返回 None。末行写到一半（进程被杀）会被忽略。"""
+    if not has_task_journal(task_id):
+        return None
+    state: Optional[JournalState] = None
+    try:
+        with open(_journal_path(task_id), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                t = rec.get("t")
+                if t == "meta":
+                    state = JournalState(
+                        task_id=task_id,
+                        mode=rec.get("mode", ""),
+                        file_name=rec.get("file_name", ""),
+                        created_at=rec.get("created_at", 0.0),
+                    )
+                elif state is None:
+                    continue
+                elif t == "articles":
+                    state.articles = [
+                        Article(title=a.get("title", ""), content=a.get("content", ""))
+                        for a in rec.get("articles", [])
+                    ]
+                elif t == "result":
+                    kind, idx = rec["kind"], int(rec["index"])
+                    state.results.setdefault(kind, {})[idx] = rec["text"]
+                    state.errors.get(kind, {}).pop(idx, None)
+                elif t == "error":
+                    kind, idx = rec["kind"], int(rec["index"])
+                    if idx not in state.results.get(kind, {}):
+                        state.errors.setdefault(kind, {})[idx] = rec.get("error", "")
+                elif t == "status":
+                    state.status = rec.get("status", state.status)
+                    state.error = rec.get("error")
+    except OSError:
+        return None
+    return state
+
+
+def list_unfinished_tasks() -> List[str]:
+    """列出日志中尚未结束的任务 ID。"""
+    if not os.path.isdir(TASK_JOURNAL_DIR):
+        return []
+    out: List[str] = []
+    for name in sorted(os.listdir(TASK_JOURNAL_DIR)):
+        if not name.endswith(".jsonl"):
+            continue
+        task_id = name[: -len(".jsonl")]
+        state = load_task_journal(task_id)
+        if state is not None and not state.finished:
+            out.append(task_id)
+    return out
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def claim_task(task_id: str) -> bool:
+    """声明由当前进程负责续跑该任务（多 worker 启动时只有一个能拿到）。
+    锁文件记录 主机名 + pid；主机不同（如重新部署的新容器）或 pid 已退出的锁视为失效。"""
+    os.makedirs(TASK_JOURNAL_DIR, exist_ok=True)
+    path = _lock_path(task_id)
+    owner = f"{socket.gethostname()} {os.getpid()}"
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    host, _, pid = f.read().strip().rpartition(" ")
+            except OSError:
+                continue
+            if host == socket.gethostname() and pid.isdigit() and _pid_alive(int(pid)):
+                return False
+            try:
+                os.remove(path)
+            except OSError:
+                return False
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(owner)
+        return True
+    return False
+
+
+def release_task(task_id: str) -> None:
+    """释放续跑声明（仅删除当前进程持有的锁）。"""
+    path = _lock_path(task_id)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read().strip() != f"{socket.gethostname()} {os.getpid()}":
+                return
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _cancel_path(task_id: str) -> str:
+    return os.path.join(TASK_JOURNAL_DIR, f"{task_id}.cancel")
+
+
+def request_cancel(task_id: str) -> None:
+    """请求取消由其他 worker 处理的任务：写标记文件，持有该任务的 worker 定期检查后取消。"""
+    os.makedirs(TASK_JOURNAL_DIR, exist_ok=True)
+    with open(_cancel_path(task_id), "w", encoding="utf-8") as f:
+        f.write(str(time.time()))
+
+
+def cancel_requested(task_id: str) -> bool:
+    return os.path.exists(_cancel_path(task_id))
+
+
+def clear_cancel_request(task_id: str) -> None:
+    try:
+        os.remove(_cancel_path(task_id))
+    except OSError:
+        pass
+
+
+def _batch_path(batch_id: str) -> str:
+    return os.path.join(TASK_JOURNAL_DIR, f"batch_{batch_id}.json")
+
+
+def save_batch_manifest(batch_id: str, manifest: dict) -> None:
+    """保存批次清单（batch_id → 各期刊 task_id），使任一 worker 都能汇总批次进度。"""
+    os.makedirs(TASK_JOURNAL_DIR, exist_ok=True)
+    with open(_batch_path(batch_id), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+
+def load_batch_manifest(batch_id: str) -> Optional[dict]:
+    if not _is_valid_task_id(batch_id):
+        return None
+    try:
+        with open(_batch_path(batch_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def purge_expired_journals() -> int:
+    """删除已结束且超过保留时长的任务日志，返回删除的任务数。"""
+    if not os.path.isdir(TASK_JOURNAL_DIR):
+        return 0
+    cutoff = time.time() - TASK_JOURNAL_TTL_HOURS * 3600
+    removed = 0
+    for name in os.listdir(TASK_JOURNAL_DIR):
+        if name.startswith("batch_") and name.endswith(".json"):
+            try:
+                if os.path.getmtime(os.path.join(TASK_JOURNAL_DIR, name)) < cutoff:
+                    os.remove(os.path.join(TASK_JOURNAL_DIR, name))
+            except OSError:
+                pass
+            continue
+        if not name.endswith(".jsonl"):
+            continue
+        task_id = name[: -len(".jsonl")]
+        path = _journal_path(task_id)
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+        except OSError:
+            continue
+        state = load_task_journal(task_id)
+        if state is not None and not state.finished:
+            continue
+        for p in (path, journal_epub_path(task_id), _lock_path(task_id), _cancel_path(task_id)):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        removed += 1
+    return removed
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+
+import pytest
+
+# 后端模块按顶层模块导入（与 uvicorn main:app 相同），从任意目录运行 pytest 都需要 backend 在 sys.path 中
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 导入 benchmarks.pipeline 会把任务日志、台账、锁文件等指向隔离的临时目录；必须早于任何后端模块的导入
+from benchmarks.pipeline import _WORKDIR, _Server, _free_port  # noqa: E402
+
+_MOCK_PORT = _free_port()
+os.environ["DEEPSEEK_API_BASE"] = f"http://127.0.0.1:{_MOCK_PORT}"
+os.environ.setdefault("CANCEL_POLL_SECONDS", "0.2")
+
+
+@pytest.fixture(scope="session")
+def mock_deepseek():
+    """进程内的模拟 DeepSeek（benchmarks/mock_deepseek.py），各测试可临时修改 app.state.config。"""
+    from benchmarks.mock_deepseek import MockConfig, create_app
+
+    app = create_app(MockConfig(latency="fixed:0.02", tokens_per_sec=0, seed=1))
+    server = _Server(app, _MOCK_PORT).start()
+    yield app
+    server.stop()
+
+
+@pytest.fixture
+def mock_config(mock_deepseek, monkeypatch):
+    """修改模拟服务配置（测试结束后自动还原），如 mock_config(latency="fixed:0.5")。"""
+    def apply(**changes):
+        for name, value in changes.items():
+            monkeypatch.setattr(mock_deepseek.state.config, name, value)
+    return apply
+
+
+@pytest.fixture(scope="session")
+def client(mock_deepseek):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture
+def mock_requests(mock_deepseek):
+    """返回自本测试开始以来模拟服务收到的请求数。"""
+    start = mock_deepseek.state.stats.requests
+    return lambda: mock_deepseek.state.stats.requests - start
+
+
+@pytest.fixture(scope="session")
+def make_epub():
+    from benchmarks.corpus import generate_epub
+
+    made = {}
+
+    def make(articles: int, seed: int = 1) -> bytes:
+        if (articles, seed) not in made:
+            path = os.path.join(_WORKDIR, f"test_{articles}_{seed}.epub")
+            generate_epub(path, articles, seed=seed)
+            with open(path, "rb") as f:
+                made[(articles, seed)] = f.read()
+        return made[(articles, seed)]
+    return make
+
+
+def upload(client, endpoint: str, epub: bytes, name: str = "issue.epub", **kwargs):
+    return client.post(endpoint, files={"file": (name, epub, "application/epub+zip")}, **kwargs)
+
+
+def wait_status(client, task_id: str, statuses=("completed", "error", "cancelled"), timeout: float = 30.0) -> dict:
+    deadline = time.time() + timeout
+    while True:
+        status = client.get(f"/api/analyze-status/{task_id}").json()
+        if status["status"] in statuses:
+            return status
+        if time.time() > deadline:
+            raise AssertionError(f"任务 {task_id} 在 {timeout}s 内未进入 {statuses}: {status}")
+        time.sleep(0.05)
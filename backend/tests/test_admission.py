@@ -0,0 +1,69 @@
+from admission import AdmissionController, TaskLoad
+
+
+def _controller(**kwargs) -> AdmissionController:
+    limits = dict(max_articles=100, max_tokens=10**9, max_memory_bytes=10**9, max_waiting=1)
+    limits.update(kwargs)
+    return AdmissionController(4, **limits)
+
+
+def test_admit_then_queue_then_reject():
+    ctl = _controller()
+    started: list[str] = []
+    assert ctl.try_admit("a", TaskLoad(articles=80), lambda: started.append("a")) == "admitted"
+    assert ctl.try_admit("b", TaskLoad(articles=50), lambda: started.append("b")) == "queued"
+    assert ctl.position("b")[0] == 1
+    assert ctl.try_admit("c", TaskLoad(articles=1), lambda: started.append("c")) == "rejected"
+    assert ctl.retry_after() >= 5
+    assert started == []
+
+
+def test_release_starts_waiting_in_fifo_order():
+    ctl = _controller(max_waiting=5)
+    started: list[str] = []
+    ctl.try_admit("a", TaskLoad(articles=80), lambda: started.append("a"))
+    ctl.try_admit("b", TaskLoad(articles=60), lambda: started.append("b"))
+    ctl.try_admit("c", TaskLoad(articles=30), lambda: started.append("c"))
+    ctl.release("a")
+    assert started == ["b", "c"]
+    assert ctl.snapshot()["waiting_tasks"] == []
+
+
+def test_queued_upload_does_not_overtake_earlier_waiter():
+    ctl = _controller(max_waiting=5)
+    ctl.try_admit("a", TaskLoad(articles=80), lambda: None)
+    ctl.try_admit("b", TaskLoad(articles=60), lambda: None)
+    # 放得下，但前面有人排队：上传任务按 FIFO 排在后面
+    assert ctl.try_admit("c", TaskLoad(articles=10), lambda: None) == "queued"
+
+
+def test_sync_request_skips_queue_when_it_fits():
+    ctl = _controller()
+    ctl.try_admit("a", TaskLoad(articles=80), lambda: None)
+    ctl.try_admit("b", TaskLoad(articles=50), lambda: None)
+    assert ctl.admit_if_fits("sync", TaskLoad(articles=10))
+    assert not ctl.admit_if_fits("too-big", TaskLoad(articles=20))
+
+
+def test_idle_controller_admits_oversized_task():
+    ctl = _controller()
+    assert ctl.try_admit("huge", TaskLoad(articles=1000), lambda: None) == "admitted"
+
+
+def test_cancel_waiting():
+    ctl = _controller()
+    started: list[str] = []
+    ctl.try_admit("a", TaskLoad(articles=80), lambda: None)
+    ctl.try_admit("b", TaskLoad(articles=50), lambda: started.append("b"))
+    assert ctl.cancel_waiting("b")
+    assert not ctl.cancel_waiting("b")
+    ctl.release("a")
+    assert started == []
+
+
+def test_article_done_frees_capacity():
+    ctl = _controller()
+    ctl.try_admit("a", TaskLoad(articles=80, tokens=8000), lambda: None)
+    ctl.article_done("a", 40)
+    assert ctl.snapshot()["articles"] == 40
+    assert ctl.snapshot()["tokens_est"] == 4000
@@ -0,0 +1,47 @@
+import time
+
+from conftest import wait_status
+
+
+def _files(epub: bytes, n: int) -> list:
+    return [("files", (f"issue{i}.epub", epub, "application/epub+zip")) for i in range(n)]
+
+
+def test_batch_runs_every_issue(client, make_epub, mock_requests):
+    resp = client.post("/api/batch", files=_files(make_epub(3), 2), data={"mode": "read"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [t["file_name"] for t in body["tasks"]] == ["issue0.epub", "issue1.epub"]
+    batch_id = body["batch_id"]
+
+    for t in body["tasks"]:
+        assert wait_status(client, t["task_id"])["status"] == "completed"
+    status = client.get(f"/api/batch/{batch_id}").json()
+    assert status["status"] == "completed"
+    assert status["counts"] == {"completed": 2}
+    assert status["current"] == status["total"] == 6
+    assert mock_requests() == 6
+
+
+def test_cancel_batch(client, make_epub, mock_config, mock_requests):
+    mock_config(latency="fixed:0.5")
+    body = client.post("/api/batch", files=_files(make_epub(20), 2), data={"mode": "listen"}).json()
+    time.sleep(0.3)
+    resp = client.delete(f"/api/batch/{body['batch_id']}")
+    assert resp.status_code == 200
+    assert [t["status"] for t in resp.json()["tasks"]] == ["cancelled", "cancelled"]
+    sent = mock_requests()
+    assert sent < 40
+    time.sleep(0.8)
+    assert mock_requests() == sent  # 排队中的文章不再发出
+    assert client.get(f"/api/batch/{body['batch_id']}").json()["counts"] == {"cancelled": 2}
+    assert client.get("/api/scheduler").json()["in_use"] == 0
+
+
+def test_batch_validation(client, make_epub):
+    assert client.post("/api/batch", files=_files(make_epub(3), 1), data={"mode": "analyze"}).status_code == 400
+    assert client.post(
+        "/api/batch", files=[("files", ("notes.txt", b"x", "text/plain"))], data={"mode": "read"}
+    ).status_code == 400
+    assert client.get("/api/batch/no-such-batch").json() == {"status": "not_found"}
+    assert client.delete("/api/batch/no-such-batch").status_code == 404
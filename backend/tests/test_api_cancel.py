@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from conftest import upload, wait_status
+
+
+def test_cancel_background_task(client, make_epub, mock_config, mock_requests):
+    mock_config(latency="fixed:0.5")
+    task_id = upload(client, "/api/listen-me", make_epub(30)).json()["task_id"]
+    time.sleep(0.3)
+    resp = client.delete(f"/api/tasks/{task_id}")
+    assert resp.status_code == 200
+    assert resp.json() == {"task_id": task_id, "status": "cancelled"}
+    sent = mock_requests()
+    assert sent < 30
+    time.sleep(0.8)
+    assert mock_requests() == sent  # 排队的文章不再发出，在途请求已中断
+    assert client.get(f"/api/analyze-status/{task_id}").json()["status"] == "cancelled"
+    assert client.get("/api/scheduler").json()["in_use"] == 0
+    assert client.delete(f"/api/tasks/{task_id}").status_code == 409
+
+    # 取消的任务可以继续：只补齐没有结果的文章
+    mock_config(latency="fixed:0.02")
+    before = mock_requests()
+    resp = client.post(f"/api/tasks/{task_id}/retry")
+    assert resp.status_code == 200
+    pending = resp.json()["retry_articles"]["listen"]
+    assert 0 < len(pending) <= 30
+    assert wait_status(client, task_id)["status"] == "completed"
+    assert mock_requests() - before == len(pending)
+
+
+def test_cancel_unknown_task(client):
+    assert client.delete("/api/tasks/00000000-0000-0000-0000-000000000000").status_code == 404
+
+
+def test_cancel_sync_request(client, make_epub, mock_config, mock_requests):
+    mock_config(latency="fixed:0.5")
+    before = set(main._active_tasks)
+    result = {}
+
+    def post() -> None:
+        result["resp"] = upload(client, "/api/analyze-epub", make_epub(30))
+
+    thread = threading.Thread(target=post)
+    thread.start()
+    deadline = time.time() + 10
+    while not (set(main._active_tasks) - before) and time.time() < deadline:
+        time.sleep(0.02)
+    (task_id,) = set(main._active_tasks) - before
+    assert client.delete(f"/api/tasks/{task_id}").json()["status"] == "cancelled"
+    thread.join(10)
+    assert result["resp"].status_code == 409
+    sent = mock_requests()
+    time.sleep(0.8)
+    assert mock_requests() == sent
+    assert client.get("/api/scheduler").json()["in_use"] == 0
+
+
+def test_client_disconnect_cancels_sync_work():
+    class _GoneRequest:
+        async def is_disconnected(self) -> bool:
+            return True
+
+    async def run():
+        work_cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                work_cancelled.set()
+                raise
+
+        with pytest.raises(HTTPException) as exc:
+            await main._cancel_on_disconnect(_GoneRequest(), "disconnect-test-task", work())
+        return exc.value.status_code, work_cancelled.is_set()
+
+    assert asyncio.run(run()) == (499, True)
+    assert "disconnect-test-task" not in main._active_tasks
+    assert main._processing_status["disconnect-test-task"]["status"] == "cancelled"
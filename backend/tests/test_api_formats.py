@@ -0,0 +1,47 @@
+import io
+import zipfile
+
+from conftest import upload, wait_status
+
+
+def test_download_formats(client, make_epub, mock_requests):
+    task_id = upload(client, "/api/read-me", make_epub(2)).json()["task_id"]
+    assert wait_status(client, task_id)["status"] == "completed"
+    url = f"/api/download/read/{task_id}"
+
+    docx = client.get(url)
+    assert docx.headers["content-type"] == (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+    assert "content-encoding" not in docx.headers  # docx 本身是 zip，不再 gzip
+    assert "word/document.xml" in zipfile.ZipFile(io.BytesIO(docx.content)).namelist()
+    assert ".docx" in docx.headers["content-disposition"]
+
+    data = client.get(url, params={"format": "json"}).json()
+    titles = [a["title"] for a in data["articles"]]
+    assert [a["index"] for a in data["articles"]] == [1, 2]
+    assert all(a["paragraphs"] for a in data["articles"])
+
+    md = client.get(url, params={"format": "md"}, headers={"Accept-Encoding": "gzip"})
+    assert md.headers["content-type"] == "text/markdown; charset=utf-8"
+    assert md.headers["content-encoding"] == "gzip"
+    assert [line[2:] for line in md.text.splitlines() if line.startswith("# ")] == titles
+    assert ".md" in md.headers["content-disposition"]
+
+    page = client.get(url, params={"format": "html"}, headers={"Accept-Encoding": "identity"})
+    assert page.headers["content-type"] == "text/html; charset=utf-8"
+    assert "content-encoding" not in page.headers
+    assert page.text.startswith("<!DOCTYPE html>") and page.text.count("<article>") == 2
+
+    # 同一格式再次下载由文档缓存返回，内容不变
+    assert client.get(url, params={"format": "md"}).content == md.content
+    assert client.get(url, params={"format": "pdf"}).status_code == 400
+    assert mock_requests() == 2
+
+
+def test_sync_endpoint_format(client, make_epub):
+    resp = upload(client, "/api/translate-epub", make_epub(2), params={"format": "md"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "text/markdown; charset=utf-8"
+    assert sum(line.startswith("# ") for line in resp.text.splitlines()) == 2
+    assert upload(client, "/api/analyze-epub", make_epub(2), params={"format": "txt"}).status_code == 400
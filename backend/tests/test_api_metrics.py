@@ -0,0 +1,34 @@
+import re
+
+from conftest import upload, wait_status
+
+
+def _samples(client) -> dict:
+    text = client.get("/metrics").text
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_metrics_exposition_and_counts(client, make_epub):
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE deepseek_call_seconds histogram" in resp.text
+    assert re.search(r"^inflight_tasks \d+", resp.text, re.M)
+
+    before = _samples(client)
+    task_id = upload(client, "/api/read-me", make_epub(3)).json()["task_id"]
+    assert wait_status(client, task_id)["status"] == "completed"
+    after = _samples(client)
+
+    def delta(name: str) -> float:
+        return after.get(name, 0.0) - before.get(name, 0.0)
+
+    assert delta('deepseek_http_responses_total{status="200"}') == 3
+    assert delta('deepseek_call_seconds_count{kind="translate",outcome="ok"}') == 3
+    assert delta("epub_extract_seconds_count") == 1
+    assert after['article_queue_wait_seconds_count{lane="normal"}'] >= 3
@@ -0,0 +1,45 @@
+import time
+
+from conftest import upload, wait_status
+
+
+def test_partial_download_while_processing(client, make_epub, mock_config):
+    mock_config(latency="uniform:0.05,1.5")  # 文章先后完成，留出“部分完成”的窗口
+    task_id = upload(client, "/api/read-me", make_epub(12)).json()["task_id"]
+    url = f"/api/download/read/{task_id}"
+
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        status = client.get(f"/api/analyze-status/{task_id}").json()
+        if status["status"] == "processing" and 0 < status.get("current", 0) < status.get("total", 0):
+            break
+        time.sleep(0.05)
+    else:
+        raise AssertionError("任务没有进入部分完成状态")
+
+    assert client.get(url).status_code == 404  # 未完成时只能下载部分文档
+    resp = client.get(url, params={"partial": 1, "format": "json"})
+    assert resp.status_code == 200
+    done, total = map(int, resp.headers["x-partial-articles"].split("/"))
+    assert total == 12 and 1 <= done < 12
+    assert len(resp.json()["articles"]) == done
+    assert "partial" in resp.headers["content-disposition"]
+
+    assert wait_status(client, task_id)["status"] == "completed"
+    resp = client.get(url, params={"partial": 1, "format": "json"})  # 完成后 partial=1 返回完整文档
+    assert resp.status_code == 200
+    assert "x-partial-articles" not in resp.headers
+    assert len(resp.json()["articles"]) == 12
+
+
+def test_partial_download_before_first_article(client, make_epub, mock_config):
+    mock_config(latency="fixed:1.0")
+    task_id = upload(client, "/api/read-me", make_epub(3)).json()["task_id"]
+    resp = client.get(f"/api/download/read/{task_id}", params={"partial": 1})
+    assert resp.status_code == 409
+    assert wait_status(client, task_id)["status"] == "completed"
+
+
+def test_partial_download_unknown_task(client):
+    url = "/api/download/listen/00000000-0000-0000-0000-000000000000"
+    assert client.get(url, params={"partial": 1}).status_code == 404
@@ -0,0 +1,61 @@
+import main
+from admission import TaskLoad
+from conftest import upload, wait_status
+
+
+def test_retry_reruns_failed_articles_only(client, make_epub, mock_config, mock_requests):
+    mock_config(content_risk_rate=1.0)  # 每篇都被拒：任务失败
+    task_id = upload(client, "/api/read-me", make_epub(4)).json()["task_id"]
+    assert wait_status(client, task_id)["status"] == "error"
+    assert client.get(f"/api/download/read/{task_id}").status_code == 404
+
+    mock_config(content_risk_rate=0.0)
+    before = mock_requests()
+    resp = client.post(f"/api/tasks/{task_id}/retry")
+    assert resp.status_code == 200
+    assert resp.json() == {"task_id": task_id, "status": "processing", "retry_articles": {"read": [1, 2, 3, 4]}}
+    status = wait_status(client, task_id)
+    assert status["status"] == "completed" and status["failed_count"] == 0
+    assert mock_requests() - before == 4
+    assert client.get(f"/api/download/read/{task_id}", params={"format": "json"}).json()["articles"][0]["title"]
+
+    # 已全部成功：重试不再调用 DeepSeek
+    before = mock_requests()
+    resp = client.post(f"/api/tasks/{task_id}/retry")
+    assert resp.json() == {"task_id": task_id, "status": "completed", "retry_articles": {}}
+    assert mock_requests() == before
+
+
+def test_retry_unknown_task(client):
+    assert client.post("/api/tasks/00000000-0000-0000-0000-000000000000/retry").status_code == 404
+
+
+def test_retry_goes_through_admission(client, make_epub, mock_config, mock_requests, monkeypatch):
+    mock_config(content_risk_rate=1.0)
+    task_id = upload(client, "/api/read-me", make_epub(3)).json()["task_id"]
+    assert wait_status(client, task_id)["status"] == "error"
+    mock_config(content_risk_rate=0.0)
+
+    # 其他任务占满准入容量、等待队列也满：重试与新上传一样返回 429
+    admission = main._admission
+    monkeypatch.setitem(admission._admitted, "busy-task", TaskLoad(articles=10**6))
+    monkeypatch.setattr(admission, "max_waiting", 0)
+    before = mock_requests()
+    resp = client.post(f"/api/tasks/{task_id}/retry")
+    assert resp.status_code == 429 and int(resp.headers["retry-after"]) >= 5
+    assert client.get(f"/api/analyze-status/{task_id}").json()["status"] == "error"
+
+    # 队列有空位：排队，容量空出后自动开始
+    monkeypatch.setattr(admission, "max_waiting", 1)
+    resp = client.post(f"/api/tasks/{task_id}/retry")
+    body = resp.json()
+    assert resp.status_code == 200 and body["status"] == "queued"
+    assert body["queue_position"] == 1 and body["eta_seconds"] >= 0
+    assert body["retry_articles"] == {"read": [1, 2, 3]}
+    assert client.get(f"/api/analyze-status/{task_id}").json()["status"] == "queued"
+    assert client.post(f"/api/tasks/{task_id}/retry").status_code == 409
+    assert mock_requests() == before
+
+    client.portal.call(admission.release, "busy-task")
+    assert wait_status(client, task_id)["status"] == "completed"
+    assert mock_requests() - before == 3
@@ -0,0 +1,47 @@
+import json
+
+from conftest import upload
+
+
+def _records(resp) -> list:
+    return [json.loads(line) for line in resp.text.splitlines() if line]
+
+
+def test_stream_epub_records(client, make_epub, mock_requests):
+    resp = upload(client, "/api/stream-epub", make_epub(3), params={"mode": "read"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    records = _records(resp)
+    head, articles, end = records[0], records[1:-1], records[-1]
+    assert head == {"type": "task", "task_id": resp.headers["x-task-id"], "mode": "read", "kinds": ["read"], "total": 3}
+    assert sorted(r["index"] for r in articles) == [1, 2, 3]
+    assert all(r["type"] == "article" and r["kind"] == "read" and r["error"] is None for r in articles)
+    assert all(r["text"] for r in articles)
+    assert end == {"type": "end", "task_id": head["task_id"], "status": "completed", "articles": 3}
+    assert mock_requests() == 3
+
+    # 任务结束后从任务日志重放同样的结果，不再调用 DeepSeek
+    task_id = head["task_id"]
+    replay = _records(client.get(f"/api/tasks/{task_id}/results"))
+    assert [r["index"] for r in replay[:-1]] == [1, 2, 3]
+    assert [r["text"] for r in replay[:-1]] == [r["text"] for r in sorted(articles, key=lambda r: r["index"])]
+    assert replay[-1]["type"] == "end" and replay[-1]["articles"] == 3
+    assert _records(client.get(f"/api/tasks/{task_id}/results", params={"kind": "listen"})) == [
+        {"type": "end", "task_id": task_id, "status": "completed", "articles": 0}
+    ]
+    assert mock_requests() == 3
+
+
+def test_stream_epub_point_mode(client, make_epub):
+    records = _records(upload(client, "/api/stream-epub", make_epub(2), params={"mode": "point"}))
+    assert records[0]["kinds"] == ["listen", "read"]
+    pairs = sorted((r["kind"], r["index"]) for r in records[1:-1])
+    assert pairs == [("listen", 1), ("listen", 2), ("read", 1), ("read", 2)]
+    assert records[-1]["status"] == "completed" and records[-1]["articles"] == 4
+
+
+def test_stream_validation(client, make_epub):
+    assert upload(client, "/api/stream-epub", make_epub(3), params={"mode": "analyze"}).status_code == 400
+    assert upload(client, "/api/stream-epub", b"x", name="notes.txt").status_code == 400
+    assert client.get("/api/tasks/no-such-task/results").status_code == 404
+    assert client.get("/api/tasks/no-such-task/results", params={"kind": "title"}).status_code == 400
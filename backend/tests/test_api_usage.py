@@ -0,0 +1,28 @@
+import main
+from conftest import upload, wait_status
+
+
+def test_usage_per_task(client, make_epub, mock_deepseek, mock_requests, monkeypatch):
+    # 模拟服务返回中文标题；强制走标题翻译，确认标题用量单独记账且不计入篇数
+    monkeypatch.setattr(main, "_is_title_mostly_english", lambda title: True)
+    stats = mock_deepseek.state.stats
+    prompt_before = stats.prompt_tokens
+
+    task_id = upload(client, "/api/listen-me", make_epub(3)).json()["task_id"]
+    status = wait_status(client, task_id)
+    assert status["status"] == "completed"
+    assert mock_requests() == 6
+    assert status["usage"]["requests"] == 6
+
+    body = client.get("/api/usage", params={"task_id": task_id}).json()
+    assert body["enabled"] is True
+    groups = {g["kind"]: g for g in body["groups"]}
+    assert groups["listen"]["articles"] == 3 and groups["listen"]["requests"] == 3
+    assert groups["title"]["articles"] == 0 and groups["title"]["requests"] == 3
+    totals = body["totals"]
+    assert totals["articles"] == 3
+    assert totals["prompt_tokens"] == stats.prompt_tokens - prompt_before
+    assert totals["total_tokens"] == totals["prompt_tokens"] + totals["completion_tokens"]
+    assert body["stable_prefix_chars"]
+
+    assert client.get("/api/usage", params={"task_id": "no-such-task"}).json()["totals"]["requests"] == 0
@@ -0,0 +1,95 @@
+import random
+import time
+
+from article_index import ArticleIndex
+
+_WORDS = (
+    "economy inflation central bank rates growth trade tariffs market labour wages "
+    "productivity investment currency deficit budget policy election voters reform "
+    "energy climate technology chips firms profits shares bonds yields housing"
+).split()
+
+
+def _article(seed: int, words: int = 400) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(_WORDS) for _ in range(words)) + "."
+
+
+def _edit(text: str, n: int) -> str:
+    words = text.split(" ")
+    for i in range(n):
+        words[10 + i * 37] = "edited"
+    return " ".join(words)
+
+
+def test_exact_hit_ignores_formatting(tmp_path):
+    index = ArticleIndex(str(tmp_path / "index.sqlite3"), threshold=0.9)
+    text = _article(1)
+    index.add(text, "listen:v1", "口播稿")
+    hit = index.lookup("  " + text.upper().replace(" ", "\n"), "listen:v1")
+    assert hit is not None and hit.similarity == 1.0 and hit.output == "口播稿"
+
+
+def test_near_duplicate_hits_only_above_threshold(tmp_path):
+    index = ArticleIndex(str(tmp_path / "index.sqlite3"), threshold=0.9)
+    original = _article(2)
+    index.add(original, "read:v1", "译文", tokens=123)
+
+    near = index.lookup(_edit(original, 1), "read:v1")
+    assert near is not None and 0.9 <= near.similarity < 1.0
+    assert near.output == "译文" and near.tokens == 123
+
+    # 改动过多（约四分之一的 5 词片段变化）低于阈值
+    assert index.lookup(_edit(original, 10), "read:v1") is None
+    assert index.lookup(_article(3), "read:v1") is None
+
+
+def test_threshold_one_requires_exact_match(tmp_path):
+    index = ArticleIndex(str(tmp_path / "index.sqlite3"), threshold=1.0)
+    original = _article(4)
+    index.add(original, "read:v1", "译文")
+    assert index.lookup(original, "read:v1") is not None
+    assert index.lookup(_edit(original, 1), "read:v1") is None
+
+
+def test_kinds_are_separate(tmp_path):
+    # kind 含调用方式与 prompt 版本：prompt 改动后旧输出不再命中
+    index = ArticleIndex(str(tmp_path / "index.sqlite3"), threshold=0.9)
+    text = _article(5)
+    index.add(text, "listen:listen:aaaa", "旧口播稿")
+    assert index.lookup(text, "listen:listen:bbbb") is None
+    assert index.lookup(text, "read:translate:aaaa") is None
+    assert index.stats() == {"listen:listen:aaaa": 1}
+
+
+def test_short_articles_are_not_indexed(tmp_path):
+    index = ArticleIndex(str(tmp_path / "index.sqlite3"), threshold=0.9)
+    short = _article(6, words=20)
+    index.add(short, "listen:v1", "口播稿")
+    assert index.lookup(short, "listen:v1") is None
+    assert index.stats() == {}
+
+
+def test_max_rows_prunes_oldest_on_insert(tmp_path):
+    index = ArticleIndex(str(tmp_path / "index.sqlite3"), threshold=0.9, max_rows=2)
+    texts = [_article(10 + i) for i in range(3)]
+    for i, text in enumerate(texts):
+        index.add(text, "read:v1", f"译文{i}")
+    assert index.stats() == {"read:v1": 2}
+    assert index.lookup(texts[0], "read:v1") is None
+    assert index.lookup(texts[2], "read:v1").output == "译文2"
+    # 被删条目的 LSH 分桶一并删除，近似匹配不会指向不存在的条目
+    assert index.lookup(_edit(texts[0], 1), "read:v1") is None
+
+
+def test_max_age_prunes_expired_on_insert(tmp_path, monkeypatch):
+    index = ArticleIndex(str(tmp_path / "index.sqlite3"), threshold=0.9, max_age_days=30, max_rows=0)
+    old, new = _article(20), _article(21)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now - 31 * 86400)
+    index.add(old, "listen:v1", "旧口播稿")
+    monkeypatch.setattr(time, "time", lambda: now)
+    assert index.lookup(old, "listen:v1") is not None  # 只在登记时清理
+    index.add(new, "listen:v1", "新口播稿")
+    assert index.lookup(old, "listen:v1") is None
+    assert index.stats() == {"listen:v1": 1}
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+from document_cache import DocumentCache
+
+
+def test_lru_eviction_by_bytes():
+    cache = DocumentCache(100)
+    cache.put(("a", "listen"), b"x" * 40)
+    cache.put(("b", "listen"), b"x" * 40)
+    assert cache.get(("a", "listen")) is not None  # a 变为最近使用
+    cache.put(("c", "listen"), b"x" * 40)
+    assert cache.get(("b", "listen")) is None
+    assert cache.get(("a", "listen")) is not None and cache.get(("c", "listen")) is not None
+    assert cache.bytes == 80 and cache.evictions == 1
+
+
+def test_oversized_document_is_not_cached():
+    cache = DocumentCache(10)
+    cache.put(("a", "read"), b"x" * 11)
+    assert cache.get(("a", "read")) is None and cache.bytes == 0
+
+
+def test_discard_task():
+    cache = DocumentCache(100)
+    cache.put(("a", "listen", "docx"), b"1")
+    cache.put(("a", "read", "docx"), b"2")
+    cache.put(("b", "read", "docx"), b"3")
+    cache.discard_task("a")
+    assert cache.snapshot()["documents"] == 1 and cache.bytes == 1
+
+
+def test_concurrent_requests_share_one_build():
+    cache = DocumentCache(100)
+    builds = []
+    gate = threading.Event()
+
+    def build():
+        builds.append(1)
+        gate.wait(5)
+        return b"doc"
+
+    async def run():
+        first = asyncio.ensure_future(cache.get_or_build(("a", "read"), build))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(cache.get_or_build(("a", "read"), build))
+        await asyncio.sleep(0.01)
+        gate.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(run()) == [b"doc", b"doc"]
+    assert builds == [1]
+    assert cache.get(("a", "read")) == b"doc"
+
+
+def test_cancelled_first_requester_does_not_fail_others():
+    cache = DocumentCache(100)
+    gate = threading.Event()
+
+    def build():
+        gate.wait(5)
+        return b"doc"
+
+    async def run():
+        first = asyncio.ensure_future(cache.get_or_build(("a", "read"), build))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(cache.get_or_build(("a", "read"), build))
+        await asyncio.sleep(0.01)
+        first.cancel()  # 发起生成的客户端断开
+        await asyncio.sleep(0.01)
+        gate.set()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == (b"doc", True)
+    assert cache.get(("a", "read")) == b"doc"
+
+
+def test_failed_build_is_not_cached():
+    cache = DocumentCache(100)
+
+    def build():
+        raise ValueError("渲染失败")
+
+    async def run():
+        try:
+            await cache.get_or_build(("a", "read"), build)
+        except ValueError:
+            return cache.snapshot()
+        raise AssertionError("build 的异常应传给调用方")
+
+    snap = asyncio.run(run())
+    assert snap["documents"] == 0 and snap["building"] == 0
@@ -0,0 +1,33 @@
+import pytest
+
+from deepseek_client import DeepSeekError, _split_dual_output
+
+
+def test_split_plain_markers():
+    text = "【译文】\n标题\n\n第一段译文。\n\n【口播稿】\n大家好，今天聊一聊……"
+    assert _split_dual_output(text) == ("标题\n\n第一段译文。", "大家好，今天聊一聊……")
+
+
+def test_split_markdown_decorated_markers():
+    text = "## 【译文】\n标题\n正文\n\n**【口播稿】**\n口播正文"
+    assert _split_dual_output(text) == ("标题\n正文", "口播正文")
+
+
+def test_translation_marker_is_optional():
+    assert _split_dual_output("标题\n正文\n【口播稿】\n口播") == ("标题\n正文", "口播")
+
+
+def test_marker_inside_a_line_does_not_split():
+    # 正文里提到“【口播稿】”不算分隔标记
+    with pytest.raises(DeepSeekError):
+        _split_dual_output("【译文】\n下面是【口播稿】的说明\n正文")
+
+
+@pytest.mark.parametrize("text", [
+    "【译文】\n只有译文",
+    "【译文】\n\n【口播稿】\n口播",
+    "【译文】\n译文\n【口播稿】\n   ",
+])
+def test_missing_or_empty_part_raises(text):
+    with pytest.raises(DeepSeekError):
+        _split_dual_output(text)
@@ -0,0 +1,90 @@
+import asyncio
+
+import hedging
+from hedging import HedgeBudget, LatencyTracker, hedged_call
+
+
+def test_budget_limit():
+    assert HedgeBudget(100, ratio=0.1).limit == 10
+    assert HedgeBudget(3, ratio=0.1).limit == 1  # 至少 1 篇
+    assert HedgeBudget(100, ratio=0).limit == 0
+    budget = HedgeBudget(10, ratio=0.2)
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    assert budget.used == 2
+
+
+def test_tracker_delay_scales_with_length(monkeypatch):
+    monkeypatch.setattr(hedging, "DEEPSEEK_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(hedging, "DEEPSEEK_HEDGE_MIN_DELAY", 0.0)
+    tracker = LatencyTracker(window=100)
+    assert tracker.delay("read", 4000) is None  # 样本不足
+    for seconds in (1, 1, 1, 1, 10):
+        tracker.observe("read", 1000, seconds)
+    assert tracker.delay("read", 1000, percentile=50) == 1
+    assert tracker.delay("read", 1000, percentile=100) == 10
+    assert tracker.delay("read", 4000, percentile=50) == 4
+    assert tracker.delay("read", 100, percentile=50) == 1  # 短文按 1000 字符计
+
+
+def _primed_tracker(monkeypatch, delay: float) -> None:
+    tracker = LatencyTracker(window=10)
+    monkeypatch.setattr(hedging, "DEEPSEEK_HEDGE_MIN_SAMPLES", 1)
+    monkeypatch.setattr(hedging, "DEEPSEEK_HEDGE_MIN_DELAY", 0.0)
+    tracker.observe("read", 1000, delay)
+    monkeypatch.setattr(hedging, "_tracker", tracker)
+
+
+def _slow_then_fast(calls: list):
+    async def call():
+        calls.append(len(calls))
+        await asyncio.sleep(1.0 if len(calls) == 1 else 0.01)
+        return f"result-{len(calls)}"
+    return call
+
+
+def test_hedge_wins_and_releases_reservation(monkeypatch):
+    _primed_tracker(monkeypatch, 0.05)
+    reserved, released = [], []
+
+    async def reserve():
+        reserved.append(1)
+        return lambda: released.append(1)
+
+    async def run():
+        calls: list = []
+        budget = HedgeBudget(10, ratio=0.1, reserve=reserve)
+        result = await hedged_call(_slow_then_fast(calls), "read", 1000, budget)
+        return result, calls, budget.used
+
+    result, calls, used = asyncio.run(run())
+    assert result == "result-2" and len(calls) == 2 and used == 1
+    assert reserved == released == [1]
+
+
+def test_no_hedge_without_capacity(monkeypatch):
+    _primed_tracker(monkeypatch, 0.05)
+
+    async def reserve():
+        return None  # 没有空闲槽位
+
+    async def run():
+        calls: list = []
+        budget = HedgeBudget(10, ratio=0.1, reserve=reserve)
+        result = await hedged_call(_slow_then_fast(calls), "read", 1000, budget)
+        return result, calls, budget.used
+
+    result, calls, used = asyncio.run(run())
+    assert result == "result-1" and len(calls) == 1 and used == 0
+
+
+def test_no_hedge_when_budget_spent(monkeypatch):
+    _primed_tracker(monkeypatch, 0.05)
+
+    async def run():
+        calls: list = []
+        budget = HedgeBudget(10, ratio=0.1)
+        budget.try_spend()
+        await hedged_call(_slow_then_fast(calls), "read", 1000, budget)
+        return calls
+
+    assert len(asyncio.run(run())) == 1
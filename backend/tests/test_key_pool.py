@@ -0,0 +1,34 @@
+from key_pool import ApiKeyPool
+
+
+def _pools(tmp_path, **kwargs):
+    # 同一目录下的两个池模拟同一主机上的两个 worker
+    return [ApiKeyPool(["sk-key-a", "sk-key-b"], directory=str(tmp_path), **kwargs) for _ in range(2)]
+
+
+def test_token_buckets_shared_across_workers(tmp_path):
+    first, second = _pools(tmp_path, rate_limit=0.001, burst=1)
+    assert first.shared and second.shared
+    assert first._try_acquire()[0] is not None
+    assert first._try_acquire()[0] is not None
+    key, wait = second._try_acquire()
+    assert key is None and wait > 0  # 两个 Key 的令牌已被另一个 worker 用掉
+
+
+def test_cooldown_and_quota_shared_across_workers(tmp_path):
+    first, second = _pools(tmp_path, rate_limit=0, daily_tokens=100)
+    for _ in range(3):
+        first.release("sk-key-a", 429)
+    assert not second.has_alternative("sk-key-b")  # sk-key-a 已被摘除
+    assert [s["healthy"] for s in second.snapshot()] == [False, True]
+
+    second.release("sk-key-b", 200, tokens_used=100)
+    key, wait = first._try_acquire()  # sk-key-b 当日配额已由另一个 worker 用尽，只能等 sk-key-a 冷却
+    assert key is None and 0 < wait <= 60
+
+
+def test_unshared_pool_keeps_state_in_process(tmp_path):
+    first, second = _pools(tmp_path, rate_limit=0.001, burst=1, shared=False)
+    assert first._try_acquire()[0] is not None
+    assert second._try_acquire()[0] is not None
+    assert not (tmp_path / "keys.state").exists()
@@ -0,0 +1,84 @@
+import asyncio
+
+from scheduler import FairScheduler
+
+
+def _grant_order(scheduler: FairScheduler, waiters: list[tuple[str, bool]]) -> list[str]:
+    """占满唯一槽位后按顺序排入 waiters，再释放槽位，返回各等待者拿到槽位的顺序。"""
+    order: list[str] = []
+
+    async def wait(name: str, task_id: str, priority: bool) -> None:
+        async with scheduler.slot(task_id, priority):
+            order.append(name)
+
+    async def run() -> None:
+        await scheduler.acquire("holder")
+        tasks = []
+        for name, priority in waiters:
+            tasks.append(asyncio.ensure_future(wait(name, name[0], priority)))
+            await asyncio.sleep(0)
+        scheduler.release("holder")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    return order
+
+
+def test_round_robin_between_tasks():
+    # a 先排了三篇，b 后排一篇：b 不必等 a 全部完成
+    order = _grant_order(FairScheduler(1), [("a1", False), ("a2", False), ("a3", False), ("b1", False)])
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_priority_lane_first():
+    order = _grant_order(FairScheduler(1), [("a1", False), ("b1", False), ("p1", True)])
+    assert order == ["p1", "a1", "b1"]
+
+
+def test_try_acquire_does_not_jump_the_queue():
+    async def run() -> None:
+        scheduler = FairScheduler(1)
+        assert scheduler.try_acquire("a")
+        assert not scheduler.try_acquire("b")
+        waiter = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        scheduler.release("a")
+        # 槽位已分给排队的 b
+        assert not scheduler.try_acquire("c")
+        await waiter
+        scheduler.release("b")
+        assert scheduler.try_acquire("c")
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def run() -> None:
+        scheduler = FairScheduler(1)
+        await scheduler.acquire("a")
+        waiter = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        assert scheduler.snapshot()["queued"] == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.snapshot()["queued"] == 0
+        scheduler.release("a")
+        assert scheduler.snapshot()["in_use"] == 0
+
+    asyncio.run(run())
+
+
+def test_capacity_fn_is_read_on_each_dispatch():
+    async def run() -> None:
+        limit = [2]
+        scheduler = FairScheduler(10, capacity_fn=lambda: limit[0])
+        await scheduler.acquire("a")
+        await scheduler.acquire("a")
+        limit[0] = 1
+        scheduler.release("a")
+        # 上限下调后，在途 1 篇已占满
+        assert not scheduler.try_acquire("b")
+        scheduler.release("a")
+        assert scheduler.try_acquire("b")
+
+    asyncio.run(run())
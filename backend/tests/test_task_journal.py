@@ -0,0 +1,81 @@
+import pytest
+
+import task_journal
+from epub_processing import Article
+
+
+@pytest.fixture
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_journal, "TASK_JOURNAL_DIR", str(tmp_path))
+    monkeypatch.setattr(task_journal, "TASK_JOURNAL_FSYNC", False)
+    return tmp_path
+
+
+def _new_task(journal_dir, task_id: str = "task-0001") -> str:
+    epub = journal_dir / "upload.epub"
+    epub.write_bytes(b"epub")
+    task_journal.create_task_journal(task_id, "point", "issue.epub", str(epub))
+    return task_id
+
+
+def test_replay_results_errors_and_status(journal_dir):
+    task_id = _new_task(journal_dir)
+    assert (journal_dir / f"{task_id}.epub").exists()
+    task_journal.record_articles(task_id, [Article(title="A", content="a"), Article(title="B", content="b")])
+    assert not (journal_dir / f"{task_id}.epub").exists()
+    task_journal.record_result(task_id, "listen", 1, "口播稿一")
+    task_journal.record_error(task_id, "read", 2, "超时")
+    task_journal.record_error(task_id, "listen", 1, "迟到的失败不覆盖已有结果")
+
+    state = task_journal.load_task_journal(task_id)
+    assert state.mode == "point" and state.file_name == "issue.epub"
+    assert [a.title for a in state.articles] == ["A", "B"]
+    assert state.results == {"listen": {1: "口播稿一"}}
+    assert state.errors == {"read": {2: "超时"}}
+    assert not state.finished
+
+    # 重试成功后清掉该篇的失败记录
+    task_journal.record_result(task_id, "read", 2, "译文二")
+    task_journal.record_status(task_id, "completed")
+    state = task_journal.load_task_journal(task_id)
+    assert state.errors == {"read": {}}
+    assert state.finished
+    assert task_id not in task_journal.list_unfinished_tasks()
+
+
+def test_truncated_last_line_is_ignored(journal_dir):
+    task_id = _new_task(journal_dir)
+    task_journal.record_result(task_id, "listen", 1, "完整")
+    # 进程在写第二条记录时被杀：只留下半行
+    with open(journal_dir / f"{task_id}.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"t": "result", "kind": "listen", "index": 2, "te')
+
+    state = task_journal.load_task_journal(task_id)
+    assert state.results == {"listen": {1: "完整"}}
+    assert task_id in task_journal.list_unfinished_tasks()
+
+    # 续跑进程追加的第一条记录另起一行，不与半行粘在一起
+    task_journal.record_result(task_id, "listen", 2, "续跑结果")
+    state = task_journal.load_task_journal(task_id)
+    assert state.results["listen"] == {1: "完整", 2: "续跑结果"}
+
+
+def test_missing_or_invalid_journal(journal_dir):
+    assert task_journal.load_task_journal("no-such-task") is None
+    assert task_journal.load_task_journal("../etc/passwd") is None
+
+
+def test_claim_is_exclusive_until_released(journal_dir):
+    task_id = _new_task(journal_dir)
+    assert task_journal.claim_task(task_id)
+    assert not task_journal.claim_task(task_id)
+    task_journal.release_task(task_id)
+    assert task_journal.claim_task(task_id)
+    task_journal.release_task(task_id)
+
+
+def test_stale_claim_is_taken_over(journal_dir):
+    task_id = _new_task(journal_dir)
+    (journal_dir / f"{task_id}.lock").write_text("some-old-container 12345", encoding="utf-8")
+    assert task_journal.claim_task(task_id)
+    task_journal.release_task(task_id)
@@ -0,0 +1,21 @@
+from usage_ledger import UsageLedger
+
+
+def test_summary_counts_distinct_articles(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage.sqlite3"))
+    usage = {"requests": 1, "prompt_tokens": 100, "completion_tokens": 50}
+    # 第 1 篇失败后重试（两行），第 2 篇一次成功；两篇标题各翻译一次
+    for kind, index in (("listen", 1), ("listen", 1), ("listen", 2), ("title", 1), ("title", 2)):
+        ledger.record("task-a", "listen", kind, index, usage, 1.0)
+    ledger.record("task-b", "listen", "listen", 1, usage, 1.0)
+
+    summary = ledger.summary()
+    groups = {g["kind"]: g for g in summary["groups"]}
+    assert groups["listen"]["articles"] == 3 and groups["listen"]["requests"] == 4
+    assert groups["listen"]["tasks"] == 2
+    assert groups["title"]["articles"] == 0 and groups["title"]["requests"] == 2
+    assert summary["totals"]["articles"] == 3
+    assert summary["totals"]["total_tokens"] == 6 * 150
+
+    only_a = ledger.summary(task_id="task-a")
+    assert only_a["totals"]["articles"] == 2
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+# 结构化追踪：热路径只往内存队列追加一条记录，由后台线程批量写入文件（每行一个 JSON）
+TRACE_FILE = os.getenv(
+    "TRACE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "last_error.txt")
+)
+# 文件超过该大小后轮转为 <TRACE_FILE>.1（只保留一份）
+TRACE_FILE_MAX_MB = float(os.getenv("TRACE_FILE_MAX_MB", "5"))
+# 待写入队列上限：写盘跟不上时丢弃最旧的记录（计入 dropped），内存不会无限增长
+TRACE_BUFFER_MAX = int(os.getenv("TRACE_BUFFER_MAX", "10000"))
+# 每个任务在内存中保留的最近事件数，以及保留事件的任务数（LRU）
+TRACE_TASK_EVENTS = int(os.getenv("TRACE_TASK_EVENTS", "500"))
+TRACE_TASKS_MAX = int(os.getenv("TRACE_TASKS_MAX", "200"))
+
+_FLUSH_INTERVAL_SECONDS = 0.5
+
+
+class Tracer:
+    """缓冲的结构化追踪器。
+
+    event()/span() 可在事件循环或执行器线程中调用，只做内存操作；后台守护线程每
+    _FLUSH_INTERVAL_SECONDS 秒把积压记录一次性追加到文件。带 task_id 的事件另存一份到
+    按任务的环形缓冲，供 /api/tasks/{task_id}/trace 查询。"""
+
+    def __init__(
+        self,
+        path: str = TRACE_FILE,
+        buffer_max: int = TRACE_BUFFER_MAX,
+        task_events: int = TRACE_TASK_EVENTS,
+        tasks_max: int = TRACE_TASKS_MAX,
+    ):
+        self.path = path
+        self._pending: Deque[Dict[str, Any]] = deque(maxlen=max(1, buffer_max))
+        self._task_events = task_events
+        self._tasks_max = tasks_max
+        self._by_task: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self.dropped = 0
+        self.written = 0
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+            self._writer.start()
+
+    def event(self, name: str, task_id: Optional[str] = None, article: Optional[int] = None, **fields: Any) -> None:
+        record: Dict[str, Any] = {"ts": round(time.time(), 3), "pid": os.getpid(), "event": name}
+        if task_id:
+            record["task_id"] = task_id
+        if article is not None:
+            record["article"] = article
+        record.update(fields)
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(record)
+            if task_id:
+                events = self._by_task.get(task_id)
+                if events is None:
+                    events = self._by_task[task_id] = deque(maxlen=self._task_events)
+                    while len(self._by_task) > self._tasks_max:
+                        self._by_task.popitem(last=False)
+                else:
+                    self._by_task.move_to_end(task_id)
+                events.append(record)
+        self._ensure_writer()
+
+    @contextmanager
+    def span(self, name: str, task_id: Optional[str] = None, article: Optional[int] = None, **fields: Any) -> Iterator[None]:
+        """记录一段操作的起止：结束时写一条带 duration_ms 的事件（异常时附 error）。"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.event(name, task_id, article, duration_ms=round((time.perf_counter() - start) * 1000, 1),
+                       error=f"{type(e).__name__}: {e}", **fields)
+            raise
+        self.event(name, task_id, article, duration_ms=round((time.perf_counter() - start) * 1000, 1), **fields)
+
+    def task_events(self, task_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._by_task.get(task_id, ()))
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch)
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > TRACE_FILE_MAX_MB * 1024 * 1024:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            self.written += len(batch)
+        except OSError:
+            self.dropped += len(batch)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(_FLUSH_INTERVAL_SECONDS)
+            self._wake.clear()
+            self._write(self._drain())
+
+    def flush(self) -> None:
+        """同步写出所有积压记录（进程退出前调用）。"""
+        self._write(self._drain())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "written": self.written,
+                "dropped": self.dropped,
+                "tasks": len(self._by_task),
+            }
+
+
+tracer = Tracer()
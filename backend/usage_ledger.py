@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# DeepSeek token 用量台账：每篇文章一行，按任务 / 模式 / 日期汇总，跨 worker、跨重启共享
+USAGE_TRACKING_ENABLED = os.getenv("USAGE_TRACKING_ENABLED", "1").strip().lower() in ("1", "true", "yes")
+USAGE_DB_PATH = os.getenv(
+    "USAGE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "usage.sqlite3"),
+)
+
+_TOKEN_COLUMNS = ("prompt_tokens", "completion_tokens", "prompt_cache_hit_tokens", "prompt_cache_miss_tokens")
+
+
+def _utc_day(ts: Optional[float] = None) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+def summarize_usage(row: dict) -> dict:
+    """补充派生指标：总 token、缓存命中率、输出 token/秒。"""
+    out = dict(row)
+    out["total_tokens"] = out.get("prompt_tokens", 0) + out.get("completion_tokens", 0)
+    prompt = out.get("prompt_cache_hit_tokens", 0) + out.get("prompt_cache_miss_tokens", 0)
+    out["cache_hit_rate"] = round(out.get("prompt_cache_hit_tokens", 0) / prompt, 4) if prompt else None
+    seconds = out.get("seconds", 0.0)
+    out["completion_tokens_per_sec"] = round(out.get("completion_tokens", 0) / seconds, 2) if seconds else None
+    out["seconds"] = round(seconds, 3)
+    return out
+
+
+class UsageLedger:
+    """SQLite 存储的用量台账（WAL，每次调用单独建连接，可跨线程、跨 worker 使用）。"""
+
+    def __init__(self, path: str = USAGE_DB_PATH):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(
+                        """
+                        CREATE TABLE IF NOT EXISTS usage (
+                            id INTEGER PRIMARY KEY,
+                            day TEXT NOT NULL,
+                            task_id TEXT NOT NULL,
+                            mode TEXT NOT NULL,
+                            kind TEXT NOT NULL,
+                            article_index INTEGER NOT NULL,
+                            requests INTEGER NOT NULL DEFAULT 0,
+                            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                            completion_tokens INTEGER NOT NULL DEFAULT 0,
+                            prompt_cache_hit_tokens INTEGER NOT NULL DEFAULT 0,
+                            prompt_cache_miss_tokens INTEGER NOT NULL DEFAULT 0,
+                            seconds REAL NOT NULL DEFAULT 0,
+                            created_at REAL NOT NULL
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_usage_day ON usage(day);
+                        CREATE INDEX IF NOT EXISTS idx_usage_task ON usage(task_id);
+                        """
+                    )
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def record(self, task_id: str, mode: str, kind: str, article_index: int, usage: dict, seconds: float) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO usage (day, task_id, mode, kind, article_index, requests, prompt_tokens, "
+                    "completion_tokens, prompt_cache_hit_tokens, prompt_cache_miss_tokens, seconds, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        _utc_day(now), task_id, mode, kind, article_index, usage.get("requests", 0),
+                        *(usage.get(c, 0) for c in _TOKEN_COLUMNS), seconds, now,
+                    ),
+                )
+        finally:
+            conn.close()
+
+    def summary(self, day: Optional[str] = None, task_id: Optional[str] = None) -> dict:
+        """按 日期 × 模式 × 种类 汇总；可按日期或任务过滤。"""
+        where, args = [], []
+        if day:
+            where.append("day = ?")
+            args.append(day)
+        if task_id:
+            where.append("task_id = ?")
+            args.append(task_id)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        sums = ", ".join(f"SUM({c})" for c in _TOKEN_COLUMNS)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                # 同一篇文章重试会有多行，标题翻译不算文章：按 任务 + 序号 去重计篇数
+                f"SELECT day, mode, kind, "
+                f"COUNT(DISTINCT CASE WHEN kind != 'title' THEN task_id || ':' || article_index END), "
+                f"SUM(requests), {sums}, SUM(seconds), COUNT(DISTINCT task_id) "
+                f"FROM usage {clause} GROUP BY day, mode, kind ORDER BY day DESC, mode, kind",
+                args,
+            ).fetchall()
+        finally:
+            conn.close()
+        groups = []
+        totals = {"articles": 0, "requests": 0, "seconds": 0.0, **{c: 0 for c in _TOKEN_COLUMNS}}
+        for day_, mode, kind, articles, requests, *rest in rows:
+            tokens, seconds, tasks = rest[:len(_TOKEN_COLUMNS)], rest[-2], rest[-1]
+            row = {
+                "day": day_, "mode": mode, "kind": kind, "tasks": tasks,
+                "articles": articles, "requests": requests or 0, "seconds": seconds or 0.0,
+                **{c: v or 0 for c, v in zip(_TOKEN_COLUMNS, tokens)},
+            }
+            groups.append(summarize_usage(row))
+            for k in totals:
+                totals[k] += row[k]
+        return {"groups": groups, "totals": summarize_usage(totals)}
+
+
+_ledger: Optional[UsageLedger] = None
+
+
+def get_usage_ledger() -> Optional[UsageLedger]:
+    """返回全局台账；关闭用量统计时返回 None。"""
+    global _ledger
+    if not USAGE_TRACKING_ENABLED:
+        return None
+    if _ledger is None:
+        _ledger = UsageLedger()
+    return _ledger
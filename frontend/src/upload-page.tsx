@@ -19,6 +19,14 @@ function getEstimatedTotalMs(fileSize: number): number {
   return 360_000;
 }
 
+type QueueInfo = { position: number | null; etaSeconds: number | null };
+
+function formatEta(seconds: number | null): string {
+  if (seconds === null) return "稍后";
+  if (seconds < 60) return "不到 1 分钟后";
+  return `约 ${Math.ceil(seconds / 60)} 分钟后`;
+}
+
 export const UploadPage: React.FC = () => {
   const [file, setFile] = useState<File | null>(null);
   const [state, setState] = useState<UploadState>("idle");
@@ -30,10 +38,27 @@ export const UploadPage: React.FC = () => {
   const [progress, setProgress] = useState(0);
   const [startTime, setStartTime] = useState<number | null>(null);
   const [estimatedTotalMs, setEstimatedTotalMs] = useState(60_000);
+  // 后端容量已满时任务先排队（status=queued），显示排队位置与预计开始时间
+  const [queueInfo, setQueueInfo] = useState<QueueInfo | null>(null);
+  const queuedRef = useRef(false);
   const pollIntervalRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  // 仍在处理中的任务：换文件或点「取消」时通知后端取消，释放排队名额与 DeepSeek 并发。
+  // 关闭、刷新页面不取消：后台任务照常完成，结果在任务日志中保留
+  const activeTaskRef = useRef<string | null>(null);
+
+  const API_BASE = (import.meta.env as any).VITE_API_BASE_URL || "";
+
+  const cancelActiveTask = () => {
+    const id = activeTaskRef.current;
+    if (!id) return;
+    activeTaskRef.current = null;
+    const url = API_BASE ? `${API_BASE}/api/tasks/${id}` : `/api/tasks/${id}`;
+    fetch(url, { method: "DELETE", keepalive: true }).catch(() => {});
+  };
 
   const handleFileChange: React.ChangeEventHandler<HTMLInputElement> = (event) => {
     const selected = event.target.files?.[0] ?? null;
+    cancelActiveTask();
     setFile(selected);
     setErrorMessage(null);
     setState("idle");
@@ -42,6 +67,8 @@ export const UploadPage: React.FC = () => {
     setPendingAction(null);
     setProgress(0);
     setStartTime(null);
+    setQueueInfo(null);
+    queuedRef.current = false;
     if (pollIntervalRef.current) {
       clearInterval(pollIntervalRef.current);
       pollIntervalRef.current = null;
@@ -57,7 +84,7 @@ export const UploadPage: React.FC = () => {
   }, []);
 
   useEffect(() => {
-    if (state !== "uploading" || startTime === null) return;
+    if (state !== "uploading" || startTime === null || queueInfo) return;
     const interval = setInterval(() => {
       const elapsed = Date.now() - startTime;
       const ratio = Math.min(1, elapsed / estimatedTotalMs);
@@ -65,9 +92,7 @@ export const UploadPage: React.FC = () => {
       setProgress((prev) => Math.max(prev, estimatedProgress));
     }, 100);
     return () => clearInterval(interval);
-  }, [state, startTime, estimatedTotalMs]);
-
-  const API_BASE = (import.meta.env as any).VITE_API_BASE_URL || "";
+  }, [state, startTime, estimatedTotalMs, queueInfo]);
 
   const pollStatus = (id: string) => {
     if (pollIntervalRef.current) {
@@ -79,6 +104,21 @@ export const UploadPage: React.FC = () => {
         const url = API_BASE ? `${API_BASE}/api/analyze-status/${id}` : `/api/analyze-status/${id}`;
         const res = await fetch(url);
         const statusData = await res.json();
+        if (statusData.status !== "processing" && statusData.status !== "building_docx" && statusData.status !== "queued") {
+          activeTaskRef.current = null;
+        }
+        if (statusData.status === "queued") {
+          queuedRef.current = true;
+          setQueueInfo({
+            position: statusData.queue_position ?? null,
+            etaSeconds: statusData.eta_seconds ?? null,
+          });
+        } else if (queuedRef.current) {
+          // 离开队列：从实际开始处理的时刻重新估算进度
+          queuedRef.current = false;
+          setQueueInfo(null);
+          setStartTime(Date.now());
+        }
         if (statusData.status === "processing" || statusData.status === "building_docx") {
           const total = statusData.total ?? 0;
           const current = statusData.current ?? 0;
@@ -112,6 +152,14 @@ export const UploadPage: React.FC = () => {
           setState("error");
           setErrorMessage("任务不存在或已过期");
           setPendingAction(null);
+        } else if (statusData.status === "cancelled") {
+          if (pollIntervalRef.current) {
+            clearInterval(pollIntervalRef.current);
+            pollIntervalRef.current = null;
+          }
+          setState("error");
+          setErrorMessage("任务已取消");
+          setPendingAction(null);
         }
       } catch {
         // Network error: ignore, next poll will retry
@@ -126,12 +174,15 @@ export const UploadPage: React.FC = () => {
       setErrorMessage("请先选择一个 EPUB 文件。");
       return;
     }
+    cancelActiveTask();
     setProgress(5);
     setState("uploading");
     setErrorMessage(null);
     setTaskId(null);
     setResultType(null);
     setPendingAction(type);
+    setQueueInfo(null);
+    queuedRef.current = false;
 
     try {
       const formData = new FormData();
@@ -153,6 +204,7 @@ export const UploadPage: React.FC = () => {
       }
 
       setTaskId(data.task_id);
+      activeTaskRef.current = data.task_id;
       setResultType(type);
       setStartTime(Date.now());
       setEstimatedTotalMs(getEstimatedTotalMs(file.size));
@@ -164,6 +216,19 @@ export const UploadPage: React.FC = () => {
     }
   };
 
+  const handleCancel = () => {
+    cancelActiveTask();
+    if (pollIntervalRef.current) {
+      clearInterval(pollIntervalRef.current);
+      pollIntervalRef.current = null;
+    }
+    setState("error");
+    setErrorMessage("任务已取消");
+    setPendingAction(null);
+    setQueueInfo(null);
+    queuedRef.current = false;
+  };
+
   const handleListenMe = () => runPipeline("listen-me", "listen");
   const handleReadMe = () => runPipeline("read-me", "read");
 
@@ -308,11 +373,17 @@ export const UploadPage: React.FC = () => {
                 你瞅啥，还不上传
               </div>
             )}
-            {state === "uploading" && (
+            {state === "uploading" && !queueInfo && (
               <div className="border-l-4 border-sky-300 pl-3 text-sky-600">
                 Don't push, Thank you 🍺
               </div>
             )}
+            {state === "uploading" && queueInfo && (
+              <div className="border-l-4 border-sky-300 pl-3 text-sky-600">
+                {queueInfo.position !== null ? `排队中：第 ${queueInfo.position} 位，` : "排队中，"}
+                预计{formatEta(queueInfo.etaSeconds)}开始处理
+              </div>
+            )}
             {state === "success" && (
               <div className="border-l-4 border-emerald-300 pl-3 text-emerald-600">
                 搞定，别崇拜姐，姐就是传说
@@ -346,10 +417,21 @@ export const UploadPage: React.FC = () => {
                 />
               </div>
               <div className="mt-1 text-[10px] text-right text-slate-400">
-                {state === "uploading" && "正在处理中…"}
+                {state === "uploading" && (queueInfo ? "排队中…" : "正在处理中…")}
                 {state === "success" && "记得打钱 💰"}
                 {state === "error" && "处理失败"}
               </div>
+              {state === "uploading" && taskId && (
+                <div className="mt-3 flex justify-end">
+                  <button
+                    type="button"
+                    onClick={handleCancel}
+                    className="inline-flex items-center justify-center gap-2 rounded-full border border-slate-300 bg-white px-6 py-2.5 text-sm font-semibold text-slate-600 hover:bg-slate-50 transition-colors"
+                  >
+                    <span>取消</span>
+                  </button>
+                </div>
+              )}
               {state === "success" && taskId && (
                 <div className="mt-3 flex justify-end">
                   <button